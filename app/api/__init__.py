@@ -1,5 +1,7 @@
 from .accounts import accounts_router
 from .transactions import transactions_router
 from .auth import auth_router
+from .service import service_router
+from .metrics import metrics_router
 
-__all__ = ['transactions_router', 'accounts_router', 'auth_router']
\ No newline at end of file
+__all__ = ['transactions_router', 'accounts_router', 'auth_router', 'service_router', 'metrics_router']
\ No newline at end of file
@@ -1,10 +1,12 @@
-from fastapi import APIRouter, Depends
-from starlette.responses import Response
+from fastapi import APIRouter, Depends, Header, Query
+from starlette.responses import Response, StreamingResponse
 from starlette.status import HTTP_404_NOT_FOUND, HTTP_201_CREATED, HTTP_409_CONFLICT
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
 from app.core.exceptions import DuplicateException
-from app.schemas.accounts import AccountSchema, AccountRiskSchema
+from app.core.utils import accepts_json_lines, to_json_lines, NDJSON_MEDIA_TYPE
+from app.schemas.accounts import AccountSchema, AccountRiskSchema, account_row_adapter, account_rows_adapter
 from app.services.accounts import account_service
 from app.core.db import get_session
 
@@ -12,11 +14,30 @@ accounts_router = APIRouter(tags=["accounts"])
 
 
 @accounts_router.get("/", response_model=list[AccountSchema] | None)
-async def get_accounts(session: AsyncSession = Depends(get_session)):
-    accounts = await account_service.get_all_accounts(session=session)
+async def get_accounts(
+    after: str | None = None,
+    limit: int = Query(default=settings.page.page_size, ge=1, le=settings.page.max_page_size),
+    accept: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Постраничная выдача по курсору after (account_id последнего полученного аккаунта),
+    курсор следующей страницы - в заголовке X-Next-Cursor.
+    С Accept: application/x-ndjson все аккаунты отдаются потоком, без limit.
+    """
+    if accepts_json_lines(accept):
+        return StreamingResponse(
+            to_json_lines(account_service.stream_accounts(after=after), account_row_adapter),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    accounts, next_cursor = await account_service.get_accounts_page(session=session, limit=limit, after=after)
     if not accounts:
         return Response(status_code=HTTP_404_NOT_FOUND)
-    return accounts
+    # Строки сериализуются сразу в JSON, без моделей и повторной валидации по response_model
+    response = Response(content=account_rows_adapter.dump_json(accounts), media_type='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
 
 
 @accounts_router.get("/score/{account_id}", response_model=AccountRiskSchema | None)
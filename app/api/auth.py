@@ -5,7 +5,7 @@ from app.schemas.users import UserCreate, UserRead
 from app.services.auth import register_new_user, authenticate_user, get_current_user
 from app.core.db import get_session
 from app.core.security import create_session_cookie, delete_session_cookie
-from app.models.users import UserModel
+from app.services.user_cache import user_cache
 
 auth_router = APIRouter(tags=["auth"])
 
@@ -46,18 +46,19 @@ async def login_for_session_cookie(
 @auth_router.post("/logout")
 async def logout(
     response: Response,
-    current_user: UserModel = Depends(get_current_user)
+    current_user: UserRead = Depends(get_current_user)
 ):
     """
     Выход и очистка сессионной cookie.
     """
+    user_cache.invalidate(current_user.username)
     delete_session_cookie(response=response)
     return {"message": "Выход выполнен успешно"}
 
 
 @auth_router.get("/me", response_model=UserRead)
 async def read_users_me(
-    current_user: UserModel = Depends(get_current_user)
+    current_user: UserRead = Depends(get_current_user)
 ):
     """
     Получение данных текущего вошедшего пользователя.
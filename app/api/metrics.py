@@ -0,0 +1,101 @@
+from fastapi import APIRouter
+from starlette.responses import Response
+from starlette.status import HTTP_404_NOT_FOUND
+
+from app.core.config import settings
+from app.core.db import get_pool_metrics
+from app.core.metrics import metrics, CONTENT_TYPE
+from app.services.alerts import alert_dispatcher
+from app.services.risk_analysis import risk_analysis_service
+from app.services.risk_rules import risk_rule_engine
+from app.services.scoring_queue import scoring_queue
+from app.services.user_cache import user_cache
+
+metrics_router = APIRouter(tags=["service"])
+
+# Счетчики, которые сервис уже ведет для /service/*, читаются только при выгрузке
+metrics.collect('gauge', 'db_pool_size', 'Соединений в пуле', lambda: get_pool_metrics().size)
+metrics.collect('gauge', 'db_pool_checked_out', 'Выданных соединений', lambda: get_pool_metrics().checked_out)
+metrics.collect('gauge', 'db_pool_overflow', 'Соединений сверх pool_size', lambda: get_pool_metrics().overflow)
+metrics.collect('counter', 'db_pool_acquisitions_total', 'Выдач соединения', lambda: get_pool_metrics().acquisitions)
+metrics.collect(
+    'counter', 'db_pool_timeouts_total', 'Ожиданий соединения до таймаута',
+    lambda: get_pool_metrics().timeouts
+)
+metrics.collect(
+    'counter', 'db_pool_wait_seconds_total', 'Суммарное ожидание соединения',
+    lambda: get_pool_metrics().wait_seconds_total
+)
+
+metrics.collect('counter', 'risk_evaluations_total', 'Оцененных транзакций', lambda: risk_rule_engine.evaluations)
+metrics.collect(
+    'counter', 'risk_fraud_flags_total', 'Транзакций, помеченных как мошеннические',
+    lambda: risk_rule_engine.frauds
+)
+metrics.collect(
+    'counter', 'risk_rule_hits_total', 'Срабатываний правила',
+    lambda: {(rule.name,): rule.hits for rule in risk_rule_engine.stats()}, labels=('rule',)
+)
+metrics.collect(
+    'counter', 'risk_rule_seconds_total', 'Суммарное время вычисления правила',
+    lambda: {(rule.name,): rule.seconds_total for rule in risk_rule_engine.stats()}, labels=('rule',)
+)
+
+metrics.collect(
+    'gauge', 'risk_profile_cache_bytes', 'Оценка памяти кэша профилей',
+    lambda: risk_analysis_service.profiles.size
+)
+metrics.collect(
+    'counter', 'risk_profile_cache_hits_total', 'Попаданий в кэш профилей',
+    lambda: risk_analysis_service.profiles.hits
+)
+metrics.collect(
+    'counter', 'risk_profile_cache_misses_total', 'Промахов кэша профилей', lambda: risk_analysis_service.profiles.misses
+)
+metrics.collect(
+    'gauge', 'risk_velocity_accounts', 'Отправителей в счетчиках скорости',
+    lambda: len(risk_analysis_service.velocity)
+)
+
+metrics.collect('gauge', 'scoring_queue_depth', 'Транзакций в очереди скоринга', lambda: scoring_queue.stats().depth)
+metrics.collect(
+    'gauge', 'scoring_queue_in_flight', 'Транзакций, оцениваемых воркерами',
+    lambda: scoring_queue.stats().in_flight
+)
+metrics.collect('counter', 'scoring_queue_scored_total', 'Оцененных очередью транзакций', lambda: scoring_queue.scored)
+metrics.collect(
+    'counter', 'scoring_queue_rejected_total', 'Отказов по переполнению очереди',
+    lambda: scoring_queue.rejected
+)
+metrics.collect('counter', 'scoring_queue_failed_total', 'Транзакций с ошибкой оценки', lambda: scoring_queue.failed)
+metrics.collect(
+    'counter', 'scoring_queue_lag_seconds_total', 'Суммарная задержка от постановки до записи fraud_flag',
+    lambda: scoring_queue.lag_seconds_total
+)
+
+metrics.collect(
+    'counter', 'fraud_alerts_delivered_total', 'Доставленных уведомлений о мошенничестве',
+    lambda: alert_dispatcher.delivered
+)
+metrics.collect(
+    'counter', 'fraud_alerts_retried_total', 'Уведомлений, отложенных после ошибки отправки',
+    lambda: alert_dispatcher.retried
+)
+metrics.collect(
+    'counter', 'fraud_alerts_failed_total', 'Уведомлений, отправка которых прекращена',
+    lambda: alert_dispatcher.failed
+)
+
+metrics.collect('gauge', 'user_cache_size', 'Пользователей в кэше сессий', lambda: len(user_cache))
+metrics.collect('counter', 'user_cache_hits_total', 'Попаданий в кэш пользователей', lambda: user_cache.hits)
+metrics.collect('counter', 'user_cache_misses_total', 'Промахов кэша пользователей', lambda: user_cache.misses)
+
+
+@metrics_router.get("")
+async def get_metrics():
+    """
+    Метрики всех воркеров в текстовом формате Prometheus.
+    """
+    if not settings.metrics.enabled:
+        return Response(status_code=HTTP_404_NOT_FOUND)
+    return Response(content=await metrics.render(), media_type=CONTENT_TYPE)
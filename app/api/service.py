@@ -0,0 +1,54 @@
+from fastapi import APIRouter
+
+from app.core.db import get_pool_metrics
+from app.schemas.alerts import AlertDispatcherStatsSchema
+from app.schemas.cache import CacheStatsSchema
+from app.schemas.pool import PoolMetricsSchema
+from app.schemas.queue import ScoringQueueStatsSchema
+from app.schemas.risk import RiskRuleStatsSchema
+from app.services.alerts import alert_dispatcher
+from app.services.risk_rules import risk_rule_engine
+from app.services.scoring_queue import scoring_queue
+from app.services.user_cache import user_cache
+
+service_router = APIRouter(tags=["service"])
+
+
+@service_router.get("/pool", response_model=PoolMetricsSchema)
+async def get_pool():
+    """
+    Состояние пула соединений процесса: занятые, сверх pool_size, время ожидания соединения.
+    """
+    return get_pool_metrics()
+
+
+@service_router.get("/user-cache", response_model=CacheStatsSchema)
+async def get_user_cache():
+    """
+    Размер кэша пользователей сессий и число попаданий и промахов.
+    """
+    return user_cache.stats()
+
+
+@service_router.get("/scoring-queue", response_model=ScoringQueueStatsSchema)
+async def get_scoring_queue():
+    """
+    Глубина очереди асинхронного скоринга, отказы по переполнению и задержка записи fraud_flag.
+    """
+    return scoring_queue.stats()
+
+
+@service_router.get("/risk-rules", response_model=list[RiskRuleStatsSchema])
+async def get_risk_rules():
+    """
+    Правила оценки риска процесса: число срабатываний и суммарное время вычисления каждого правила.
+    """
+    return risk_rule_engine.stats()
+
+
+@service_router.get("/alerts", response_model=AlertDispatcherStatsSchema)
+async def get_alerts():
+    """
+    Доставка уведомлений о мошеннических транзакциях процессом: отправленные, отложенные и брошенные.
+    """
+    return alert_dispatcher.stats()
@@ -1,12 +1,31 @@
 import json
 
-from fastapi import APIRouter, Depends
-from starlette.responses import Response
-from starlette.status import HTTP_404_NOT_FOUND, HTTP_201_CREATED, HTTP_409_CONFLICT
+from fastapi import APIRouter, Depends, Header, Query, Request
+from starlette.responses import Response, StreamingResponse
+from starlette.status import (
+    HTTP_404_NOT_FOUND,
+    HTTP_201_CREATED,
+    HTTP_202_ACCEPTED,
+    HTTP_409_CONFLICT,
+    HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+    HTTP_422_UNPROCESSABLE_ENTITY,
+    HTTP_429_TOO_MANY_REQUESTS
+)
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.core.exceptions import DuplicateException
-from app.schemas.transactions import TransactionSchema, TransactionCreateSchema
+from app.core.enums import RiskStatus
+from app.core.exceptions import DuplicateException, QueueFullException
+from app.core.config import settings
+from app.core.utils import parse_json_lines, read_body, accepts_json_lines, to_json_lines, NDJSON_MEDIA_TYPE
+from app.schemas.transactions import (
+    TransactionSchema,
+    TransactionCreateSchema,
+    TransactionAcceptedSchema,
+    TransactionFilterSchema,
+    TransactionBatchResultSchema,
+    transaction_row_adapter,
+    transaction_rows_adapter
+)
 from app.services.transactions import transaction_service
 from app.core.db import get_session
 
@@ -14,11 +33,35 @@ transactions_router = APIRouter(tags=["transactions"])
 
 
 @transactions_router.get("/", response_model=list[TransactionSchema] | None)
-async def get_transactions(session: AsyncSession = Depends(get_session)):
-    transactions = await transaction_service.get_all_transactions(session=session)
+async def get_transactions(
+    filters: TransactionFilterSchema = Depends(),
+    after: int | None = None,
+    limit: int = Query(default=settings.page.page_size, ge=1, le=settings.page.max_page_size),
+    accept: str | None = Header(default=None),
+    session: AsyncSession = Depends(get_session)
+):
+    """
+    Постраничная выдача по курсору after (id последней полученной транзакции),
+    курсор следующей страницы - в заголовке X-Next-Cursor.
+    С Accept: application/x-ndjson все подходящие транзакции отдаются потоком, без limit.
+    """
+    if accepts_json_lines(accept):
+        return StreamingResponse(
+            to_json_lines(
+                transaction_service.stream_transactions(after=after, filters=filters), transaction_row_adapter
+            ),
+            media_type=NDJSON_MEDIA_TYPE
+        )
+    transactions, next_cursor = await transaction_service.get_transactions_page(
+        session=session, limit=limit, after=after, filters=filters
+    )
     if not transactions:
         return Response(status_code=HTTP_404_NOT_FOUND)
-    return transactions
+    # Строки сериализуются сразу в JSON, без моделей и повторной валидации по response_model
+    response = Response(content=transaction_rows_adapter.dump_json(transactions), media_type='application/json')
+    if next_cursor is not None:
+        response.headers['X-Next-Cursor'] = str(next_cursor)
+    return response
 
 
 @transactions_router.get("/{transaction_id}", response_model=TransactionSchema | None)
@@ -33,16 +76,57 @@ async def get_transaction_by_id(
     return payment
 
 
-@transactions_router.post("/")
+@transactions_router.post("/", response_model=TransactionAcceptedSchema | None)
 async def create_transaction(
     transaction_data: TransactionCreateSchema, session: AsyncSession = Depends(get_session)
 ):
+    """
+    С async_scoring транзакция сохраняется со статусом Pending и отвечает 202 с ее id,
+    fraud_flag выставляется очередью скоринга. Заполненная очередь отвечает 429.
+    """
+    if settings.risk.async_scoring:
+        try:
+            transaction_id = await transaction_service.create_pending_transaction(
+                session=session, transaction_data=transaction_data
+            )
+        except QueueFullException:
+            return Response(status_code=HTTP_429_TOO_MANY_REQUESTS, headers={'Retry-After': '1'})
+        except DuplicateException:
+            return Response(status_code=HTTP_409_CONFLICT)
+        return Response(
+            status_code=HTTP_202_ACCEPTED,
+            content=TransactionAcceptedSchema(id=transaction_id, risk_status=RiskStatus.PENDING).model_dump_json(),
+            media_type='application/json'
+        )
     try:
-        for key in transaction_data:
-            print(key, '|')
         await transaction_service.create_transaction(
             session=session, transaction_data=transaction_data
         )
     except DuplicateException:
         return Response(status_code=HTTP_409_CONFLICT)
-    return Response(status_code=HTTP_201_CREATED)
\ No newline at end of file
+    return Response(status_code=HTTP_201_CREATED)
+
+
+@transactions_router.post("/batch", response_model=TransactionBatchResultSchema | None)
+async def create_transactions_batch(
+    request: Request, session: AsyncSession = Depends(get_session)
+):
+    """
+    Пакетная загрузка: JSON-массив или NDJSON (Content-Type: application/x-ndjson).
+    Пачка больше max_batch_size транзакций или max_batch_bytes байт отклоняется с 413.
+    """
+    body = await read_body(request, max_bytes=settings.page.max_batch_bytes)
+    if body is None:
+        return Response(status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    if request.headers.get('content-type', '').startswith(NDJSON_MEDIA_TYPE):
+        items = parse_json_lines(body)
+    else:
+        try:
+            items = json.loads(body)
+        except ValueError:
+            return Response(status_code=HTTP_422_UNPROCESSABLE_ENTITY)
+        if not isinstance(items, list):
+            return Response(status_code=HTTP_422_UNPROCESSABLE_ENTITY)
+    if len(items) > settings.page.max_batch_size:
+        return Response(status_code=HTTP_413_REQUEST_ENTITY_TOO_LARGE)
+    return await transaction_service.create_transactions_batch(items=items, session=session)
\ No newline at end of file
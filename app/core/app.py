@@ -1,28 +1,96 @@
+import asyncio
+
 from fastapi import FastAPI
 
-from app.api import accounts_router, transactions_router, auth_router
-from app.core.db import create_tables
+from app.api import accounts_router, transactions_router, auth_router, service_router, metrics_router
+from app.core.db import engine
 from app.core.config import settings
+from app.core.logger import logging_service
+from app.core.metrics import metrics, http_request_seconds, MetricsMiddleware
+from app.core.profiling import ProfilingMiddleware, stack_sampler
+from app.core.security import password_executor
+from app.services.alerts import alert_dispatcher
+from app.services.partitions import partition_service
+from app.services.risk_rules import risk_rule_engine, VELOCITY
+from app.services.scoring_queue import scoring_queue
+from app.services.velocity import velocity_counters
+
+APP_NAME = 'Transaction Service'
 
 ROUTES = {
     '/transactions': transactions_router,
     '/accounts': accounts_router,
-    '/auth': auth_router
+    '/auth': auth_router,
+    '/service': service_router,
+    '/metrics': metrics_router
 }
 
 
 def set_routes(app: FastAPI) -> None:
+    """Маршруты под app_mount и, для прежних клиентов, те же маршруты без него, вне схемы OpenAPI"""
     for prefix, router in ROUTES.items():
-        app.include_router(router=router, prefix=prefix)
+        app.include_router(router=router, prefix=settings.app.app_mount + prefix)
+        app.include_router(router=router, prefix=prefix, include_in_schema=False)
 
 
 def get_app(name: str) -> FastAPI:
+    """
+    Собирает приложение одного воркера.
+    Миграции сюда не входят: их один раз применяет main.py до запуска воркеров
+    """
     app = FastAPI(title=name)
     set_routes(app)
-    app.mount(settings.app.app_mount, app)
+    if settings.metrics.enabled:
+        app.add_middleware(MetricsMiddleware, histogram=http_request_seconds)
+    if settings.profiling.enabled:
+        app.add_middleware(
+            ProfilingMiddleware,
+            sampler=stack_sampler,
+            directory=settings.profiling.directory,
+            sample_rate=settings.profiling.sample_rate,
+            token=settings.profiling.token,
+            max_concurrent=settings.profiling.max_concurrent
+        )
 
     @app.on_event("startup")
     async def startup_event():
-        await create_tables()
+        app.state.partition_task = asyncio.create_task(partition_service.run_forever())
+        app.state.velocity_task = None
+        app.state.metrics_task = None
+        if settings.metrics.enabled:
+            app.state.metrics_task = asyncio.create_task(metrics.run_flush())
+        if risk_rule_engine.requires(VELOCITY):
+            # Граница прогрева фиксируется до приема запросов, сам прогрев идет в фоне
+            await velocity_counters.start_warm_up()
+            app.state.velocity_task = asyncio.create_task(velocity_counters.warm_up())
+        if settings.risk.async_scoring:
+            await scoring_queue.start()
+        if settings.alerts.enabled:
+            await alert_dispatcher.start()
+
+    @app.on_event("shutdown")
+    async def shutdown_event():
+        # Очередь дооценивается до закрытия соединений
+        await scoring_queue.stop()
+        await alert_dispatcher.stop()
+        tasks = [
+            task for task in (app.state.partition_task, app.state.velocity_task, app.state.metrics_task)
+            if task is not None
+        ]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if settings.metrics.enabled:
+            # Итоговый снимок: счетчики завершенного воркера продолжают входить в суммы
+            await metrics.flush()
+        password_executor.shutdown(wait=False, cancel_futures=True)
+        await engine.dispose()
+        logging_service.stop()
+
+    return app
+
 
-    return app
\ No newline at end of file
+def create_app() -> FastAPI:
+    """Фабрика для uvicorn: каждый воркер собирает свое приложение и логирование после старта процесса"""
+    logging_service.start()
+    return get_app(name=APP_NAME)
@@ -11,6 +11,55 @@ class ScoreConfig(BaseModel):
     TRANSACTIONS_TYPE_WEIGHT: int
     TRANSACTIONS_AMOUNT_WEIGHT: int
     TRANSACTIONS_FRAUD_WEIGHT: int
+    SCORE_IN_DATABASE: bool
+
+
+class RiskRuleConfig(BaseModel):
+    name: str
+    check: str
+    feature: str
+    weight: float
+    threshold: float = 0.0
+    min_amount: float = 0.0
+    ratio: float = 1.0
+    field: str | None = None
+    enabled: bool = True
+
+
+class RiskConfig(BaseModel):
+    analysis_window_days: int
+    profile_cache_enabled: bool
+    profile_bucket_seconds: int
+    profile_cache_max_mb: int
+    profile_ttl_seconds: int
+    async_scoring: bool
+    scoring_queue_size: int
+    scoring_workers: int
+    scoring_batch_size: int
+    scoring_flush_seconds: float
+    scoring_max_attempts: int
+    scoring_retry_seconds: float
+    scoring_recover_seconds: float
+    scoring_lease_seconds: float
+    velocity_slots: int
+    velocity_max_accounts: int
+    velocity_max_receivers: int
+    fraud_threshold: float
+    rules: list[RiskRuleConfig]
+
+
+class PageConfig(BaseModel):
+    page_size: int
+    max_page_size: int
+    stream_chunk_size: int
+    max_batch_size: int
+    max_batch_bytes: int
+
+
+class PartitionConfig(BaseModel):
+    months_ahead: int
+    retention_months: int
+    maintenance_interval_hours: int
 
 
 class AppConfig(BaseModel):
@@ -24,6 +73,12 @@ class AppConfig(BaseModel):
     secret_key: str
     cookie_name: str
     cookie_max_age_days: int
+    user_cache_max_size: int
+    user_cache_ttl_seconds: int
+    bcrypt_rounds: int
+    password_hash_workers: int
+    workers: int
+    graceful_shutdown_seconds: int
 
 
 class DBConfig(BaseModel):
@@ -32,6 +87,13 @@ class DBConfig(BaseModel):
     db_password: str
     db_host: str
     db_port: int
+    echo: bool
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    prepared_statement_cache_size: int
 
     @property
     def url(self):
@@ -45,10 +107,55 @@ class DBConfig(BaseModel):
         return path
 
 
+class MetricsConfig(BaseModel):
+    enabled: bool
+    directory: str
+    flush_seconds: float
+
+
+class LoggingConfig(BaseModel):
+    level: str
+    access_log: bool
+    audit_path: str
+    queue_size: int
+    debug_sample_rate: float
+
+
+class ProfilingConfig(BaseModel):
+    enabled: bool
+    sample_rate: float
+    token: str
+    interval_ms: float
+    max_concurrent: int
+    directory: str
+
+
+class AlertConfig(BaseModel):
+    enabled: bool
+    webhook_url: str
+    token: str
+    batch_size: int
+    max_rate: float
+    max_connections: int
+    timeout_seconds: float
+    lease_seconds: float
+    poll_seconds: float
+    max_attempts: int
+    backoff_seconds: float
+    backoff_max_seconds: float
+
+
 class Settings(BaseModel):
     app: AppConfig
     db: DBConfig
     score: ScoreConfig
+    risk: RiskConfig
+    page: PageConfig
+    partition: PartitionConfig
+    metrics: MetricsConfig
+    logging: LoggingConfig
+    profiling: ProfilingConfig
+    alerts: AlertConfig
 
 
 dyna_settings = Dynaconf(
@@ -59,5 +166,12 @@ dyna_settings = Dynaconf(
 settings = Settings(
     app=dyna_settings['app_settings'],
     db=dyna_settings['db_settings'],
-    score=dyna_settings['score_settings']
+    score=dyna_settings['score_settings'],
+    risk=dyna_settings['risk_settings'],
+    page=dyna_settings['page_settings'],
+    partition=dyna_settings['partition_settings'],
+    metrics=dyna_settings['metrics_settings'],
+    logging=dyna_settings['logging_settings'],
+    profiling=dyna_settings['profiling_settings'],
+    alerts=dyna_settings['alert_settings']
 )
\ No newline at end of file
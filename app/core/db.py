@@ -1,16 +1,104 @@
-from sqlalchemy import inspect
+import time
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import event, inspect
+from sqlalchemy.engine import Connection
+from sqlalchemy.exc import TimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 
-from app.models.base_model import BaseInit
-from app.models import transactions, accounts, users
 from app.core.config import settings
+from app.core.metrics import metrics
+from app.schemas.pool import PoolMetricsSchema
+
+ALEMBIC_CONFIG = str(Path(__file__).resolve().parents[2] / 'alembic.ini')
+INITIAL_REVISION = '0001'
+
+
+class PoolStats:
+    """Счетчики выдачи соединений из пула"""
+
+    def __init__(self):
+        self.acquisitions = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def observe(self, wait_seconds: float, timed_out: bool) -> None:
+        self.acquisitions += 1
+        self.timeouts += timed_out
+        self.wait_seconds_total += wait_seconds
+        self.wait_seconds_max = max(self.wait_seconds_max, wait_seconds)
+
+
+pool_stats = PoolStats()
+
+
+class TimedQueuePool(AsyncAdaptedQueuePool):
+    """Пул, замеряющий время получения соединения, включая ожидание свободного и подключение нового"""
+    # Логгер пула остается в пространстве sqlalchemy, чтобы уровень задавался вместе с остальными
+    _sqla_logger_namespace = 'sqlalchemy.pool.impl.TimedQueuePool'
+
+    def _do_get(self):
+        started = time.perf_counter()
+        timed_out = False
+        try:
+            return super()._do_get()
+        except TimeoutError:
+            timed_out = True
+            raise
+        finally:
+            pool_stats.observe(time.perf_counter() - started, timed_out)
 
 
 engine = create_async_engine(
     url=settings.db.url,
-    echo=True
+    echo=settings.db.echo,
+    poolclass=TimedQueuePool,
+    pool_size=settings.db.pool_size,
+    max_overflow=settings.db.max_overflow,
+    pool_timeout=settings.db.pool_timeout,
+    pool_recycle=settings.db.pool_recycle,
+    pool_pre_ping=settings.db.pool_pre_ping,
+    connect_args={
+        'prepared_statement_cache_size': settings.db.prepared_statement_cache_size,
+        'statement_cache_size': settings.db.prepared_statement_cache_size
+    }
 )
 
+QUERY_OPERATIONS = frozenset({'SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'COPY'})
+db_query_seconds = metrics.histogram('db_query_duration_seconds', 'Время запроса к БД', ('operation',))
+db_query_errors = metrics.counter('db_query_errors_total', 'Запросы к БД, завершившиеся ошибкой', ('operation',))
+
+
+def _operation(statement: str) -> str:
+    words = statement[:16].split(None, 1)
+    operation = words[0].upper() if words else ''
+    return operation if operation in QUERY_OPERATIONS else 'OTHER'
+
+
+def _before_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+
+def _after_query(conn, cursor, statement, parameters, context, executemany) -> None:
+    db_query_seconds.observe(time.perf_counter() - conn.info['query_started'].pop(), _operation(statement))
+
+
+def _query_error(context) -> None:
+    started = context.connection.info.get('query_started') if context.connection is not None else None
+    if started:
+        started.pop()
+    db_query_errors.inc(_operation(context.statement or ''))
+
+
+if settings.metrics.enabled:
+    event.listen(engine.sync_engine, 'before_cursor_execute', _before_query)
+    event.listen(engine.sync_engine, 'after_cursor_execute', _after_query)
+    event.listen(engine.sync_engine, 'handle_error', _query_error)
+
 async_session_maker = async_sessionmaker(
     bind=engine,
     class_=AsyncSession,
@@ -18,29 +106,40 @@ async_session_maker = async_sessionmaker(
 )
 
 
+def get_pool_metrics() -> PoolMetricsSchema:
+    pool = engine.sync_engine.pool
+    return PoolMetricsSchema(
+        size=pool.size(),
+        checked_out=pool.checkedout(),
+        checked_in=pool.checkedin(),
+        overflow=max(pool.overflow(), 0),
+        max_overflow=settings.db.max_overflow,
+        acquisitions=pool_stats.acquisitions,
+        timeouts=pool_stats.timeouts,
+        wait_seconds_total=pool_stats.wait_seconds_total,
+        wait_seconds_max=pool_stats.wait_seconds_max
+    )
+
+
 async def get_session():
     async with async_session_maker() as session:
         yield session
 
 
-async def create_tables():
-    async with engine.begin() as conn:
-        inspector = await conn.run_sync(lambda conn: inspect(conn))
-
-        existing_tables = await conn.run_sync(lambda _: inspector.get_table_names())
-
-        # Проверяем нужные таблицы
-        needed_tables = BaseInit.metadata.tables.keys()
+def _upgrade(connection: Connection) -> None:
+    config = Config(ALEMBIC_CONFIG)
+    config.attributes['connection'] = connection
+    tables = inspect(connection).get_table_names()
+    # База создана через create_all до появления миграций: схема уже соответствует начальной ревизии
+    legacy = 'alembic_version' not in tables and 'transactions' in tables
+    # alembic сам управляет транзакциями миграций
+    connection.commit()
+    if legacy:
+        command.stamp(config, INITIAL_REVISION)
+    command.upgrade(config, 'head')
 
-        tables_to_create = [table for table in needed_tables if table not in existing_tables]
 
-        if tables_to_create:
-            await conn.run_sync(
-                lambda conn: BaseInit.metadata.create_all(
-                    conn,
-                    tables=[BaseInit.metadata.tables[table] for table in tables_to_create]
-                )
-            )
-            print(f"Created tables: {tables_to_create}")
-        else:
-            print("All tables already exist")
\ No newline at end of file
+async def run_migrations() -> None:
+    """Применяет миграции alembic до последней ревизии"""
+    async with engine.connect() as connection:
+        await connection.run_sync(_upgrade)
@@ -14,4 +14,15 @@ class TransactionStatus(str, Enum):
 
 class DeviceUser(str, Enum):
     DESKTOP = 'Desktop'
-    MOBILE = 'Mobile'
\ No newline at end of file
+    MOBILE = 'Mobile'
+
+class TransactionBatchStatus(str, Enum):
+    CREATED = 'Created' #Сохранена
+    DUPLICATE = 'Duplicate' #Уже существует
+    INVALID = 'Invalid' #Не прошла валидацию
+    REJECTED = 'Rejected' #Неизвестный аккаунт
+
+
+class RiskStatus(str, Enum):
+    PENDING = 'Pending' #Ожидает оценки риска
+    SCORED = 'Scored' #Риск оценен
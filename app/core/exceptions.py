@@ -1,6 +1,10 @@
 class SqlException(Exception):
-    def __init__(self, message: str):
+    # SQLSTATE нарушения уникального ключа
+    UNIQUE_VIOLATION = '23505'
+
+    def __init__(self, message: str, code: str | None = None):
         self.message = message
+        self.code = code  # SQLSTATE ошибки БД, если она известна
 
     def __str__(self):
         return self.message
@@ -12,3 +16,11 @@ class DuplicateException(Exception):
 
     def __str__(self):
         return self.message
+
+
+class QueueFullException(Exception):
+    def __init__(self, message: str):
+        self.message = message
+
+    def __str__(self):
+        return self.message
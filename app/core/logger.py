@@ -0,0 +1,157 @@
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, WatchedFileHandler
+
+from app.core.config import settings
+from app.core.metrics import metrics
+
+AUDIT_LOGGER = 'audit.suspicious'
+UVICORN_LOGGERS = ('uvicorn', 'uvicorn.error', 'uvicorn.access')
+QUIET_LOGGERS = ('sqlalchemy', 'httpx')
+# Атрибуты LogRecord, не относящиеся к полям, переданным через extra
+# (color_message uvicorn добавляет для цветного вывода в консоль)
+RECORD_ATTRIBUTES = frozenset(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName', 'color_message'}
+
+# Журнал подозрительных транзакций; пока логирование не настроено, записи никуда не пишутся
+audit_logger = logging.getLogger(AUDIT_LOGGER)
+audit_logger.propagate = False
+audit_logger.addHandler(logging.NullHandler())
+
+
+class JsonFormatter(logging.Formatter):
+    """Одна запись - одна строка JSON; поля из extra выводятся рядом со стандартными"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'process': record.process
+        }
+        for key, value in record.__dict__.items():
+            if key not in RECORD_ATTRIBUTES and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class SamplingFilter(logging.Filter):
+    """Пропускает долю rate записей ниже INFO, остальные отбрасываются до постановки в очередь"""
+
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno >= logging.INFO or random.random() < self.rate
+
+
+class DroppingQueueHandler(QueueHandler):
+    """
+    Кладет запись в ограниченную очередь без ожидания. При заполненной очереди запись отбрасывается
+    и учитывается в счетчике: путь запроса не ждет запись логов и не пишет в поток сам
+    """
+
+    def __init__(self, records: queue.Queue):
+        super().__init__(records)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        """Подставляет аргументы в сообщение и переводит исключение в текст до передачи в другой поток"""
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingService:
+    """
+    Логирование процесса через очередь: обработчики с вводом-выводом работают в потоке QueueListener,
+    а логгеры только форматируют сообщение и кладут запись в очередь.
+    Журнал подозрительных транзакций пишется отдельным обработчиком, в audit_path или в общий поток
+    """
+
+    def __init__(self):
+        self.listener: QueueListener | None = None
+        self.audit_listener: QueueListener | None = None
+        self.handler: DroppingQueueHandler | None = None
+        self.audit_handler: DroppingQueueHandler | None = None
+
+    def start(self) -> None:
+        """Настраивает корневой логгер, логгеры uvicorn и журнал аудита; повторный вызов ничего не делает"""
+        if self.listener is not None:
+            return
+        config = settings.logging
+        formatter = JsonFormatter()
+        output = logging.StreamHandler(sys.stdout)
+        output.setFormatter(formatter)
+        if config.audit_path:
+            audit_output = WatchedFileHandler(config.audit_path, encoding='utf-8')
+            audit_output.setFormatter(formatter)
+        else:
+            audit_output = output
+        # Записи аудита идут своей очередью, чтобы отладочный поток не вытеснял их при переполнении
+        records: queue.Queue = queue.Queue(maxsize=config.queue_size)
+        audit_records: queue.Queue = queue.Queue(maxsize=config.queue_size)
+
+        self.handler = DroppingQueueHandler(records)
+        self.handler.addFilter(SamplingFilter(config.debug_sample_rate))
+        root = logging.getLogger()
+        root.handlers = [self.handler]
+        root.setLevel(config.level)
+        for name in UVICORN_LOGGERS:
+            uvicorn_logger = logging.getLogger(name)
+            uvicorn_logger.handlers = []
+            uvicorn_logger.propagate = True
+        logging.getLogger('uvicorn.access').disabled = not config.access_log
+        # Служебные записи пула и движка на INFO; SQL при echo = true выводится независимо от уровня.
+        # httpx пишет на INFO каждый запрос диспетчера уведомлений
+        for name in QUIET_LOGGERS:
+            logging.getLogger(name).setLevel(logging.WARNING)
+
+        self.audit_handler = DroppingQueueHandler(audit_records)
+        audit_logger.handlers = [self.audit_handler]
+        audit_logger.setLevel(logging.INFO)
+
+        self.listener = QueueListener(records, output, respect_handler_level=True)
+        self.audit_listener = QueueListener(audit_records, audit_output, respect_handler_level=True)
+        self.listener.start()
+        self.audit_listener.start()
+
+    def stop(self) -> None:
+        """Дописывает очереди и останавливает потоки"""
+        if self.listener is None:
+            return
+        self.listener.stop()
+        self.audit_listener.stop()
+        self.listener = None
+        self.audit_listener = None
+
+    def dropped(self) -> int:
+        return sum(handler.dropped for handler in (self.handler, self.audit_handler) if handler is not None)
+
+
+logging_service = LoggingService()
+
+metrics.collect(
+    'counter', 'log_records_dropped_total', 'Записей логов, отброшенных при заполненной очереди',
+    logging_service.dropped
+)
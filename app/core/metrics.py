@@ -0,0 +1,270 @@
+import asyncio
+import json
+import logging
+import os
+import shutil
+import tempfile
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Callable
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+# Границы корзин времени, секунды: от попадания в кэш до медленного запроса к БД
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+DIRECTORY_NAME = 'transaction_risk_service_metrics'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, *label_values: str, amount: float = 1.0) -> None:
+        self.values[label_values] = self.values.get(label_values, 0.0) + amount
+
+    def series(self) -> list:
+        return [[list(label_values), value] for label_values, value in self.values.items()]
+
+
+class Histogram:
+    """Счетчики по корзинам хранятся без накопления, накапливаются при выдаче"""
+    kind = 'histogram'
+
+    def __init__(
+            self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self.values: dict[tuple[str, ...], list] = {}
+
+    def observe(self, seconds: float, *label_values: str) -> None:
+        series = self.values.get(label_values)
+        if series is None:
+            # корзины, +Inf и сумма
+            series = self.values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, seconds)] += 1
+        series[-1] += seconds
+
+    def series(self) -> list:
+        # Копия: снимок сериализуется в другом потоке, пока цикл событий продолжает наблюдения
+        return [[list(label_values), list(values)] for label_values, values in self.values.items()]
+
+
+class Collected:
+    """Значения, которые уже считает другой объект сервиса: читаются только при выгрузке"""
+
+    def __init__(
+            self,
+            kind: str,
+            name: str,
+            documentation: str,
+            labels: tuple[str, ...],
+            collect: Callable[[], dict[tuple[str, ...], float]]
+    ):
+        self.kind = kind
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.collect = collect
+
+    def series(self) -> list:
+        return [[list(label_values), value] for label_values, value in self.collect().items()]
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names: list[str], values: list[str]) -> str:
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + '}'
+
+
+class MetricsRegistry:
+    """
+    Метрики процесса в текстовом формате Prometheus.
+    Воркеры uvicorn - отдельные процессы, а запрос /metrics попадает в один из них, поэтому каждый воркер
+    раз в flush_seconds сохраняет снимок своих метрик в общий каталог. Выгрузка складывает счетчики и
+    гистограммы всех снимков, включая завершившиеся воркеры, чтобы суммы не убывали, а мгновенные
+    значения (gauge) показывает по живым воркерам с меткой worker.
+    Снимок собирается в цикле событий, где живут читаемые объекты, а запись и чтение файлов идут в потоке
+    """
+
+    def __init__(self, directory: str, flush_seconds: float):
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / DIRECTORY_NAME)
+        self.flush_seconds = flush_seconds
+        self.metrics: dict[str, Counter | Histogram | Collected] = {}
+
+    def _register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labels))
+
+    def histogram(
+            self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def collect(
+            self,
+            kind: str,
+            name: str,
+            documentation: str,
+            collect: Callable[[], dict[tuple[str, ...], float] | float],
+            labels: tuple[str, ...] = ()
+    ) -> None:
+        """kind - counter или gauge; collect без меток может вернуть одно число"""
+        if labels:
+            self._register(Collected(kind, name, documentation, labels, collect))
+        else:
+            self._register(Collected(kind, name, documentation, labels, lambda: {(): collect()}))
+
+    def snapshot(self) -> dict:
+        metrics = {}
+        for name, metric in self.metrics.items():
+            try:
+                series = metric.series()
+            except Exception:
+                logger.exception('Metric %s collection failed', name)
+                continue
+            metrics[name] = {
+                'type': metric.kind,
+                'help': metric.documentation,
+                'labels': list(metric.labels),
+                'buckets': list(getattr(metric, 'buckets', ())),
+                'series': series
+            }
+        return {'pid': os.getpid(), 'written_at': time.time(), 'metrics': metrics}
+
+    def _write(self, snapshot: dict) -> None:
+        """Сохраняет снимок процесса через временный файл"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self.directory / f'{snapshot["pid"]}.json'
+        temporary = path.with_name(path.name + '.tmp')
+        temporary.write_text(json.dumps(snapshot))
+        os.replace(temporary, path)
+
+    async def flush(self) -> None:
+        await asyncio.to_thread(self._write, self.snapshot())
+
+    def reset(self) -> None:
+        """Очищает каталог снимков; вызывается один раз до запуска воркеров"""
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    async def run_flush(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_seconds)
+            try:
+                await self.flush()
+            except OSError:
+                logger.exception('Metrics flush failed')
+
+    def _snapshots(self, own: dict) -> list[dict]:
+        snapshots = [own]
+        for path in self.directory.glob('*.json'):
+            if path.stem == str(own['pid']):
+                continue
+            try:
+                snapshots.append(json.loads(path.read_text()))
+            except (OSError, ValueError):
+                continue
+        return snapshots
+
+    async def render(self) -> str:
+        return await asyncio.to_thread(self._render, self.snapshot())
+
+    def _render(self, own: dict) -> str:
+        self._write(own)
+        live_after = time.time() - self.flush_seconds * 3
+        merged: dict[str, dict] = {}
+        for snapshot in self._snapshots(own):
+            live = snapshot['written_at'] >= live_after
+            for name, metric in snapshot['metrics'].items():
+                target = merged.setdefault(name, {**metric, 'series': {}})
+                if metric['type'] == 'gauge':
+                    if not live:
+                        continue
+                    target['labels'] = [*metric['labels'], 'worker']
+                    for label_values, value in metric['series']:
+                        target['series'][(*label_values, str(snapshot['pid']))] = value
+                elif metric['type'] == 'histogram':
+                    for label_values, values in metric['series']:
+                        current = target['series'].get(tuple(label_values))
+                        target['series'][tuple(label_values)] = (
+                            values if current is None else [a + b for a, b in zip(current, values)]
+                        )
+                else:
+                    for label_values, value in metric['series']:
+                        key = tuple(label_values)
+                        target['series'][key] = target['series'].get(key, 0) + value
+
+        lines = []
+        for name, metric in merged.items():
+            lines.append(f'# HELP {name} {metric["help"]}')
+            lines.append(f'# TYPE {name} {metric["type"]}')
+            labels = metric['labels']
+            for label_values, value in metric['series'].items():
+                if metric['type'] != 'histogram':
+                    lines.append(f'{name}{_labels(labels, label_values)} {value}')
+                    continue
+                cumulative = 0
+                for bound, count in zip([*metric['buckets'], '+Inf'], value[:-1]):
+                    cumulative += count
+                    lines.append(f'{name}_bucket{_labels([*labels, "le"], [*label_values, bound])} {cumulative}')
+                lines.append(f'{name}_sum{_labels(labels, label_values)} {value[-1]}')
+                lines.append(f'{name}_count{_labels(labels, label_values)} {cumulative}')
+        return '\n'.join(lines) + '\n'
+
+
+class MetricsMiddleware:
+    """
+    ASGI-middleware времени HTTP-запросов по шаблону маршрута, без тела запроса и ответа
+    """
+
+    def __init__(self, app, histogram: Histogram):
+        self.app = app
+        self.histogram = histogram
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            route = scope.get('route')
+            # Путь без совпавшего маршрута в метку не попадает, иначе число рядов не ограничено
+            path = scope.get('root_path', '') + route.path if route is not None else 'unmatched'
+            self.histogram.observe(time.perf_counter() - started, scope['method'], path, str(status))
+
+
+metrics = MetricsRegistry(directory=settings.metrics.directory, flush_seconds=settings.metrics.flush_seconds)
+
+http_request_seconds = metrics.histogram(
+    'http_request_duration_seconds', 'Время HTTP-запроса по маршруту', ('method', 'route', 'status')
+)
@@ -0,0 +1,208 @@
+import asyncio
+import logging
+import os
+import random
+import re
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = b'x-profile'
+DIRECTORY_NAME = 'transaction_risk_service_profiles'
+# Модули, ожидание в которых считается ожиданием базы данных
+DB_MODULES = ('asyncpg', 'sqlalchemy')
+
+
+def _awaited_frames(coroutine) -> list:
+    """Кадры приостановленной цепочки await от внешней корутины к самой глубокой"""
+    frames = []
+    while coroutine is not None:
+        frame = getattr(coroutine, 'cr_frame', None) or getattr(coroutine, 'gi_frame', None)
+        if frame is None:
+            break
+        frames.append(frame)
+        coroutine = getattr(coroutine, 'cr_await', None) or getattr(coroutine, 'gi_yieldfrom', None)
+    return frames
+
+
+class RequestProfile:
+    """
+    Выборки одного запроса. Пока кадр middleware есть в стеке потока цикла событий, выполняется код запроса
+    (cpu: сервисы, расчет оценки, валидация pydantic внутри вызывающей функции). Иначе запрос приостановлен,
+    и выборка относится к месту, где он ждет (await), а ожидание внутри asyncpg или sqlalchemy - к базе
+    """
+
+    def __init__(self, frame, task: asyncio.Task):
+        self.frame = frame
+        self.task = task
+        self.stacks: dict[str, int] = {}
+        self.cpu = 0
+        self.waited = 0
+        self.db = 0
+
+    def sample(self, stack: list, weight: int, names: dict) -> None:
+        """stack - кадры потока цикла событий от верхнего к корневому, weight - микросекунды с прошлой выборки"""
+        if self.frame in stack:
+            kind = 'cpu'
+            frames = stack[:stack.index(self.frame)][::-1]
+            self.cpu += weight
+        else:
+            kind = 'await'
+            chain = _awaited_frames(self.task.get_coro())
+            frames = chain[chain.index(self.frame) + 1:] if self.frame in chain else chain
+            self.waited += weight
+        path = []
+        for frame in frames:
+            name = names.get(frame.f_code)
+            if name is None:
+                name = names[frame.f_code] = f'{frame.f_globals.get("__name__", "?")}.{frame.f_code.co_qualname}'
+            path.append(name)
+        if kind == 'await' and any(name.startswith(DB_MODULES) for name in path):
+            self.db += weight
+        key = ';'.join([kind, *path])
+        self.stacks[key] = self.stacks.get(key, 0) + weight
+
+
+class StackSampler:
+    """
+    Фоновый поток, который раз в interval секунд снимает стек потока цикла событий, пока профилируется
+    хотя бы один запрос. Вес выборки - фактически прошедшее время: под нагрузкой поток получает GIL
+    реже интервала, и частота выборок падает, но сумма весов остается равна времени запроса
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.profiles: set[RequestProfile] = set()
+        self.lock = threading.Lock()
+        self.active = threading.Event()
+        self.thread: threading.Thread | None = None
+        self.loop_thread_id: int | None = None
+        self.activated = 0.0
+        self.names: dict = {}
+
+    def add(self, profile: RequestProfile) -> None:
+        with self.lock:
+            self.profiles.add(profile)
+            self.loop_thread_id = threading.get_ident()
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name='stack-sampler', daemon=True)
+                self.thread.start()
+            if not self.active.is_set():
+                self.activated = time.perf_counter()
+                self.active.set()
+
+    def remove(self, profile: RequestProfile) -> None:
+        with self.lock:
+            self.profiles.discard(profile)
+            if not self.profiles:
+                self.active.clear()
+
+    def count(self) -> int:
+        return len(self.profiles)
+
+    def run(self) -> None:
+        previous = 0.0
+        while True:
+            self.active.wait()
+            time.sleep(self.interval)
+            # Под блокировкой: запрос не заберет профиль, пока в него дописывается выборка
+            with self.lock:
+                if not self.profiles:
+                    continue
+                now = time.perf_counter()
+                # После простоя время считается с момента, когда снова появился профилируемый запрос
+                weight = int((now - max(previous, self.activated)) * 1_000_000)
+                previous = now
+                frame = sys._current_frames().get(self.loop_thread_id)
+                stack = []
+                while frame is not None:
+                    stack.append(frame)
+                    frame = frame.f_back
+                for profile in self.profiles:
+                    profile.sample(stack, weight, self.names)
+                del stack, frame
+
+
+class ProfilingMiddleware:
+    """
+    ASGI-middleware профилирования отдельных запросов: по заголовку X-Profile со значением token
+    или случайной доле sample_rate. Для каждого запроса пишет файл свернутых стеков (collapsed stacks,
+    значения в микросекундах) для flamegraph.pl или speedscope и строку лога с разбивкой времени.
+    Без включения в настройках middleware не добавляется, и запросы его не проходят
+    """
+
+    def __init__(
+            self,
+            app,
+            sampler: StackSampler,
+            directory: str,
+            sample_rate: float,
+            token: str,
+            max_concurrent: int
+    ):
+        self.app = app
+        self.sampler = sampler
+        self.directory = Path(directory or Path(tempfile.gettempdir()) / DIRECTORY_NAME)
+        self.sample_rate = sample_rate
+        self.token = token.encode('latin-1')
+        self.max_concurrent = max_concurrent
+
+    def _selected(self, scope) -> bool:
+        if self.sampler.count() >= self.max_concurrent:
+            return False
+        if self.token:
+            for name, value in scope['headers']:
+                if name == PROFILE_HEADER:
+                    return value == self.token
+        return random.random() < self.sample_rate
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http' or not self._selected(scope):
+            await self.app(scope, receive, send)
+            return
+
+        profile = RequestProfile(sys._getframe(), asyncio.current_task())
+        started = time.perf_counter()
+        self.sampler.add(profile)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.sampler.remove(profile)
+            seconds = time.perf_counter() - started
+            route = scope.get('route')
+            path = scope.get('root_path', '') + route.path if route is not None else scope['path']
+            await asyncio.to_thread(self.write, profile, scope['method'], path, seconds)
+
+    def write(self, profile: RequestProfile, method: str, path: str, seconds: float) -> None:
+        name = '{0}-{1}-{2}{3}.folded'.format(
+            datetime.now().strftime('%Y%m%dT%H%M%S%f'), os.getpid(), method, re.sub(r'\W+', '_', path)[:80]
+        )
+        file = self.directory / name
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            file.write_text(''.join(f'{stack} {weight}\n' for stack, weight in sorted(profile.stacks.items())))
+        except OSError:
+            logger.exception('Request profile write failed')
+            return
+        logger.info(
+            'Request profile written',
+            extra={
+                'method': method,
+                'route': path,
+                'wall_ms': round(seconds * 1000, 3),
+                'cpu_ms': profile.cpu / 1000,
+                'await_ms': profile.waited / 1000,
+                'db_await_ms': profile.db / 1000,
+                'profile_file': str(file)
+            }
+        )
+
+
+stack_sampler = StackSampler(interval=settings.profiling.interval_ms / 1000)
@@ -1,3 +1,5 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Any
 
@@ -7,7 +9,11 @@ from passlib.context import CryptContext
 
 from app.core.config import settings
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=settings.app.bcrypt_rounds)
+# bcrypt отпускает GIL, поэтому хэширование в потоках не блокирует цикл событий и идет параллельно
+password_executor = ThreadPoolExecutor(
+    max_workers=settings.app.password_hash_workers, thread_name_prefix='password-hash'
+)
 
 SECRET_KEY = settings.app.secret_key
 COOKIE_NAME = settings.app.cookie_name
@@ -25,6 +31,18 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password в пуле потоков password_executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash в пуле потоков password_executor"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(password_executor, get_password_hash, password)
+
+
 def create_session_cookie(response: Response, username: str) -> None:
     session_data = {"sub": username}
     session_id = serializer.dumps(session_data)
@@ -0,0 +1,44 @@
+import json
+from typing import Any, AsyncIterator
+
+from pydantic import TypeAdapter
+from starlette.requests import Request
+
+NDJSON_MEDIA_TYPE = 'application/x-ndjson'
+
+
+def parse_json_lines(body: bytes) -> list[Any]:
+    """Разбирает NDJSON; строка с некорректным JSON превращается в None"""
+    items = []
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            items.append(json.loads(line))
+        except ValueError:
+            items.append(None)
+    return items
+
+
+async def read_body(request: Request, max_bytes: int) -> bytes | None:
+    """Читает тело запроса не больше max_bytes; None, если тело длиннее"""
+    if int(request.headers.get('content-length') or 0) > max_bytes:
+        return None
+    chunks = []
+    size = 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > max_bytes:
+            return None
+        chunks.append(chunk)
+    return b''.join(chunks)
+
+
+def accepts_json_lines(accept: str | None) -> bool:
+    return bool(accept) and NDJSON_MEDIA_TYPE in accept
+
+
+async def to_json_lines(chunks: AsyncIterator[list[Any]], adapter: TypeAdapter) -> AsyncIterator[bytes]:
+    """Сериализует поток пачек строк в NDJSON, adapter - TypeAdapter одной строки"""
+    async for chunk in chunks:
+        yield b''.join(adapter.dump_json(item) + b'\n' for item in chunk)
@@ -1,10 +1,16 @@
 from .accounts import account_crud
+from .alerts import fraud_alert_crud
+from .account_stats import account_stats_crud
+from .partitions import partition_crud
 from .transactions import transaction_crud
 from .users import user_crud
 
 
 __all__ = [
     'account_crud',
+    'account_stats_crud',
+    'fraud_alert_crud',
+    'partition_crud',
     'transaction_crud',
     'user_crud'
-]
\ No newline at end of file
+]
@@ -0,0 +1,238 @@
+from typing import Any
+
+from sqlalchemy import (
+    Integer,
+    String,
+    select,
+    func,
+    extract,
+    union_all,
+    case,
+    or_,
+    false,
+    literal_column,
+    cast,
+    column,
+    update,
+    values
+)
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.enums import TransactionStatus, TransactionType
+from app.core.exceptions import SqlException
+from app.models.accounts import AccountModel, AccountStatsModel
+from app.models.transactions import TransactionModel
+from app.databases.base_crud import BaseCRUD
+
+STATS_COLUMNS = (
+    'transaction_count',
+    'successful_count',
+    'type_weight_sum',
+    'fraud_count',
+    'amount_score',
+    'gap_days_sum',
+    'first_datetime',
+    'last_datetime'
+)
+RETURNING_COLUMNS = (
+    AccountStatsModel.account_id,
+    *(getattr(AccountStatsModel, column) for column in STATS_COLUMNS),
+    AccountStatsModel.recent_counts,
+    AccountStatsModel.needs_rebuild
+)
+
+
+class AccountStatsCRUD(BaseCRUD):
+    @staticmethod
+    async def _execute(session: AsyncSession, statement: Any, params: Any = None):
+        try:
+            return await session.execute(statement, params)
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+
+    async def get(self, account_id: str, session: AsyncSession) -> AccountStatsModel | None:
+        result = await self._execute(
+            session, select(AccountStatsModel).where(AccountStatsModel.account_id == account_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_all(self, session: AsyncSession) -> list[AccountStatsModel]:
+        result = await self._execute(session, select(AccountStatsModel))
+        return result.scalars().all()
+
+    async def add(self, stats: AccountStatsModel, session: AsyncSession) -> None:
+        session.add(stats)
+        await self.commit(session)
+
+    @staticmethod
+    def _merge_recent_counts(decay_days: int):
+        """
+        Гистограмма давности после прибавления приращения. Прежняя гистограмма сдвигается на число
+        календарных дней между прежней и новой last_datetime, поэтому давность ее транзакций
+        может отличаться от точной на день; пересборка по истории снова делает ее точной
+        """
+        shift = (
+            f'LEAST({decay_days}, GREATEST(0, COALESCE(('
+            'floor(extract(epoch FROM excluded.last_datetime) / 86400) '
+            f'- floor(extract(epoch FROM account_stats.last_datetime) / 86400))::int, {decay_days})))'
+        )
+        return literal_column(
+            'ARRAY(SELECT COALESCE(previous, 0) + COALESCE(added, 0) FROM unnest('
+            f'array_fill(0, ARRAY[{shift}]) || account_stats.recent_counts[1:{decay_days} - {shift}], '
+            'excluded.recent_counts) WITH ORDINALITY AS counts(previous, added, position) ORDER BY position)',
+            type_=ARRAY(Integer)
+        )
+
+    async def apply_deltas(self, deltas: list[dict], decay_days: int, session: AsyncSession) -> list:
+        """
+        Прибавляет приращения к агрегатам аккаунтов и возвращает их новые строки.
+        Строки с needs_rebuild нужно пересобрать по истории
+        """
+        statement = pg_insert(AccountStatsModel).values(deltas)
+        excluded = statement.excluded
+        statement = statement.on_conflict_do_update(
+            index_elements=[AccountStatsModel.account_id],
+            set_={
+                'transaction_count': AccountStatsModel.transaction_count + excluded.transaction_count,
+                'successful_count': AccountStatsModel.successful_count + excluded.successful_count,
+                'type_weight_sum': AccountStatsModel.type_weight_sum + excluded.type_weight_sum,
+                'fraud_count': AccountStatsModel.fraud_count + excluded.fraud_count,
+                'amount_score': AccountStatsModel.amount_score + excluded.amount_score,
+                'gap_days_sum': AccountStatsModel.gap_days_sum + excluded.gap_days_sum + func.coalesce(
+                    func.floor(
+                        extract('epoch', excluded.first_datetime - AccountStatsModel.last_datetime) / 86400
+                    ), 0
+                ),
+                'first_datetime': func.least(AccountStatsModel.first_datetime, excluded.first_datetime),
+                'last_datetime': func.greatest(AccountStatsModel.last_datetime, excluded.last_datetime),
+                'recent_counts': self._merge_recent_counts(decay_days),
+                'needs_rebuild': or_(
+                    AccountStatsModel.needs_rebuild,
+                    func.coalesce(AccountStatsModel.last_datetime > excluded.first_datetime, False)
+                ),
+                'update_at': excluded.update_at
+            }
+        ).returning(*RETURNING_COLUMNS)
+        result = await self._execute(session, statement)
+        return result.all()
+
+    async def add_fraud_counts(self, counts: dict[str, int], session: AsyncSession) -> list:
+        """
+        Прибавляет к fraud_count аккаунтов число их транзакций, помеченных мошенническими уже после учета,
+        и возвращает новые строки. Строки блокируются по порядку account_id, как и при прибавлении приращений
+        """
+        fraud_counts = values(
+            column('account_id', String),
+            column('fraud_count', Integer),
+            name='fraud_counts'
+        ).data(sorted(counts.items()))
+        locked = (
+            select(AccountStatsModel.account_id)
+            .where(AccountStatsModel.account_id.in_(list(counts)))
+            .order_by(AccountStatsModel.account_id)
+            .with_for_update()
+        )
+        result = await self._execute(
+            session,
+            update(AccountStatsModel)
+            .where(
+                AccountStatsModel.account_id == fraud_counts.c.account_id,
+                AccountStatsModel.account_id.in_(locked.scalar_subquery())
+            )
+            .values(fraud_count=AccountStatsModel.fraud_count + fraud_counts.c.fraud_count)
+            .returning(*RETURNING_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        return result.all()
+
+    async def rebuild(
+            self,
+            account_ids: list[str],
+            type_weights: dict[TransactionType, float],
+            decay_days: int,
+            session: AsyncSession
+    ) -> list:
+        """Пересобирает агрегаты аккаунтов по всей истории одним запросом и возвращает их строки"""
+        def account_rows(account_column):
+            return select(
+                account_column.label('account_id'),
+                TransactionModel.transaction_datetime,
+                TransactionModel.transaction_amount,
+                (TransactionModel.transaction_status == TransactionStatus.SUCCESS).label('successful'),
+                TransactionModel.transaction_type,
+                TransactionModel.fraud_flag
+            ).where(account_column.in_(account_ids))
+
+        account_transactions = union_all(
+            account_rows(TransactionModel.sender_account_id),
+            account_rows(TransactionModel.receiver_account_id)
+        ).cte('account_transactions')
+        ordered = select(
+            account_transactions,
+            func.lag(account_transactions.c.transaction_datetime).over(
+                partition_by=account_transactions.c.account_id,
+                order_by=account_transactions.c.transaction_datetime
+            ).label('previous_datetime'),
+            func.max(account_transactions.c.transaction_datetime).over(
+                partition_by=account_transactions.c.account_id
+            ).label('account_last_datetime')
+        ).subquery('ordered')
+        age_days = func.floor(
+            extract('epoch', ordered.c.account_last_datetime - ordered.c.transaction_datetime) / 86400
+        )
+        type_weight = case(
+            *[(ordered.c.transaction_type == transaction_type, weight)
+              for transaction_type, weight in type_weights.items()],
+            else_=0.5
+        )
+        aggregated = select(
+            ordered.c.account_id,
+            func.count().label('transaction_count'),
+            func.count().filter(ordered.c.successful).label('successful_count'),
+            func.sum(type_weight).label('type_weight_sum'),
+            func.count().filter(ordered.c.fraud_flag).label('fraud_count'),
+            func.sum(func.least(func.log(ordered.c.transaction_amount + 1) * 2, 5)).filter(
+                ordered.c.successful
+            ).label('amount_score'),
+            func.sum(
+                func.floor(extract('epoch', ordered.c.transaction_datetime - ordered.c.previous_datetime) / 86400)
+            ).label('gap_days_sum'),
+            func.min(ordered.c.transaction_datetime).label('first_datetime'),
+            func.max(ordered.c.transaction_datetime).label('last_datetime'),
+            array([func.count().filter(age_days == age) for age in range(decay_days)]).label('recent_counts')
+        ).group_by(ordered.c.account_id).subquery('aggregated')
+
+        rows = (
+            select(
+                AccountModel.account_id,
+                *[
+                    aggregated.c[column] if column.endswith('datetime')
+                    else func.coalesce(aggregated.c[column], 0)
+                    for column in STATS_COLUMNS
+                ],
+                func.coalesce(aggregated.c.recent_counts, cast(array([], type_=Integer), ARRAY(Integer))),
+                false(),
+                func.now()
+            )
+            .outerjoin(aggregated, aggregated.c.account_id == AccountModel.account_id)
+            .where(AccountModel.account_id.in_(account_ids))
+            .order_by(AccountModel.account_id)
+        )
+        statement = pg_insert(AccountStatsModel).from_select(
+            ['account_id', *STATS_COLUMNS, 'recent_counts', 'needs_rebuild', 'update_at'], rows
+        )
+        statement = statement.on_conflict_do_update(
+            index_elements=[AccountStatsModel.account_id],
+            set_={
+                column: statement.excluded[column]
+                for column in (*STATS_COLUMNS, 'recent_counts', 'needs_rebuild', 'update_at')
+            }
+        ).returning(*RETURNING_COLUMNS)
+        result = await self._execute(session, statement)
+        return result.all()
+
+
+account_stats_crud = AccountStatsCRUD()
@@ -1,10 +1,13 @@
-from sqlalchemy import select
+from datetime import datetime
+from typing import AsyncIterator
+
+from sqlalchemy import Select, func, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.core.exceptions import SqlException
 from app.models.accounts import AccountModel
-from app.schemas.accounts import AccountSchema, AccountRiskSchema
+from app.schemas.accounts import AccountSchema, AccountRiskSchema, AccountRow
 from app.databases.base_crud import BaseCRUD
 
 
@@ -14,10 +17,66 @@ class AccountCRUD(BaseCRUD):
         account = result.scalar_one_or_none()
         return AccountSchema.model_validate(account)
 
-    async def get_all(self, session: AsyncSession) -> list[AccountSchema] | list:
-        result = await session.execute(select(AccountModel))
-        accounts = result.scalars().all()
-        return [AccountSchema.model_validate(account) for account in accounts]
+    async def get_score(self, account_id: str, session: AsyncSession) -> float | None:
+        result = await session.execute(select(AccountModel.score).where(AccountModel.account_id == account_id))
+        return result.scalar_one_or_none()
+
+    async def get_scores(self, account_ids: set[str], session: AsyncSession) -> dict[str, float]:
+        result = await session.execute(
+            select(AccountModel.account_id, AccountModel.score).where(AccountModel.account_id.in_(account_ids))
+        )
+        return {row.account_id: row.score for row in result.all()}
+
+    async def update_scores(self, scores: dict[str, float], session: AsyncSession) -> None:
+        """Строки обновляются по порядку account_id, чтобы параллельные обновления не взаимоблокировались"""
+        if not scores:
+            return
+        now = datetime.now()
+        try:
+            await session.execute(
+                update(AccountModel),
+                [
+                    {'account_id': account_id, 'score': score, 'update_at': now}
+                    for account_id, score in sorted(scores.items())
+                ]
+            )
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+
+    async def get_ids(self, session: AsyncSession, limit: int, after: str | None = None) -> list[str]:
+        statement = select(AccountModel.account_id).order_by(AccountModel.account_id).limit(limit)
+        if after is not None:
+            statement = statement.where(AccountModel.account_id > after)
+        result = await session.execute(statement)
+        return list(result.scalars().all())
+
+    async def count(self, session: AsyncSession, after: str | None = None) -> int:
+        statement = select(func.count()).select_from(AccountModel)
+        if after is not None:
+            statement = statement.where(AccountModel.account_id > after)
+        result = await session.execute(statement)
+        return result.scalar_one()
+
+    @staticmethod
+    def _after(after: str | None) -> Select:
+        statement = select(*AccountModel.__table__.columns).order_by(AccountModel.account_id)
+        if after is not None:
+            statement = statement.where(AccountModel.account_id > after)
+        return statement
+
+    async def get_all(self, session: AsyncSession, limit: int, after: str | None = None) -> list[AccountRow]:
+        """Страница аккаунтов с account_id больше after, строками без ORM-объектов"""
+        result = await session.execute(self._after(after).limit(limit))
+        return [dict(row) for row in result.mappings()]
+
+    async def stream(
+            self, session: AsyncSession, chunk_size: int, after: str | None = None
+    ) -> AsyncIterator[list[AccountRow]]:
+        """Аккаунты через серверный курсор пачками по chunk_size строк"""
+        result = await session.stream(self._after(after).execution_options(yield_per=chunk_size))
+        async for rows in result.mappings().partitions():
+            yield [dict(row) for row in rows]
 
     async def add(self, account: AccountModel, session: AsyncSession) -> None:
         try:
@@ -0,0 +1,100 @@
+from datetime import timedelta
+from typing import Any
+
+from sqlalchemy import BigInteger, Interval, column, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.exceptions import SqlException
+from app.models.alerts import FraudAlertModel
+from app.databases.base_crud import BaseCRUD
+
+PENDING = (FraudAlertModel.delivered_at.is_(None), FraudAlertModel.failed_at.is_(None))
+
+
+class FraudAlertCRUD(BaseCRUD):
+    @staticmethod
+    async def _execute(session: AsyncSession, statement: Any):
+        try:
+            return await session.execute(statement)
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+
+    async def get_all(self, session: AsyncSession) -> list[FraudAlertModel]:
+        result = await self._execute(session, select(FraudAlertModel).order_by(FraudAlertModel.id))
+        return result.scalars().all()
+
+    async def add(self, rows: list[dict], session: AsyncSession) -> None:
+        """
+        Вставляет уведомления без коммита: они фиксируются вместе с транзакцией вызывающего.
+        Уведомление с уже существующим ключом не дублируется
+        """
+        statement = pg_insert(FraudAlertModel).values(rows).on_conflict_do_nothing(
+            index_elements=[FraudAlertModel.idempotency_key]
+        )
+        await self._execute(session, statement)
+
+    async def claim(self, limit: int, lease_seconds: float, session: AsyncSession) -> list:
+        """
+        Забирает до limit уведомлений, срок которых наступил, и сдвигает их срок на время аренды.
+        Строки, захваченные другим процессом, пропускаются (SKIP LOCKED); если процесс не успеет
+        отметить результат, уведомление снова станет доступным после аренды
+        """
+        due = (
+            select(FraudAlertModel.id)
+            .where(*PENDING, FraudAlertModel.next_attempt_at <= func.now())
+            .order_by(FraudAlertModel.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(FraudAlertModel)
+            .where(FraudAlertModel.id.in_(due.scalar_subquery()))
+            .values(
+                attempts=FraudAlertModel.attempts + 1,
+                next_attempt_at=func.now() + timedelta(seconds=lease_seconds)
+            )
+            .returning(
+                FraudAlertModel.id,
+                FraudAlertModel.idempotency_key,
+                FraudAlertModel.payload,
+                FraudAlertModel.attempts
+            )
+        )
+        result = await self._execute(session, statement)
+        return sorted(result.all(), key=lambda row: row.id)
+
+    async def set_delivered(self, ids: list[int], session: AsyncSession) -> None:
+        await self._execute(
+            session,
+            update(FraudAlertModel).where(FraudAlertModel.id.in_(ids)).values(delivered_at=func.now(), last_error=None)
+        )
+
+    async def set_failed(self, ids: list[int], error: str, session: AsyncSession) -> None:
+        await self._execute(
+            session,
+            update(FraudAlertModel).where(FraudAlertModel.id.in_(ids)).values(failed_at=func.now(), last_error=error)
+        )
+
+    async def reschedule(self, delays: dict[int, float], error: str, session: AsyncSession) -> None:
+        """Откладывает уведомления: delays - задержка следующей попытки в секундах по id"""
+        retries = values(
+            column('id', BigInteger),
+            column('delay', Interval),
+            name='retries'
+        ).data([(alert_id, timedelta(seconds=delay)) for alert_id, delay in delays.items()])
+        await self._execute(
+            session,
+            update(FraudAlertModel)
+            .where(FraudAlertModel.id == retries.c.id)
+            .values(next_attempt_at=func.now() + retries.c.delay, last_error=error)
+        )
+
+    async def count_pending(self, session: AsyncSession) -> int:
+        result = await self._execute(session, select(func.count()).select_from(FraudAlertModel).where(*PENDING))
+        return result.scalar_one()
+
+
+fraud_alert_crud = FraudAlertCRUD()
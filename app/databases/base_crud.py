@@ -1,12 +1,23 @@
 from abc import ABC, abstractmethod
 
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
 from typing import Any
 
+from app.core.exceptions import SqlException
+
 
 class BaseCRUD(ABC):
     @abstractmethod
     async def get_all(self, session: AsyncSession) -> list[Any]: ...
 
     @abstractmethod
-    async def add(self, obj: Any, session: AsyncSession) -> None: ...
\ No newline at end of file
+    async def add(self, obj: Any, session: AsyncSession) -> None: ...
+
+    @staticmethod
+    async def commit(session: AsyncSession) -> None:
+        try:
+            await session.commit()
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc), code=getattr(getattr(exc, 'orig', None), 'sqlstate', None))
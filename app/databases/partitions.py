@@ -0,0 +1,84 @@
+import re
+from datetime import datetime
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.core.exceptions import SqlException
+from app.models.transactions import TransactionModel
+from app.schemas.partitions import PartitionSchema
+from app.databases.base_crud import BaseCRUD
+
+PARENT_TABLE = TransactionModel.__tablename__
+DEFAULT_PARTITION = f'{PARENT_TABLE}_default'
+PARTITION_NAME = re.compile(rf'^{PARENT_TABLE}_p(\d{{4}})_(\d{{2}})$')
+
+
+def month_start(date: datetime) -> datetime:
+    return datetime(date.year, date.month, 1)
+
+
+def add_months(date: datetime, months: int) -> datetime:
+    month = date.month - 1 + months
+    return datetime(date.year + month // 12, month % 12 + 1, 1)
+
+
+def partition_name(start: datetime) -> str:
+    return f'{PARENT_TABLE}_p{start:%Y_%m}'
+
+
+class PartitionCRUD(BaseCRUD):
+    """Помесячные секции таблицы транзакций; секции именуются transactions_pYYYY_MM"""
+
+    @staticmethod
+    async def _execute(session: AsyncSession, statement: str) -> list:
+        try:
+            result = await session.execute(text(statement))
+            return result.all() if result.returns_rows else []
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+
+    async def lock(self, session: AsyncSession) -> None:
+        """Сериализует обслуживание секций между воркерами до конца транзакции"""
+        await self._execute(session, f"SELECT pg_advisory_xact_lock(hashtext('{PARENT_TABLE}_partitions'))")
+
+    async def get_all(self, session: AsyncSession) -> list[PartitionSchema]:
+        rows = await self._execute(
+            session,
+            f"""
+            SELECT child.relname
+            FROM pg_inherits
+            JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+            WHERE pg_inherits.inhparent = '{PARENT_TABLE}'::regclass
+            """
+        )
+        partitions = []
+        for (name,) in rows:
+            match = PARTITION_NAME.match(name)
+            if match:
+                start = datetime(int(match.group(1)), int(match.group(2)), 1)
+                partitions.append(PartitionSchema(name=name, start=start, end=add_months(start, 1)))
+        return sorted(partitions, key=lambda partition: partition.start)
+
+    async def add(self, partition: PartitionSchema, session: AsyncSession) -> None:
+        await self._execute(
+            session,
+            f"""
+            CREATE TABLE IF NOT EXISTS {partition.name} PARTITION OF {PARENT_TABLE}
+            FOR VALUES FROM ('{partition.start.isoformat()}') TO ('{partition.end.isoformat()}')
+            """
+        )
+
+    async def add_default(self, session: AsyncSession) -> None:
+        """Секция для строк вне помесячных диапазонов, например, из архивных периодов"""
+        await self._execute(session, f'CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {PARENT_TABLE} DEFAULT')
+
+    async def detach(self, partition: PartitionSchema, archive_name: str, session: AsyncSession) -> None:
+        """Отсоединяет секцию, данные остаются в отдельной таблице archive_name"""
+        await self._execute(session, f'ALTER TABLE {PARENT_TABLE} DETACH PARTITION {partition.name}')
+        await self._execute(session, f'ALTER TABLE {partition.name} RENAME TO {archive_name}')
+
+
+partition_crud = PartitionCRUD()
@@ -1,12 +1,59 @@
-from sqlalchemy import select
+from datetime import datetime, timedelta
+from decimal import Decimal
+from typing import AsyncIterator
+
+import asyncpg
+
+from sqlalchemy import BigInteger, Boolean, DateTime, Float, Integer, Numeric, Select, String, bindparam, cast, column, select, func, extract, union_all, case, update, values, literal, all_, or_, tuple_
+from sqlalchemy.dialects.postgresql import ARRAY, array_agg, insert
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 
+from app.core.enums import TransactionStatus, TransactionType, RiskStatus
 from app.core.exceptions import SqlException
+from app.models.accounts import AccountModel
 from app.models.transactions import TransactionModel
-from app.schemas.transactions import TransactionSchema
+from app.schemas.risk import RiskFeaturesSchema, RiskBucketSchema
+from app.schemas.transactions import (
+    TransactionSchema,
+    TransactionCreateSchema,
+    TransactionFilterSchema,
+    TransactionRow
+)
 from app.databases.base_crud import BaseCRUD
 
+# Колонки массовой загрузки через COPY; id заполняет последовательность
+COPY_COLUMNS = (
+    'sender_account_id',
+    'receiver_account_id',
+    'transaction_amount',
+    'transaction_type',
+    'transaction_datetime',
+    'transaction_status',
+    'fraud_flag',
+    'geolocation',
+    'device_user',
+    'risk_status'
+)
+# Временная таблица, через которую COPY переносит пачку в transactions
+STAGING_TABLE = 'transactions_copy_staging'
+# Уникальный ключ дубликата транзакции
+DUPLICATE_KEY_COLUMNS = ('sender_account_id', 'receiver_account_id', 'transaction_amount', 'transaction_datetime')
+# Колонки выдачи списком, в порядке полей TransactionSchema
+LISTING_COLUMNS = (
+    TransactionModel.id,
+    TransactionModel.sender_account_id,
+    TransactionModel.receiver_account_id,
+    cast(TransactionModel.transaction_amount, Float).label('transaction_amount'),
+    TransactionModel.transaction_type,
+    TransactionModel.transaction_datetime,
+    TransactionModel.transaction_status,
+    TransactionModel.fraud_flag,
+    TransactionModel.geolocation,
+    TransactionModel.device_user,
+    TransactionModel.risk_status
+)
+
 
 class TransactionCRUD(BaseCRUD):
     @classmethod
@@ -27,31 +74,609 @@ class TransactionCRUD(BaseCRUD):
         transactions = result.scalars().all()
         return [TransactionSchema.model_validate(transaction) for transaction in transactions]
 
+    @staticmethod
+    def _account_score_rows(account_id: str):
+        """Транзакции аккаунта для скоринга: сначала отправленные, затем полученные"""
+        columns = (
+            TransactionModel.transaction_datetime,
+            TransactionModel.transaction_amount,
+            (TransactionModel.transaction_status == TransactionStatus.SUCCESS).label('successful'),
+            TransactionModel.transaction_type,
+            TransactionModel.fraud_flag
+        )
+        return union_all(
+            select(*columns).where(account_id == TransactionModel.sender_account_id),
+            select(*columns).where(account_id == TransactionModel.receiver_account_id)
+        )
+
     @classmethod
-    async def get_transaction_devices(cls, transaction: TransactionSchema, start_date, session: AsyncSession) -> set:
+    async def get_account_score_rows(cls, account_id: str, session: AsyncSession) -> list:
+        result = await session.execute(cls._account_score_rows(account_id))
+        return result.all()
+
+    @classmethod
+    async def get_accounts_score_rows(
+            cls, account_ids: list[str], type_codes: dict[TransactionType, int], session: AsyncSession
+    ) -> list:
+        """
+        Транзакции набора аккаунтов для скоринга простыми значениями, сгруппированные по аккаунту:
+        (аккаунт, микросекунды от эпохи, сумма, успешна, код типа, фрод).
+        Внутри аккаунта сначала отправленные, затем полученные, как в _account_score_rows
+        """
+        def account_rows(account_column, direction: int):
+            return select(
+                account_column.label('account_id'),
+                literal(direction).label('direction'),
+                TransactionModel.id,
+                cast(extract('epoch', TransactionModel.transaction_datetime) * 1000000, BigInteger).label('timestamp'),
+                cast(TransactionModel.transaction_amount, Float).label('amount'),
+                (TransactionModel.transaction_status == TransactionStatus.SUCCESS).label('successful'),
+                case(
+                    *[(TransactionModel.transaction_type == transaction_type, code)
+                      for transaction_type, code in type_codes.items()]
+                ).label('type_code'),
+                TransactionModel.fraud_flag
+            ).where(account_column.in_(account_ids))
+
+        rows = union_all(
+            account_rows(TransactionModel.sender_account_id, 0),
+            account_rows(TransactionModel.receiver_account_id, 1)
+        ).subquery('rows')
         result = await session.execute(
-            select(TransactionModel.device_user)
+            select(
+                rows.c.account_id, rows.c.timestamp, rows.c.amount, rows.c.successful, rows.c.type_code,
+                rows.c.fraud_flag
+            ).order_by(rows.c.account_id, rows.c.direction, rows.c.id)
+        )
+        return result.all()
+
+    @classmethod
+    async def get_account_score_aggregates(
+            cls,
+            account_id: str,
+            decay_days: int,
+            type_weights: dict[TransactionType, float],
+            session: AsyncSession
+    ):
+        """Агрегаты для скоринга аккаунта, посчитанные в БД одной строкой"""
+        account_transactions = cls._account_score_rows(account_id).cte('account_transactions')
+        ordered = select(
+            account_transactions,
+            func.max(account_transactions.c.transaction_datetime).over().label('last_datetime'),
+            func.lag(account_transactions.c.transaction_datetime).over(
+                order_by=account_transactions.c.transaction_datetime
+            ).label('previous_datetime')
+        ).subquery('ordered')
+        age_days = func.floor(extract('epoch', ordered.c.last_datetime - ordered.c.transaction_datetime) / 86400)
+        gap_days = func.floor(extract('epoch', ordered.c.transaction_datetime - ordered.c.previous_datetime) / 86400)
+        type_weight = case(
+            *[(ordered.c.transaction_type == transaction_type, weight)
+              for transaction_type, weight in type_weights.items()],
+            else_=0.5
+        )
+        result = await session.execute(
+            select(
+                func.count().label('transaction_count'),
+                func.coalesce(
+                    func.sum(func.power(func.greatest(0.1, 1 - age_days / decay_days), 2)), 0
+                ).label('weighted_count'),
+                func.coalesce(func.sum(gap_days), 0).label('gap_days_sum'),
+                func.count().filter(ordered.c.successful).label('successful'),
+                func.coalesce(func.sum(type_weight), 0).label('type_weight_sum'),
+                func.count().filter(ordered.c.fraud_flag).label('fraud_count'),
+                func.coalesce(
+                    func.sum(func.least(func.log(ordered.c.transaction_amount + 1) * 2, 5)).filter(
+                        ordered.c.successful
+                    ), 0
+                ).label('amount_score')
+            )
+        )
+        return result.one()
+
+    @classmethod
+    async def get_risk_features(
+            cls,
+            transaction: TransactionCreateSchema,
+            start_date: datetime,
+            end_date: datetime,
+            session: AsyncSession,
+            sender_window: bool = True,
+            receiver_score: bool = True
+    ) -> RiskFeaturesSchema:
+        """
+        Все нужные признаки для анализа риска одним запросом: скоринг получателя и окно отправителя.
+        Окно ограничено с обеих сторон, чтобы планировщик отсекал будущие секции и секцию по умолчанию
+        """
+        columns = []
+        if receiver_score:
+            columns.append(
+                select(AccountModel.score)
+                .where(AccountModel.account_id == transaction.receiver_account_id)
+                .scalar_subquery()
+                .label('receiver_score')
+            )
+        if sender_window:
+            window = (
+                select(
+                    func.avg(TransactionModel.transaction_amount).label('avg_amount'),
+                    array_agg(TransactionModel.geolocation.distinct()).label('geolocations'),
+                    array_agg(TransactionModel.device_user.distinct()).label('devices')
+                )
+                .where(
+                    TransactionModel.sender_account_id == transaction.sender_account_id,
+                    TransactionModel.transaction_datetime.between(start_date, end_date)
+                )
+                .cte('sender_window')
+            )
+            columns.extend((window.c.avg_amount, window.c.geolocations, window.c.devices))
+        if not columns:
+            return RiskFeaturesSchema()
+        result = await session.execute(select(*columns))
+        row = result.one()._mapping
+        return RiskFeaturesSchema(
+            receiver_score=row.get('receiver_score') or 0.0,
+            avg_amount=float(row.get('avg_amount') or 0),
+            geolocations=set(row.get('geolocations') or ()),
+            devices=set(row.get('devices') or ())
+        )
+
+    @classmethod
+    async def get_sender_window_buckets(
+            cls,
+            sender_account_id: str,
+            start_date: datetime,
+            end_date: datetime,
+            bucket_seconds: int,
+            session: AsyncSession
+    ) -> list[RiskBucketSchema]:
+        """Агрегаты окна отправителя с разбивкой на временные корзины"""
+        bucket = func.floor(
+            extract('epoch', TransactionModel.transaction_datetime) / bucket_seconds
+        ).label('bucket')
+        result = await session.execute(
+            select(
+                bucket,
+                func.count().label('count'),
+                func.sum(TransactionModel.transaction_amount).label('amount_sum'),
+                array_agg(TransactionModel.geolocation.distinct()).label('geolocations'),
+                array_agg(TransactionModel.device_user.distinct()).label('devices')
+            )
             .where(
-                TransactionModel.sender_account_id == transaction.sender_account_id,
-                TransactionModel.transaction_datetime >= start_date
+                TransactionModel.sender_account_id == sender_account_id,
+                TransactionModel.transaction_datetime.between(start_date, end_date)
             )
-            .distinct()
+            .group_by(bucket)
         )
-        recent_devices = {row[0] for row in result.all()}
-        return recent_devices
+        return [
+            RiskBucketSchema(
+                bucket=int(row.bucket),
+                count=row.count,
+                amount_sum=float(row.amount_sum),
+                geolocations=set(row.geolocations),
+                devices=set(row.devices)
+            )
+            for row in result.all()
+        ]
 
-    async def get_all(self, session: AsyncSession) -> list[TransactionSchema]:
-        result = await session.execute(select(TransactionModel))
-        transactions = result.scalars().all()
-        return [TransactionSchema.model_validate(transaction) for transaction in transactions]
+    @classmethod
+    async def get_senders_window_features(
+            cls,
+            sender_ids: set[str],
+            start_date: datetime,
+            end_date: datetime,
+            session: AsyncSession,
+            exclude_ids: list[int] | None = None
+    ) -> dict[str, RiskFeaturesSchema]:
+        """
+        Признаки окна сразу для набора отправителей одним сгруппированным запросом.
+        exclude_ids - уже сохраненные транзакции, которые оцениваются сейчас и не должны попасть в свое окно
+        """
+        statement = (
+            select(
+                TransactionModel.sender_account_id,
+                func.avg(TransactionModel.transaction_amount).label('avg_amount'),
+                array_agg(TransactionModel.geolocation.distinct()).label('geolocations'),
+                array_agg(TransactionModel.device_user.distinct()).label('devices')
+            )
+            .where(
+                TransactionModel.sender_account_id.in_(sender_ids),
+                TransactionModel.transaction_datetime.between(start_date, end_date)
+            )
+            .group_by(TransactionModel.sender_account_id)
+        )
+        if exclude_ids:
+            statement = statement.where(TransactionModel.id.not_in(exclude_ids))
+        result = await session.execute(statement)
+        return {
+            row.sender_account_id: RiskFeaturesSchema(
+                avg_amount=float(row.avg_amount),
+                geolocations=set(row.geolocations),
+                devices=set(row.devices)
+            )
+            for row in result.all()
+        }
+
+    @classmethod
+    async def get_window_features_at(
+            cls, transactions: list[TransactionModel], window: timedelta, session: AsyncSession
+    ) -> list[RiskFeaturesSchema]:
+        """
+        Признаки окна отправителя на момент каждой транзакции набора, в том же порядке:
+        по его транзакциям в [transaction_datetime - window, transaction_datetime).
+        Сама транзакция и более поздние в окно не попадают, поэтому историю можно оценивать задним числом
+        """
+        if not transactions:
+            return []
+        datetimes = [transaction.transaction_datetime for transaction in transactions]
+        keys = func.unnest(
+            bindparam(
+                'sender_ids', [transaction.sender_account_id for transaction in transactions], type_=ARRAY(String)
+            ),
+            bindparam('datetimes', datetimes, type_=ARRAY(DateTime))
+        ).table_valued(
+            column('sender_account_id', String),
+            column('transaction_datetime', DateTime),
+            with_ordinality='position'
+        ).render_derived('keys')
+        result = await session.execute(
+            select(
+                keys.c.position,
+                func.avg(TransactionModel.transaction_amount).label('avg_amount'),
+                array_agg(TransactionModel.geolocation.distinct()).label('geolocations'),
+                array_agg(TransactionModel.device_user.distinct()).label('devices')
+            )
+            .select_from(keys)
+            .join(
+                TransactionModel,
+                (TransactionModel.sender_account_id == keys.c.sender_account_id)
+                & (TransactionModel.transaction_datetime >= keys.c.transaction_datetime - window)
+                & (TransactionModel.transaction_datetime < keys.c.transaction_datetime)
+            )
+            # Общий диапазон дат отсекает секции, в которые не попадает ни одно окно
+            .where(TransactionModel.transaction_datetime.between(min(datetimes) - window, max(datetimes)))
+            .group_by(keys.c.position)
+        )
+        features = [RiskFeaturesSchema() for _ in transactions]
+        for row in result.all():
+            features[row.position - 1] = RiskFeaturesSchema(
+                avg_amount=float(row.avg_amount),
+                geolocations=set(row.geolocations),
+                devices=set(row.devices)
+            )
+        return features
+
+    @classmethod
+    async def get_existing_keys(
+            cls, transactions: list[TransactionModel], session: AsyncSession
+    ) -> set[tuple]:
+        """Ключи (отправитель, получатель, сумма, дата) уже сохраненных транзакций из набора"""
+        if not transactions:
+            return set()
+        pairs = {
+            (transaction.sender_account_id, transaction.transaction_datetime)
+            for transaction in transactions
+        }
+        # Пары передаются двумя массивами и соединяются через unnest: большой список IN по кортежам
+        # планируется медленно и упирается в число параметров запроса. Диапазон дат отсекает лишние
+        # партиции и дает планировщику оценку, с которой он выбирает индекс, а не полный просмотр
+        keys = func.unnest(
+            bindparam('sender_ids', [sender_id for sender_id, _ in pairs], type_=ARRAY(String)),
+            bindparam('datetimes', [transaction_datetime for _, transaction_datetime in pairs], type_=ARRAY(DateTime))
+        ).table_valued('sender_account_id', 'transaction_datetime').render_derived('keys')
+        result = await session.execute(
+            select(
+                TransactionModel.sender_account_id,
+                TransactionModel.receiver_account_id,
+                TransactionModel.transaction_amount,
+                TransactionModel.transaction_datetime
+            )
+            .join(
+                keys,
+                (TransactionModel.sender_account_id == keys.c.sender_account_id)
+                & (TransactionModel.transaction_datetime == keys.c.transaction_datetime)
+            )
+            .where(
+                TransactionModel.transaction_datetime.between(
+                    min(transaction_datetime for _, transaction_datetime in pairs),
+                    max(transaction_datetime for _, transaction_datetime in pairs)
+                )
+            )
+        )
+        return {
+            (row.sender_account_id, row.receiver_account_id, round(float(row.transaction_amount), 2),
+             row.transaction_datetime)
+            for row in result.all()
+        }
 
-    async def add(self, transaction: TransactionModel, session: AsyncSession) -> None:
+    @staticmethod
+    def _filtered(filters: TransactionFilterSchema | None, after: int | None) -> Select:
+        """Выборка по фильтрам, упорядоченная по id; after - курсор, id последней полученной транзакции"""
+        statement = select(*LISTING_COLUMNS).order_by(TransactionModel.id)
+        if after is not None:
+            statement = statement.where(TransactionModel.id > after)
+        if filters is None:
+            return statement
+        if filters.sender_account_id is not None:
+            statement = statement.where(TransactionModel.sender_account_id == filters.sender_account_id)
+        if filters.receiver_account_id is not None:
+            statement = statement.where(TransactionModel.receiver_account_id == filters.receiver_account_id)
+        if filters.date_from is not None:
+            statement = statement.where(TransactionModel.transaction_datetime >= filters.date_from)
+        if filters.date_to is not None:
+            statement = statement.where(TransactionModel.transaction_datetime < filters.date_to)
+        if filters.fraud_flag is not None:
+            statement = statement.where(TransactionModel.fraud_flag == filters.fraud_flag)
+        return statement
+
+    async def get_all(
+            self,
+            session: AsyncSession,
+            limit: int,
+            after: int | None = None,
+            filters: TransactionFilterSchema | None = None
+    ) -> list[TransactionRow]:
+        """Страница транзакций с id больше after, строками без ORM-объектов"""
+        result = await session.execute(self._filtered(filters, after).limit(limit))
+        return [dict(row) for row in result.mappings()]
+
+    async def stream(
+            self,
+            session: AsyncSession,
+            chunk_size: int,
+            after: int | None = None,
+            filters: TransactionFilterSchema | None = None
+    ) -> AsyncIterator[list[TransactionRow]]:
+        """Транзакции через серверный курсор пачками по chunk_size строк"""
+        result = await session.stream(self._filtered(filters, after).execution_options(yield_per=chunk_size))
+        async for rows in result.mappings().partitions():
+            yield [dict(row) for row in rows]
+
+    async def get_max_id(self, session: AsyncSession) -> int:
+        result = await session.execute(select(func.coalesce(func.max(TransactionModel.id), 0)))
+        return result.scalar_one()
+
+    async def stream_since(
+            self, session: AsyncSession, start_date: datetime, max_id: int, chunk_size: int
+    ) -> AsyncIterator[list]:
+        """Отправитель, получатель, сумма и дата транзакций не старше start_date с id до max_id, пачками"""
+        result = await session.stream(
+            select(
+                TransactionModel.sender_account_id,
+                TransactionModel.receiver_account_id,
+                TransactionModel.transaction_amount,
+                TransactionModel.transaction_datetime
+            )
+            .where(TransactionModel.transaction_datetime >= start_date, TransactionModel.id <= max_id)
+            .execution_options(yield_per=chunk_size)
+        )
+        async for rows in result.partitions():
+            yield rows
+
+    @staticmethod
+    def lease_until(seconds: float):
+        """Срок аренды по часам БД, для записи в risk_lease_until вместе со строкой"""
+        return func.now() + timedelta(seconds=seconds)
+
+    async def claim_pending(
+            self, session: AsyncSession, limit: int, lease_seconds: float, exclude_ids: set[int]
+    ) -> list[TransactionRow]:
+        """
+        Забирает до limit транзакций без оценки риска с истекшей арендой, в порядке поступления,
+        и продлевает их аренду на lease_seconds. exclude_ids - транзакции, которые уже в работе у процесса.
+        Строки, захваченные другим процессом, пропускаются (SKIP LOCKED), как при выборке outbox уведомлений
+        """
+        due = (
+            select(TransactionModel.id, TransactionModel.transaction_datetime)
+            .where(
+                TransactionModel.risk_status == RiskStatus.PENDING,
+                or_(TransactionModel.risk_lease_until.is_(None), TransactionModel.risk_lease_until <= func.now()),
+                TransactionModel.id != all_(bindparam('exclude_ids', list(exclude_ids), type_=ARRAY(Integer)))
+            )
+            .order_by(TransactionModel.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        statement = (
+            update(TransactionModel)
+            .where(tuple_(TransactionModel.id, TransactionModel.transaction_datetime).in_(due))
+            .values(risk_lease_until=self.lease_until(seconds=lease_seconds))
+            .returning(*LISTING_COLUMNS)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            result = await session.execute(statement)
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+        return sorted((dict(row) for row in result.mappings()), key=lambda row: row['id'])
+
+    async def try_lock_recovery(self, session: AsyncSession) -> bool:
+        """
+        Сессионная advisory-блокировка восстановления очереди скоринга: держит не больше одного процесса.
+        Переживает коммит и снимается только с закрытием соединения, поэтому сессия нужна на отдельном соединении
+        """
+        result = await session.execute(
+            select(func.pg_try_advisory_lock(func.hashtext(f'{TransactionModel.__tablename__}_scoring_recovery')))
+        )
+        return result.scalar_one()
+
+    async def set_risk_results(self, results: list[dict], session: AsyncSession) -> list:
+        """
+        Записывает fraud_flag пачки PENDING-транзакций одним UPDATE ... FROM (VALUES ...).
+        results - словари id, transaction_datetime, fraud_flag; дата в условии отсекает лишние секции.
+        Возвращает только обновленные строки: уже оцененные другим процессом пропускаются
+        """
+        risk_results = values(
+            column('id', Integer),
+            column('transaction_datetime', DateTime),
+            column('fraud_flag', Boolean),
+            name='risk_results'
+        ).data([(item['id'], item['transaction_datetime'], item['fraud_flag']) for item in results])
+        statement = (
+            update(TransactionModel)
+            .where(
+                TransactionModel.id == risk_results.c.id,
+                TransactionModel.transaction_datetime == risk_results.c.transaction_datetime,
+                TransactionModel.risk_status == RiskStatus.PENDING
+            )
+            .values(fraud_flag=risk_results.c.fraud_flag, risk_status=RiskStatus.SCORED)
+            .returning(
+                TransactionModel.id,
+                TransactionModel.sender_account_id,
+                TransactionModel.receiver_account_id,
+                TransactionModel.fraud_flag
+            )
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            result = await session.execute(statement)
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+        return result.all()
+
+    async def set_fraud_flags(self, transactions: list[TransactionModel], session: AsyncSession) -> None:
+        """Помечает мошенническими уже отправленные в БД транзакции по ключу (отправитель, получатель, сумма, дата)"""
+        if not transactions:
+            return
+        # Массивы вместо VALUES: текст запроса не зависит от размера пачки и не компилируется заново
+        flagged = func.unnest(
+            bindparam(
+                'sender_ids', [transaction.sender_account_id for transaction in transactions], type_=ARRAY(String)
+            ),
+            bindparam(
+                'receiver_ids', [transaction.receiver_account_id for transaction in transactions], type_=ARRAY(String)
+            ),
+            bindparam(
+                'amounts',
+                [Decimal(f'{transaction.transaction_amount:.2f}') for transaction in transactions],
+                type_=ARRAY(Numeric(10, 2))
+            ),
+            bindparam(
+                'datetimes', [transaction.transaction_datetime for transaction in transactions], type_=ARRAY(DateTime)
+            )
+        ).table_valued(
+            'sender_account_id', 'receiver_account_id', 'transaction_amount', 'transaction_datetime'
+        ).render_derived('flagged')
+        statement = (
+            update(TransactionModel)
+            .where(
+                TransactionModel.sender_account_id == flagged.c.sender_account_id,
+                TransactionModel.receiver_account_id == flagged.c.receiver_account_id,
+                TransactionModel.transaction_amount == flagged.c.transaction_amount,
+                TransactionModel.transaction_datetime == flagged.c.transaction_datetime,
+                TransactionModel.transaction_datetime.between(
+                    min(transaction.transaction_datetime for transaction in transactions),
+                    max(transaction.transaction_datetime for transaction in transactions)
+                )
+            )
+            .values(fraud_flag=True)
+            .execution_options(synchronize_session=False)
+        )
+        try:
+            await session.execute(statement)
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+
+    async def add(self, transaction: TransactionModel, session: AsyncSession, commit: bool = True) -> None:
+        """При commit=False строка только отправляется в БД, коммит остается за вызывающим"""
         try:
             session.add(transaction)
-            await session.commit()
+            if commit:
+                await session.commit()
+            else:
+                await session.flush()
+        except SQLAlchemyError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc), code=getattr(getattr(exc, 'orig', None), 'sqlstate', None))
+
+    async def add_many(
+            self, transactions: list[TransactionModel], session: AsyncSession, commit: bool = True
+    ) -> list[TransactionModel]:
+        """
+        Вставляет транзакции, пропуская дубликаты по уникальному ключу (отправитель, получатель, сумма, дата).
+        Вставленным транзакциям проставляется id, они и возвращаются; остальные - дубликаты,
+        в том числе записанные параллельным запросом уже после проверки в приложении
+        """
+        if not transactions:
+            return []
+        statement = (
+            insert(TransactionModel)
+            .on_conflict_do_nothing(index_elements=DUPLICATE_KEY_COLUMNS)
+            .returning(TransactionModel.id, *(getattr(TransactionModel, name) for name in DUPLICATE_KEY_COLUMNS))
+        )
+        rows = [
+            {
+                'sender_account_id': transaction.sender_account_id,
+                'receiver_account_id': transaction.receiver_account_id,
+                'transaction_amount': transaction.transaction_amount,
+                'transaction_type': transaction.transaction_type,
+                'transaction_datetime': transaction.transaction_datetime,
+                'transaction_status': transaction.transaction_status,
+                'fraud_flag': transaction.fraud_flag,
+                'geolocation': transaction.geolocation,
+                'device_user': transaction.device_user,
+                'risk_status': transaction.risk_status or RiskStatus.SCORED
+            }
+            for transaction in transactions
+        ]
+        try:
+            result = await session.execute(statement, rows)
+            inserted = {
+                (row.sender_account_id, row.receiver_account_id, round(float(row.transaction_amount), 2),
+                 row.transaction_datetime): row.id
+                for row in result.all()
+            }
+            if commit:
+                await session.commit()
         except SQLAlchemyError as exc:
             await session.rollback()
             raise SqlException(message=str(exc))
+        created = []
+        for transaction in transactions:
+            # Совпадающие ключи внутри набора: id получает только первая транзакция
+            transaction_id = inserted.pop(
+                (transaction.sender_account_id, transaction.receiver_account_id,
+                 round(float(transaction.transaction_amount), 2), transaction.transaction_datetime),
+                None
+            )
+            if transaction_id is not None:
+                transaction.id = transaction_id
+                created.append(transaction)
+        return created
 
+    async def copy(self, records: list[tuple], session: AsyncSession) -> set[tuple]:
+        """
+        Вставляет строки через COPY asyncpg в транзакции сессии, без коммита и без ORM.
+        records - кортежи в порядке COPY_COLUMNS; перечисления передаются именами, как их хранит БД.
+        COPY идет во временную таблицу, а в transactions строки переносятся INSERT ... ON CONFLICT DO NOTHING:
+        дубликат, записанный другим писателем после проверки в приложении, пропускается, а не валит пачку.
+        Возвращает ключи (отправитель, получатель, сумма, дата) вставленных строк
+        """
+        columns = ', '.join(COPY_COLUMNS)
+        key_columns = ', '.join(DUPLICATE_KEY_COLUMNS)
+        connection = await session.connection()
+        raw_connection = await connection.get_raw_connection()
+        driver_connection = raw_connection.driver_connection
+        try:
+            await driver_connection.execute(
+                f'CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS '
+                f'SELECT {columns} FROM {TransactionModel.__tablename__} WITH NO DATA'
+            )
+            await driver_connection.copy_records_to_table(STAGING_TABLE, records=records, columns=COPY_COLUMNS)
+            rows = await driver_connection.fetch(
+                f'INSERT INTO {TransactionModel.__tablename__} ({columns}) SELECT {columns} FROM {STAGING_TABLE} '
+                f'ON CONFLICT ({key_columns}) DO NOTHING RETURNING {key_columns}'
+            )
+            await driver_connection.execute(f'DROP TABLE {STAGING_TABLE}')
+        except asyncpg.PostgresError as exc:
+            await session.rollback()
+            raise SqlException(message=str(exc))
+        return {
+            (row['sender_account_id'], row['receiver_account_id'], round(float(row['transaction_amount']), 2),
+             row['transaction_datetime'])
+            for row in rows
+        }
 
 transaction_crud = TransactionCRUD()
\ No newline at end of file
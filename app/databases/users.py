@@ -5,13 +5,12 @@ from sqlalchemy import select
 
 from app.models.users import UserModel
 from app.schemas.users import UserCreate, UserRead
-from app.core.security import get_password_hash
+from app.core.security import get_password_hash_async
 from app.databases.base_crud import BaseCRUD
 
 
 class UserCRUD(BaseCRUD):
     async def get_user_by_username(self, db: AsyncSession, username: str) -> UserRead | None:
-        print("USER:", UserModel.username)
         result = await db.execute(select(UserModel).where(UserModel.username == username))
         return result.scalar_one_or_none()
 
@@ -20,7 +19,7 @@ class UserCRUD(BaseCRUD):
         return result.scalars().all()
 
     async def add(self, db: AsyncSession, user_in: UserCreate) -> UserRead:
-        hashed_password = get_password_hash(user_in.password)
+        hashed_password = await get_password_hash_async(user_in.password)
         db_user = UserModel(
             username=user_in.username,
             hashed_password=hashed_password,
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Float, ForeignKey, DateTime
+from sqlalchemy import Column, String, Float, ForeignKey, DateTime, Integer, BigInteger, Boolean
+from sqlalchemy.dialects.postgresql import ARRAY
 from sqlalchemy.orm import Mapped, mapped_column
 from datetime import datetime
 
@@ -15,3 +16,23 @@ class AccountModel(BaseInit):
     score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
     create_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now())
     update_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now())
+
+
+class AccountStatsModel(BaseInit):
+    """Накопительные агрегаты транзакций аккаунта для поддержания актуального скоринга"""
+    __tablename__ = 'account_stats'
+
+    account_id: Mapped[str] = mapped_column(String, ForeignKey('accounts.account_id'), primary_key=True)
+    transaction_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    successful_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    type_weight_sum: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    fraud_count: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    amount_score: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    gap_days_sum: Mapped[int] = mapped_column(BigInteger, nullable=False, default=0)
+    first_datetime: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_datetime: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Число транзакций давностью 0, 1, ... дней от last_datetime в пределах окна давности скоринга
+    recent_counts: Mapped[list[int]] = mapped_column(ARRAY(Integer), nullable=False, server_default='{}')
+    # Выставляется для новых строк и при вставке задним числом: агрегаты пересобираются по истории
+    needs_rebuild: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
+    update_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, default=datetime.now)
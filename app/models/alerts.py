@@ -0,0 +1,33 @@
+from datetime import datetime
+
+from sqlalchemy import BigInteger, DateTime, Index, Integer, String, text
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.models.base_model import BaseInit
+
+
+class FraudAlertModel(BaseInit):
+    """
+    Исходящее уведомление о мошеннической транзакции (outbox).
+    Пишется в одном коммите с транзакцией или ее оценкой, отправляет его AlertDispatcher
+    """
+    __tablename__ = 'fraud_alerts'
+    __table_args__ = (
+        # Еще не доставленные уведомления, которые подбирает диспетчер
+        Index('ix_fraud_alerts_pending', 'id', postgresql_where=text('delivered_at IS NULL AND failed_at IS NULL')),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True, autoincrement=True)
+    # Получатель отбрасывает повторную доставку по этому ключу
+    idempotency_key: Mapped[str] = mapped_column(String(64), nullable=False, unique=True)
+    transaction_id: Mapped[int] = mapped_column(Integer, nullable=False)
+    payload: Mapped[dict] = mapped_column(JSONB, nullable=False)
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')
+    created_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=text('now()'))
+    # Срок следующей попытки; на время отправки строка арендуется сдвигом этого срока
+    next_attempt_at: Mapped[datetime] = mapped_column(DateTime, nullable=False, server_default=text('now()'))
+    delivered_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    # Отправка прекращена: исчерпаны попытки или получатель отклонил уведомление
+    failed_at: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
+    last_error: Mapped[str | None] = mapped_column(String, nullable=True)
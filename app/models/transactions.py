@@ -7,26 +7,62 @@ from sqlalchemy import (
     DateTime,
     Boolean,
     ForeignKey,
+    Index,
+    Integer,
+    text,
     Enum as Enalchemy
 )
 from sqlalchemy.orm import validates, Mapped, mapped_column
 
-from app.core.enums import TransactionStatus, TransactionType, DeviceUser
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser, RiskStatus
 from app.models.base_model import BaseModel, BaseInit
 
 
 class TransactionModel(BaseModel, BaseInit):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Окно отправителя в анализе риска: поиск по отправителю и дате, признаки берутся из индекса
+        Index(
+            'ix_transactions_sender_datetime',
+            'sender_account_id',
+            'transaction_datetime',
+            postgresql_include=['transaction_amount', 'geolocation', 'device_user']
+        ),
+        # Полученные транзакции аккаунта для скоринга
+        Index('ix_transactions_receiver_datetime', 'receiver_account_id', 'transaction_datetime'),
+        # Ключ дубликата: пакетная вставка пропускает совпадения через ON CONFLICT DO NOTHING
+        Index(
+            'ix_transactions_duplicate_key',
+            'sender_account_id',
+            'receiver_account_id',
+            'transaction_amount',
+            'transaction_datetime',
+            unique=True
+        ),
+        # Недооцененные транзакции, которые подбирает очередь скоринга после перезапуска
+        Index('ix_transactions_pending', 'id', postgresql_where=text("risk_status = 'PENDING'")),
+        # Помесячные секции по дате транзакции создает PartitionService
+        {'postgresql_partition_by': 'RANGE (transaction_datetime)'}
+    )
+
+    # Ключ секционирования обязан входить в первичный ключ
+    id: Mapped[int] = mapped_column(Integer, primary_key=True, index=True, autoincrement=True)
 
     sender_account_id: Mapped[str] = mapped_column(String, ForeignKey('accounts.account_id'), nullable=False)
     receiver_account_id: Mapped[str] = mapped_column(String, ForeignKey('accounts.account_id'), nullable=False)
     transaction_amount: Mapped[float] = mapped_column(Numeric(10, 2), nullable=False)
     transaction_type: Mapped[TransactionType] = mapped_column(Enalchemy(TransactionType), nullable=False)
-    transaction_datetime: Mapped[datetime] = mapped_column(DateTime, nullable=False)
+    transaction_datetime: Mapped[datetime] = mapped_column(DateTime, primary_key=True)
     transaction_status: Mapped[TransactionStatus] = mapped_column(Enalchemy(TransactionStatus), nullable=False)
     fraud_flag: Mapped[bool] = mapped_column(Boolean, nullable=False, default=False)
     geolocation: Mapped[str] = mapped_column(String, nullable=False)
     device_user: Mapped[DeviceUser] = mapped_column(Enalchemy(DeviceUser), nullable=False)
+    # PENDING - сохранена без оценки риска, fraud_flag выставит очередь скоринга
+    risk_status: Mapped[RiskStatus] = mapped_column(
+        Enalchemy(RiskStatus), nullable=False, default=RiskStatus.SCORED, server_default=RiskStatus.SCORED.name
+    )
+    # Срок аренды PENDING-транзакции очередью скоринга процесса; после него ее подберет проход восстановления
+    risk_lease_until: Mapped[datetime | None] = mapped_column(DateTime, nullable=True)
 
     @validates('transaction_amount')
     def validate_transaction_amount(self, key, amount):
@@ -1,5 +1,6 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from datetime import datetime
+from typing_extensions import TypedDict
 
 
 class AccountSchema(BaseModel):
@@ -14,6 +15,21 @@ class AccountSchema(BaseModel):
     model_config = ConfigDict(from_attributes=True)
 
 
+class AccountRow(TypedDict):
+    """Строка выборки для сериализации в JSON без создания моделей, поля как в AccountSchema"""
+    account_id: str
+    first_name: str
+    last_name: str
+    middle_name: str
+    score: float
+    create_at: datetime
+    update_at: datetime
+
+
+account_row_adapter = TypeAdapter(AccountRow)
+account_rows_adapter = TypeAdapter(list[AccountRow])
+
+
 class AccountRiskSchema(BaseModel):
     score: float
 
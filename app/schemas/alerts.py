@@ -0,0 +1,29 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+from app.core.enums import TransactionType, TransactionStatus, DeviceUser
+
+
+class FraudAlertSchema(BaseModel):
+    """Тело уведомления о мошеннической транзакции для системы банка"""
+    transaction_id: int
+    sender_account_id: str
+    receiver_account_id: str
+    transaction_amount: float
+    transaction_type: TransactionType
+    transaction_datetime: datetime
+    transaction_status: TransactionStatus
+    geolocation: str
+    device_user: DeviceUser
+    risk_score: float
+
+
+class AlertDispatcherStatsSchema(BaseModel):
+    enabled: bool
+    running: bool
+    delivered: int
+    retried: int  # уведомлений, отложенных после ошибки отправки
+    failed: int  # уведомлений, отправка которых прекращена
+    batches: int
+    last_error: str | None
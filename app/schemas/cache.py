@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+
+
+class CacheStatsSchema(BaseModel):
+    size: int
+    hits: int
+    misses: int
@@ -0,0 +1,9 @@
+from datetime import datetime
+
+from pydantic import BaseModel
+
+
+class PartitionSchema(BaseModel):
+    name: str
+    start: datetime
+    end: datetime
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+
+
+class PoolMetricsSchema(BaseModel):
+    size: int
+    checked_out: int
+    checked_in: int
+    overflow: int
+    max_overflow: int
+    acquisitions: int
+    timeouts: int
+    wait_seconds_total: float
+    wait_seconds_max: float
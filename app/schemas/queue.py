@@ -0,0 +1,17 @@
+from pydantic import BaseModel
+
+
+class ScoringQueueStatsSchema(BaseModel):
+    enabled: bool
+    depth: int  # транзакции в очереди, еще не взятые воркерами
+    in_flight: int  # сохраняются или оцениваются прямо сейчас
+    capacity: int
+    workers: int
+    enqueued: int
+    scored: int
+    rejected: int  # отклонены из-за заполненной очереди
+    retried: int  # возвращены в очередь после ошибки оценки
+    failed: int  # остались PENDING после всех попыток, их подберет проход восстановления
+    lag_seconds_last: float  # от постановки в очередь до записи fraud_flag
+    lag_seconds_max: float
+    lag_seconds_avg: float
@@ -0,0 +1,47 @@
+from pydantic import BaseModel
+
+from app.core.enums import DeviceUser
+
+
+# Максимум скоринга доверия аккаунта AccountModel.score
+MAX_ACCOUNT_SCORE = 100
+
+
+class RiskFeaturesSchema(BaseModel):
+    # Скоринг доверия получателя от 0 до 100, больше - надежнее
+    receiver_score: float = 0.0
+    avg_amount: float = 0.0
+    geolocations: set[str] = set()
+    devices: set[DeviceUser] = set()
+    # Скорость отправителя по счетчикам в памяти, без учета оцениваемой транзакции
+    sender_count_1m: int = 0
+    sender_amount_1m: float = 0.0
+    sender_receivers_1m: int = 0
+    sender_count_1h: int = 0
+    sender_amount_1h: float = 0.0
+    sender_receivers_1h: int = 0
+    sender_count_24h: int = 0
+    sender_amount_24h: float = 0.0
+    sender_receivers_24h: int = 0
+
+    @property
+    def receiver_risk(self) -> float:
+        """Риск получателя от 0 до 1: обратное к скорингу доверия, 0 - надежный получатель"""
+        return 1 - min(max(self.receiver_score, 0.0), MAX_ACCOUNT_SCORE) / MAX_ACCOUNT_SCORE
+
+
+class RiskBucketSchema(BaseModel):
+    bucket: int
+    count: int
+    amount_sum: float
+    geolocations: set[str]
+    devices: set[DeviceUser]
+
+
+class RiskRuleStatsSchema(BaseModel):
+    name: str
+    weight: float
+    evaluations: int
+    hits: int
+    seconds_total: float
+    seconds_avg: float
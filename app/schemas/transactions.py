@@ -1,6 +1,8 @@
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, TypeAdapter
 from datetime import datetime
-from app.core.enums import TransactionType, TransactionStatus, DeviceUser
+from typing_extensions import TypedDict
+
+from app.core.enums import TransactionType, TransactionStatus, DeviceUser, TransactionBatchStatus, RiskStatus
 
 
 class TransactionSchema(BaseModel):
@@ -14,10 +16,30 @@ class TransactionSchema(BaseModel):
     fraud_flag: bool
     geolocation: str
     device_user: DeviceUser
+    risk_status: RiskStatus
 
     model_config = ConfigDict(from_attributes=True)
 
 
+class TransactionRow(TypedDict):
+    """Строка выборки для сериализации в JSON без создания моделей, поля как в TransactionSchema"""
+    id: int
+    sender_account_id: str
+    receiver_account_id: str
+    transaction_amount: float
+    transaction_type: TransactionType
+    transaction_datetime: datetime
+    transaction_status: TransactionStatus
+    fraud_flag: bool
+    geolocation: str
+    device_user: DeviceUser
+    risk_status: RiskStatus
+
+
+transaction_row_adapter = TypeAdapter(TransactionRow)
+transaction_rows_adapter = TypeAdapter(list[TransactionRow])
+
+
 class TransactionCreateSchema(BaseModel):
     sender_account_id: str
     receiver_account_id: str
@@ -27,4 +49,31 @@ class TransactionCreateSchema(BaseModel):
     transaction_status: TransactionStatus
     fraud_flag: bool
     geolocation: str
-    device_user: DeviceUser
\ No newline at end of file
+    device_user: DeviceUser
+
+
+class TransactionAcceptedSchema(BaseModel):
+    """Ответ асинхронного режима: транзакция сохранена, риск будет оценен очередью скоринга"""
+    id: int
+    risk_status: RiskStatus
+
+
+class TransactionFilterSchema(BaseModel):
+    sender_account_id: str | None = None
+    receiver_account_id: str | None = None
+    date_from: datetime | None = None
+    date_to: datetime | None = None
+    fraud_flag: bool | None = None
+
+
+class TransactionBatchItemSchema(BaseModel):
+    index: int
+    status: TransactionBatchStatus
+    id: int | None = None
+    fraud_flag: bool | None = None
+    detail: str | None = None
+
+
+class TransactionBatchResultSchema(BaseModel):
+    created: int
+    items: list[TransactionBatchItemSchema]
\ No newline at end of file
@@ -0,0 +1,153 @@
+import math
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.enums import TransactionStatus
+from app.databases import account_crud, account_stats_crud
+from app.models.transactions import TransactionModel
+from app.services.scoring import (
+    account_scoring_engine,
+    ScoreAggregates,
+    DECAY_DAYS,
+    DECAY_WEIGHTS,
+    TYPE_CODES,
+    TYPE_WEIGHTS
+)
+
+# Вес транзакций старше DECAY_DAYS дней от последней транзакции аккаунта
+MIN_DECAY_WEIGHT = float(DECAY_WEIGHTS[DECAY_DAYS])
+
+
+class AccountStatsService:
+    """
+    Поддерживает накопительные агрегаты аккаунтов и сохраненный скоринг AccountModel.score.
+    Методы не коммитят: изменения фиксируются вместе с транзакциями, которые их вызвали
+    """
+
+    def __init__(self):
+        self.crud = account_stats_crud
+        self.account_crud = account_crud
+
+    @staticmethod
+    def _type_weights() -> dict:
+        return {transaction_type: TYPE_WEIGHTS[code] for transaction_type, code in TYPE_CODES.items()}
+
+    @staticmethod
+    def _deltas(transactions: list[TransactionModel]) -> list[dict]:
+        """
+        Приращения агрегатов по аккаунтам; перевод самому себе учитывается дважды, как в скоринге.
+        Приращения упорядочены по account_id: встречные вставки блокируют строки в одном порядке
+        """
+        account_transactions: dict[str, list[TransactionModel]] = defaultdict(list)
+        for transaction in transactions:
+            account_transactions[transaction.sender_account_id].append(transaction)
+            account_transactions[transaction.receiver_account_id].append(transaction)
+
+        now = datetime.now()
+        deltas = []
+        for account_id, items in sorted(account_transactions.items()):
+            dates = sorted(transaction.transaction_datetime for transaction in items)
+            recent_counts = [0] * DECAY_DAYS
+            for transaction_datetime in dates:
+                age_days = (dates[-1] - transaction_datetime).days
+                if age_days < DECAY_DAYS:
+                    recent_counts[age_days] += 1
+            successful = [
+                transaction for transaction in items
+                if transaction.transaction_status == TransactionStatus.SUCCESS
+            ]
+            deltas.append({
+                'account_id': account_id,
+                'transaction_count': len(items),
+                'successful_count': len(successful),
+                'type_weight_sum': sum(TYPE_WEIGHTS[TYPE_CODES[transaction.transaction_type]] for transaction in items),
+                'fraud_count': sum(1 for transaction in items if transaction.fraud_flag),
+                'amount_score': sum(
+                    min(math.log10(round(float(transaction.transaction_amount), 2) + 1) * 2, 5)
+                    for transaction in successful
+                ),
+                'gap_days_sum': sum((dates[i + 1] - dates[i]).days for i in range(len(dates) - 1)),
+                'first_datetime': dates[0],
+                'last_datetime': dates[-1],
+                'recent_counts': recent_counts,
+                'needs_rebuild': True,
+                'update_at': now
+            })
+        return deltas
+
+    async def apply_transactions(
+            self, transactions: list[TransactionModel], session: AsyncSession
+    ) -> dict[str, float]:
+        """
+        Учитывает уже отправленные в БД транзакции в агрегатах отправителей и получателей
+        и обновляет их скоринг. Возвращает новые значения скоринга
+        """
+        if not transactions:
+            return {}
+        rows = await self.crud.apply_deltas(
+            deltas=self._deltas(transactions), decay_days=DECAY_DAYS, session=session
+        )
+        return await self._update_scores_or_rebuild(rows=rows, session=session)
+
+    async def apply_fraud_flags(self, transactions: list, session: AsyncSession) -> dict[str, float]:
+        """
+        Учитывает fraud_flag, выставленный уже учтенным в агрегатах транзакциям, прибавлением к fraud_count
+        отправителей и получателей, без пересборки по истории. Возвращает новые значения скоринга
+        """
+        counts = Counter()
+        for transaction in transactions:
+            counts[transaction.sender_account_id] += 1
+            counts[transaction.receiver_account_id] += 1
+        if not counts:
+            return {}
+        rows = await self.crud.add_fraud_counts(counts=counts, session=session)
+        return await self._update_scores_or_rebuild(rows=rows, session=session)
+
+    async def _update_scores_or_rebuild(self, rows: list, session: AsyncSession) -> dict[str, float]:
+        """Обновляет скоринг по строкам account_stats; строки с needs_rebuild сначала пересобираются по истории"""
+        rebuild_ids = [row.account_id for row in rows if row.needs_rebuild]
+        if rebuild_ids:
+            rebuilt = await self.crud.rebuild(
+                account_ids=rebuild_ids, type_weights=self._type_weights(), decay_days=DECAY_DAYS, session=session
+            )
+            rows = [row for row in rows if not row.needs_rebuild] + rebuilt
+        return await self.update_scores(rows=rows, session=session)
+
+    async def rebuild(self, account_ids: list[str], session: AsyncSession) -> dict[str, float]:
+        """Пересобирает агрегаты аккаунтов по истории и обновляет их скоринг"""
+        rows = await self.rebuild_aggregates(account_ids=account_ids, session=session)
+        return await self.update_scores(rows=rows, session=session)
+
+    async def rebuild_aggregates(self, account_ids: list[str], session: AsyncSession) -> list:
+        """Пересобирает агрегаты аккаунтов по истории с текущими весами, не трогая сохраненный скоринг"""
+        return await self.crud.rebuild(
+            account_ids=account_ids, type_weights=self._type_weights(), decay_days=DECAY_DAYS, session=session
+        )
+
+    @staticmethod
+    def score(row) -> float:
+        """
+        Скоринг по строке account_stats: вес давности берется из гистограммы recent_counts,
+        транзакции старше окна давности имеют постоянный минимальный вес и учитываются по количеству
+        """
+        recent_weight = sum(count * float(DECAY_WEIGHTS[age]) for age, count in enumerate(row.recent_counts))
+        aggregates = ScoreAggregates(
+            transaction_count=row.transaction_count,
+            weighted_count=recent_weight + MIN_DECAY_WEIGHT * (row.transaction_count - sum(row.recent_counts)),
+            gap_days_sum=row.gap_days_sum,
+            successful=row.successful_count,
+            type_weight_sum=row.type_weight_sum,
+            fraud_count=row.fraud_count,
+            amount_score=row.amount_score
+        )
+        return account_scoring_engine.combine(aggregates)
+
+    async def update_scores(self, rows: list, session: AsyncSession) -> dict[str, float]:
+        """Записывает скоринг аккаунтов по строкам account_stats и возвращает его"""
+        scores = {row.account_id: self.score(row) for row in rows}
+        await self.account_crud.update_scores(scores=scores, session=session)
+        return scores
+
+account_stats_service = AccountStatsService()
@@ -1,14 +1,21 @@
 import math
+from typing import AsyncIterator
+
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.enums import TransactionStatus, TransactionType
 from app.core.exceptions import DuplicateException, SqlException
 from app.models.accounts import AccountModel
 from app.databases.accounts import account_crud
-from app.schemas.accounts import AccountSchema, AccountRiskSchema
+from app.schemas.accounts import AccountSchema, AccountRiskSchema, AccountRow
 from app.schemas.transactions import TransactionSchema
+from app.databases.account_stats import account_stats_crud
+from app.services.account_stats import account_stats_service
+from app.services.risk_analysis import risk_analysis_service
 from app.services.transactions import transaction_service
+from app.services.scoring import account_scoring_engine
 from app.core.config import settings
+from app.core.db import async_session_maker
 
 
 class AccountService:
@@ -77,34 +84,59 @@ class AccountService:
         total_score = count_score + freq_score + quality_score + type_score + amount_score - fraud_score
         return max(min(total_score, 100), 0)
 
-    async def get_all_accounts(self, session: AsyncSession) -> list[AccountSchema]:
-        accounts = await self.crud.get_all(session=session)
-        return accounts
+    async def get_accounts_page(
+        self, session: AsyncSession, limit: int, after: str | None = None
+    ) -> tuple[list[AccountRow], str | None]:
+        """Страница аккаунтов и курсор следующей страницы, если она есть"""
+        accounts = await self.crud.get_all(session=session, limit=limit + 1, after=after)
+        if len(accounts) <= limit:
+            return accounts, None
+        accounts = accounts[:limit]
+        return accounts, accounts[-1]['account_id']
+
+    async def stream_accounts(self, after: str | None = None) -> AsyncIterator[list[AccountRow]]:
+        """Потоковая выгрузка аккаунтов пачками в собственной сессии"""
+        async with async_session_maker() as session:
+            async for accounts in self.crud.stream(
+                session=session, chunk_size=settings.page.stream_chunk_size, after=after
+            ):
+                yield accounts
 
     async def get_account_score(
         self, account_id: str, session: AsyncSession
     ) -> AccountRiskSchema | None:
+        """Сохраненный скоринг; агрегаты аккаунта собираются по истории при первом обращении"""
         account = await self.crud.get_account(
             account_id=account_id, session=session
         )
         if not account:
             return None
-            
-        send_transactions = await transaction_service.get_account_send_transactions(
-            account_id=account.account_id,
-            session=session,
-        )
-        received_transactions = await transaction_service.get_account_received_transactions(
-            account_id=account_id,
-            session=session,
-        )
 
-        return AccountRiskSchema(
-            account_id=account.account_id,
-            score=self._calculate_account_score(
-                send_transactions=send_transactions, received_transactions=received_transactions
-            ),
-        )
+        stats = await account_stats_crud.get(account_id=account.account_id, session=session)
+        if stats is None or stats.needs_rebuild:
+            scores = await account_stats_service.rebuild(account_ids=[account.account_id], session=session)
+            await self.crud.commit(session)
+            risk_analysis_service.observe_scores(scores)
+            return AccountRiskSchema(score=scores[account.account_id])
+
+        return AccountRiskSchema(score=account.score)
+
+    async def recalculate_account_score(
+        self, account_id: str, session: AsyncSession
+    ) -> float:
+        """Полный пересчет скоринга по всей истории транзакций аккаунта"""
+        if settings.score.SCORE_IN_DATABASE:
+            aggregates = await transaction_service.get_account_score_aggregates(
+                account_id=account_id,
+                session=session,
+            )
+        else:
+            columns = await transaction_service.get_account_score_columns(
+                account_id=account_id,
+                session=session,
+            )
+            aggregates = account_scoring_engine.aggregate(columns)
+        return account_scoring_engine.combine(aggregates)
 
     async def create_account(
             self, account_data: AccountSchema, session: AsyncSession
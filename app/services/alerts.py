@@ -0,0 +1,214 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Any, NamedTuple
+
+import httpx
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings, AlertConfig
+from app.core.db import async_session_maker
+from app.databases import fraud_alert_crud
+from app.schemas.alerts import FraudAlertSchema, AlertDispatcherStatsSchema
+
+logger = logging.getLogger(__name__)
+
+# Ответы, после которых отправку имеет смысл повторить; на остальные 4xx получатель ответит так же
+RETRY_STATUSES = frozenset({408, 425, 429})
+
+
+class SendResult(NamedTuple):
+    error: str | None = None  # None - пачка принята получателем
+    retryable: bool = True
+    retry_after: float | None = None  # секунды из заголовка Retry-After
+
+
+class RateLimiter:
+    """Ограничение числа уведомлений в секунду (token bucket); запас не больше rate"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.allowance = max(rate, 1.0)
+        self.updated = time.monotonic()
+
+    async def take(self, wanted: int) -> int:
+        """Дожидается хотя бы одного разрешения и забирает до wanted"""
+        if self.rate <= 0:
+            return wanted
+        while True:
+            now = time.monotonic()
+            self.allowance = min(max(self.rate, 1.0), self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.allowance >= 1:
+                taken = min(wanted, int(self.allowance))
+                self.allowance -= taken
+                return taken
+            await asyncio.sleep((1 - self.allowance) / self.rate)
+
+    def give_back(self, count: int) -> None:
+        if self.rate > 0:
+            self.allowance += count
+
+
+class AlertDispatcher:
+    """
+    Доставка уведомлений о мошеннических транзакциях в систему банка через outbox.
+    Строка fraud_alerts пишется в коммите транзакции, поэтому уведомление переживает падение процесса,
+    а запрос не ждет отправки. Фоновая задача воркера забирает пачку уведомлений, срок которых наступил,
+    и отправляет ее одним POST через общий пул соединений. При ошибке уведомления откладываются
+    с экспоненциальной задержкой, после max_attempts попыток или отказа получателя помечаются failed.
+    Повтор возможен (пачка отправлена, а отметка не записана), поэтому у каждого уведомления
+    есть idempotency_key, по которому получатель отбрасывает дубликаты
+    """
+
+    def __init__(self, config: AlertConfig):
+        self.config = config
+        self.crud = fraud_alert_crud
+        self.limiter = RateLimiter(config.max_rate)
+        self.delivered = 0
+        self.retried = 0
+        self.failed = 0
+        self.batches = 0
+        self.last_error: str | None = None
+        self._client: httpx.AsyncClient | None = None
+        self._task: asyncio.Task | None = None
+        self._wakeup = asyncio.Event()
+
+    @staticmethod
+    def to_row(transaction_id: int, transaction: Any, risk_score: float) -> dict:
+        """Строка outbox по сохраненной транзакции: модели или схеме с полями транзакции"""
+        alert = FraudAlertSchema(
+            transaction_id=transaction_id,
+            sender_account_id=transaction.sender_account_id,
+            receiver_account_id=transaction.receiver_account_id,
+            transaction_amount=transaction.transaction_amount,
+            transaction_type=transaction.transaction_type,
+            transaction_datetime=transaction.transaction_datetime,
+            transaction_status=transaction.transaction_status,
+            geolocation=transaction.geolocation,
+            device_user=transaction.device_user,
+            risk_score=risk_score
+        )
+        return {
+            'idempotency_key': f'fraud-alert-{transaction_id}',
+            'transaction_id': transaction_id,
+            'payload': alert.model_dump(mode='json')
+        }
+
+    async def add(self, rows: list[dict], session: AsyncSession) -> None:
+        """Добавляет уведомления в транзакцию сессии; коммит остается за вызывающим"""
+        if self.config.enabled and rows:
+            await self.crud.add(rows=rows, session=session)
+
+    def notify(self) -> None:
+        """Будит диспетчер после коммита новых уведомлений, не дожидаясь poll_seconds"""
+        self._wakeup.set()
+
+    async def start(self) -> None:
+        headers = {'Authorization': f'Bearer {self.config.token}'} if self.config.token else None
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=self.config.timeout_seconds,
+            limits=httpx.Limits(
+                max_connections=self.config.max_connections, max_keepalive_connections=self.config.max_connections
+            )
+        )
+        self._task = asyncio.create_task(self.run_forever())
+
+    async def stop(self) -> None:
+        """Недоставленные уведомления остаются в outbox и отправятся после следующего старта"""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def run_forever(self) -> None:
+        while True:
+            self._wakeup.clear()
+            try:
+                claimed = await self.dispatch()
+            except Exception:
+                logger.exception('Fraud alerts dispatch failed')
+                claimed = 0
+            if claimed == 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.config.poll_seconds)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def dispatch(self) -> int:
+        """Отправляет одну пачку уведомлений и возвращает ее размер"""
+        limit = await self.limiter.take(self.config.batch_size)
+        async with async_session_maker() as session:
+            alerts = await self.crud.claim(limit=limit, lease_seconds=self.config.lease_seconds, session=session)
+            await self.crud.commit(session)
+        self.limiter.give_back(limit - len(alerts))
+        if not alerts:
+            return 0
+
+        result = await self._send(alerts)
+        async with async_session_maker() as session:
+            if result.error is None:
+                await self.crud.set_delivered(ids=[alert.id for alert in alerts], session=session)
+                self.delivered += len(alerts)
+            else:
+                await self._postpone(alerts, result, session)
+            await self.crud.commit(session)
+        self.batches += 1
+        return len(alerts)
+
+    async def _send(self, alerts: list) -> SendResult:
+        body = {'alerts': [{'idempotency_key': alert.idempotency_key, **alert.payload} for alert in alerts]}
+        try:
+            response = await self._client.post(self.config.webhook_url, json=body)
+        except httpx.HTTPError as exc:
+            return SendResult(error=f'{type(exc).__name__}: {exc}')
+        if response.is_success:
+            return SendResult()
+        retry_after = response.headers.get('Retry-After', '')
+        return SendResult(
+            error=f'HTTP {response.status_code}',
+            retryable=response.status_code >= 500 or response.status_code in RETRY_STATUSES,
+            retry_after=float(retry_after) if retry_after.isdigit() else None
+        )
+
+    async def _postpone(self, alerts: list, result: SendResult, session: AsyncSession) -> None:
+        self.last_error = result.error
+        failed = [
+            alert.id for alert in alerts if not result.retryable or alert.attempts >= self.config.max_attempts
+        ]
+        delays = {
+            alert.id: max(result.retry_after or 0.0, self._backoff(alert.attempts))
+            for alert in alerts if alert.id not in failed
+        }
+        if failed:
+            await self.crud.set_failed(ids=failed, error=result.error, session=session)
+            self.failed += len(failed)
+            logger.error('Fraud alerts delivery stopped for %s alerts: %s', len(failed), result.error)
+        if delays:
+            await self.crud.reschedule(delays=delays, error=result.error, session=session)
+            self.retried += len(delays)
+            logger.warning('Fraud alerts delivery failed, %s alerts postponed: %s', len(delays), result.error)
+
+    def _backoff(self, attempts: int) -> float:
+        """Экспоненциальная задержка со случайным разбросом, чтобы воркеры не повторяли отправку разом"""
+        delay = min(self.config.backoff_max_seconds, self.config.backoff_seconds * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    def stats(self) -> AlertDispatcherStatsSchema:
+        return AlertDispatcherStatsSchema(
+            enabled=self.config.enabled,
+            running=self._task is not None,
+            delivered=self.delivered,
+            retried=self.retried,
+            failed=self.failed,
+            batches=self.batches,
+            last_error=self.last_error
+        )
+
+
+alert_dispatcher = AlertDispatcher(config=settings.alerts)
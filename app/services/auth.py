@@ -2,10 +2,11 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import HTTPException, Depends, Request, status
 
 from app.databases.users import user_crud
-from app.schemas.users import UserCreate
+from app.schemas.users import UserCreate, UserRead
 from app.models.users import UserModel
-from app.core.security import verify_password, get_username_from_session_cookie, COOKIE_NAME
+from app.core.security import verify_password_async, get_username_from_session_cookie, COOKIE_NAME
 from app.core.db import get_session
+from app.services.user_cache import user_cache
 
 
 async def register_new_user(db: AsyncSession, user_in: UserCreate) -> UserModel:
@@ -15,14 +16,16 @@ async def register_new_user(db: AsyncSession, user_in: UserCreate) -> UserModel:
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Имя пользователя уже зарегистрировано"
         )
-    return await user_crud.add(db=db, user_in=user_in)
+    new_user = await user_crud.add(db=db, user_in=user_in)
+    user_cache.invalidate(new_user.username)
+    return new_user
 
 
 async def authenticate_user(db: AsyncSession, username: str, password: str) -> UserModel | None:
     user = await user_crud.get_user_by_username(db, username=username)
     if not user:
         return None
-    if not verify_password(password, user.hashed_password):
+    if not await verify_password_async(password, user.hashed_password):
         return None
     return user
 
@@ -30,7 +33,8 @@ async def authenticate_user(db: AsyncSession, username: str, password: str) -> U
 async def get_current_user(
     request: Request,
     db: AsyncSession = Depends(get_session)
-) -> UserModel:
+) -> UserRead:
+    """Пользователь сессии; повторные запросы в пределах TTL кэша обходятся без БД"""
     session_id = request.cookies.get(COOKIE_NAME)
     if not session_id:
         raise HTTPException(
@@ -47,11 +51,18 @@ async def get_current_user(
             headers={"WWW-Authenticate": "Cookie"},
         )
 
-    user = await user_crud.get_user_by_username(db, username=username)
-    if user is None:
+    user = user_cache.get(username)
+    if user is not None:
+        return user
+
+    generation = user_cache.generation
+    db_user = await user_crud.get_user_by_username(db, username=username)
+    if db_user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Пользователь для сессии не найден",
             headers={"WWW-Authenticate": "Cookie"},
         )
+    user = UserRead.model_validate(db_user)
+    user_cache.put(username, user, generation)
     return user
\ No newline at end of file
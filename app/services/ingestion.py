@@ -0,0 +1,280 @@
+import asyncio
+import csv
+import time
+from datetime import datetime
+from decimal import Decimal
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterator, NamedTuple
+
+from pydantic import TypeAdapter, ValidationError
+
+from app.core.db import async_session_maker
+from app.core.enums import RiskStatus
+from app.databases import account_crud, transaction_crud
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.account_stats import account_stats_service
+from app.services.partitions import partition_service
+from app.services.risk_analysis import risk_analysis_service
+from app.services.risk_rules import VELOCITY
+
+transaction_adapter = TypeAdapter(TransactionCreateSchema)
+transactions_adapter = TypeAdapter(list[TransactionCreateSchema])
+
+# Ограничение Numeric(10, 2) колонки суммы
+MAX_AMOUNT = 10 ** 8
+# Аккаунтов в одной пересборке агрегатов после загрузки
+STATS_CHUNK_SIZE = 1000
+
+
+class IngestProgress(NamedTuple):
+    read: int
+    created: int
+    duplicates: int
+    invalid: int  # не прошли валидацию
+    rejected: int  # неизвестный аккаунт
+    fraud: int
+    seconds: float
+
+
+class IngestionService:
+    """
+    Массовая загрузка транзакций из файла JSONL или CSV, например, выгрузки истории банка.
+    Файл читается потоком по chunk_size строк: пачка валидируется одним вызовом TypeAdapter,
+    проверяется так же, как POST /transactions/batch (неизвестные аккаунты, дубликаты) и записывается через COPY
+    одним коммитом на пачку; дубликат, записанный другим писателем уже после проверки, пропускается
+    по уникальному ключу. При score каждая транзакция оценивается на момент своего transaction_datetime:
+    окно отправителя заканчивается ее временем, а не текущим, и не видит более поздних транзакций.
+    Без оценки до concurrency пачек пишутся одновременно в своих сессиях: проверка, COPY и пересборка агрегатов
+    упираются в базу и распределяются по ее процессам; дубликаты между такими пачками ловятся по их ключам.
+    Память не растет с размером файла: в ней только пачки в работе и множество затронутых аккаунтов,
+    агрегаты и скоринг которых пересобираются один раз после загрузки, а не после каждой пачки.
+    Уведомления о мошенничестве в систему банка для загружаемой истории не создаются
+    """
+
+    @staticmethod
+    def read_json_lines(path: Path, chunk_size: int) -> Iterator[list[bytes]]:
+        with path.open('rb') as file:
+            lines = (line for line in file if line.strip())
+            while chunk := list(islice(lines, chunk_size)):
+                yield chunk
+
+    @staticmethod
+    def read_csv(path: Path, chunk_size: int) -> Iterator[list[dict]]:
+        with path.open(newline='', encoding='utf-8') as file:
+            rows = csv.DictReader(file)
+            while chunk := list(islice(rows, chunk_size)):
+                yield chunk
+
+    @staticmethod
+    def validate(chunk: list[bytes] | list[dict]) -> list[TransactionCreateSchema | None]:
+        """
+        Валидирует пачку целиком; если в ней есть ошибка, повторяет по строкам,
+        и некорректные строки становятся None
+        """
+        json_lines = bool(chunk) and isinstance(chunk[0], bytes)
+        try:
+            if json_lines:
+                return transactions_adapter.validate_json(b'[' + b','.join(chunk) + b']')
+            return transactions_adapter.validate_python(chunk)
+        except ValidationError:
+            pass
+        transactions = []
+        for item in chunk:
+            try:
+                if json_lines:
+                    transactions.append(transaction_adapter.validate_json(item))
+                else:
+                    transactions.append(transaction_adapter.validate_python(item))
+            except ValidationError:
+                transactions.append(None)
+        return transactions
+
+    @staticmethod
+    def is_valid(transaction: TransactionCreateSchema, now: datetime) -> bool:
+        """Проверки валидаторов TransactionModel, которые COPY обходит"""
+        return 0 < transaction.transaction_amount < MAX_AMOUNT and transaction.transaction_datetime <= now
+
+    @staticmethod
+    def key(transaction: TransactionCreateSchema) -> tuple:
+        """Ключ дубликата, как у transaction_crud.get_existing_keys"""
+        return (transaction.sender_account_id, transaction.receiver_account_id,
+                round(transaction.transaction_amount, 2), transaction.transaction_datetime)
+
+    @staticmethod
+    def to_record(transaction: TransactionCreateSchema) -> tuple:
+        return (
+            transaction.sender_account_id,
+            transaction.receiver_account_id,
+            Decimal(f'{transaction.transaction_amount:.2f}'),
+            transaction.transaction_type.name,
+            transaction.transaction_datetime,
+            transaction.transaction_status.name,
+            transaction.fraud_flag,
+            transaction.geolocation,
+            transaction.device_user.name,
+            RiskStatus.SCORED.name
+        )
+
+    async def write_chunk(
+            self,
+            transactions: list[TransactionCreateSchema],
+            score: bool,
+            touched: set[str],
+            in_flight: set[tuple] = frozenset()
+    ) -> dict[str, int]:
+        """
+        Проверяет, оценивает и записывает пачку одним коммитом; возвращает счетчики пачки.
+        in_flight - ключи более ранних пачек, которые еще пишутся; такие строки считаются дубликатами.
+        Аккаунты записанных транзакций и дубликатов добавляются в touched
+        """
+        counts = {'created': 0, 'duplicates': 0, 'rejected': 0, 'fraud': 0}
+        async with async_session_maker() as session:
+            scores = await account_crud.get_scores(
+                account_ids={transaction.sender_account_id for transaction in transactions}
+                | {transaction.receiver_account_id for transaction in transactions},
+                session=session
+            )
+            existing_keys = await transaction_crud.get_existing_keys(transactions=transactions, session=session)
+            accepted = []
+            for transaction in transactions:
+                key = self.key(transaction)
+                if transaction.sender_account_id not in scores or transaction.receiver_account_id not in scores:
+                    counts['rejected'] += 1
+                elif key in existing_keys or key in in_flight:
+                    # Аккаунты дубликатов тоже пересобираются: повторный запуск после сбоя досчитает агрегаты
+                    counts['duplicates'] += 1
+                    touched.add(transaction.sender_account_id)
+                    touched.add(transaction.receiver_account_id)
+                else:
+                    existing_keys.add(key)
+                    accepted.append(transaction)
+            if not accepted:
+                return counts
+
+            if score:
+                for transaction in accepted:
+                    transaction.fraud_flag = False
+            inserted = await transaction_crud.copy(
+                records=[self.to_record(transaction) for transaction in accepted], session=session
+            )
+            if len(inserted) < len(accepted):
+                # Ключ успел записать другой писатель после get_existing_keys
+                copied = []
+                for transaction in accepted:
+                    if self.key(transaction) in inserted:
+                        copied.append(transaction)
+                    else:
+                        counts['duplicates'] += 1
+                        touched.add(transaction.sender_account_id)
+                        touched.add(transaction.receiver_account_id)
+                accepted = copied
+            if score:
+                # Оценка после вставки: окно каждой транзакции видит более ранние транзакции той же пачки
+                features = await risk_analysis_service.get_history_features(
+                    transactions=accepted, session=session, scores=scores
+                )
+                for transaction, transaction_features in zip(accepted, features):
+                    _, transaction.fraud_flag = risk_analysis_service.score_features(
+                        transaction, transaction_features
+                    )
+                await transaction_crud.set_fraud_flags(
+                    transactions=[transaction for transaction in accepted if transaction.fraud_flag], session=session
+                )
+            await transaction_crud.commit(session)
+
+        for transaction in accepted:
+            touched.add(transaction.sender_account_id)
+            touched.add(transaction.receiver_account_id)
+
+        if score and risk_analysis_service.rules.requires(VELOCITY):
+            for transaction in accepted:
+                risk_analysis_service.velocity.observe(
+                    sender_account_id=transaction.sender_account_id,
+                    receiver_account_id=transaction.receiver_account_id,
+                    transaction_datetime=transaction.transaction_datetime,
+                    amount=transaction.transaction_amount
+                )
+        counts['created'] = len(accepted)
+        counts['fraud'] = sum(1 for transaction in accepted if transaction.fraud_flag)
+        return counts
+
+    @staticmethod
+    async def rebuild_stats(account_ids: set[str], concurrency: int) -> None:
+        """
+        Пересобирает агрегаты и скоринг затронутых аккаунтов по истории, пачками по STATS_CHUNK_SIZE,
+        до concurrency пачек одновременно
+        """
+        ordered = sorted(account_ids)
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def rebuild(chunk: list[str]) -> None:
+            async with semaphore, async_session_maker() as session:
+                await account_stats_service.rebuild(account_ids=chunk, session=session)
+                await account_crud.commit(session)
+
+        await asyncio.gather(*(
+            rebuild(ordered[start:start + STATS_CHUNK_SIZE]) for start in range(0, len(ordered), STATS_CHUNK_SIZE)
+        ))
+
+    async def ingest(
+            self,
+            path: Path,
+            file_format: str,
+            chunk_size: int,
+            score: bool,
+            concurrency: int = 1,
+            on_progress: Callable[[IngestProgress], None] | None = None
+    ) -> IngestProgress:
+        """
+        file_format - jsonl или csv; без score fraud_flag берется из файла.
+        С score пачки пишутся по одной: признаки следующей пачки считаются с учетом предыдущих
+        """
+        async with async_session_maker() as session:
+            await partition_service.maintain(session=session)
+
+        started = time.perf_counter()
+        totals = {'read': 0, 'created': 0, 'duplicates': 0, 'invalid': 0, 'rejected': 0, 'fraud': 0}
+
+        def progress() -> IngestProgress:
+            return IngestProgress(**totals, seconds=time.perf_counter() - started)
+
+        async def complete(task: asyncio.Task) -> None:
+            for key, value in (await task).items():
+                totals[key] += value
+            if on_progress is not None:
+                on_progress(progress())
+
+        writers = 1 if score else concurrency
+        touched: set[str] = set()
+        # Пачки в работе по порядку файла с ключами их транзакций
+        pending: list[tuple[asyncio.Task, set[tuple]]] = []
+        chunks = self.read_csv(path, chunk_size) if file_format == 'csv' else self.read_json_lines(path, chunk_size)
+        try:
+            for chunk in chunks:
+                now = datetime.now()
+                transactions = [
+                    transaction for transaction in self.validate(chunk)
+                    if transaction is not None and self.is_valid(transaction, now)
+                ]
+                totals['read'] += len(chunk)
+                totals['invalid'] += len(chunk) - len(transactions)
+                if not transactions:
+                    continue
+                in_flight = set().union(*(keys for _, keys in pending))
+                task = asyncio.create_task(self.write_chunk(transactions, score, touched, in_flight))
+                pending.append((task, {self.key(transaction) for transaction in transactions}))
+                if len(pending) >= writers:
+                    await complete(pending.pop(0)[0])
+            while pending:
+                await complete(pending.pop(0)[0])
+        finally:
+            for task, _ in pending:
+                task.cancel()
+            await asyncio.gather(*(task for task, _ in pending), return_exceptions=True)
+
+        await self.rebuild_stats(touched, concurrency)
+        return progress()
+
+
+ingestion_service = IngestionService()
@@ -0,0 +1,83 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session_maker
+from app.databases import partition_crud
+from app.databases.partitions import PARENT_TABLE, month_start, add_months, partition_name
+from app.schemas.partitions import PartitionSchema
+
+logger = logging.getLogger(__name__)
+
+
+class PartitionService:
+    """
+    Обслуживание помесячных секций таблицы транзакций:
+    заранее создает секции на months_ahead месяцев вперед и архивирует секции старше retention_months
+    """
+
+    def __init__(self):
+        self.crud = partition_crud
+
+    async def ensure_partitions(self, start: datetime, end: datetime, session: AsyncSession) -> list[str]:
+        """Создает недостающие секции для месяцев, пересекающих [start, end)"""
+        existing = {partition.name for partition in await self.crud.get_all(session=session)}
+        created = []
+        month = month_start(start)
+        while month < end:
+            name = partition_name(month)
+            if name not in existing:
+                await self.crud.add(
+                    partition=PartitionSchema(name=name, start=month, end=add_months(month, 1)), session=session
+                )
+                created.append(name)
+            month = add_months(month, 1)
+        return created
+
+    async def archive_partitions(self, before: datetime, session: AsyncSession) -> list[str]:
+        """Отсоединяет секции, целиком лежащие раньше before, и переименовывает их в transactions_archive_YYYY_MM"""
+        archived = []
+        for partition in await self.crud.get_all(session=session):
+            if partition.end <= before:
+                await self.crud.detach(
+                    partition=partition,
+                    archive_name=f'{PARENT_TABLE}_archive_{partition.start:%Y_%m}',
+                    session=session
+                )
+                archived.append(partition.name)
+        return archived
+
+    async def maintain(self, session: AsyncSession, now: datetime | None = None) -> None:
+        now = now or datetime.now()
+        await self.crud.lock(session=session)
+        await self.crud.add_default(session=session)
+        # Окно анализа риска всегда целиком покрыто помесячными секциями
+        created = await self.ensure_partitions(
+            start=now - timedelta(days=settings.risk.analysis_window_days),
+            end=add_months(month_start(now), settings.partition.months_ahead + 1),
+            session=session
+        )
+        archived = []
+        if settings.partition.retention_months > 0:
+            archived = await self.archive_partitions(
+                before=add_months(month_start(now), -settings.partition.retention_months), session=session
+            )
+        await self.crud.commit(session)
+        if created or archived:
+            logger.info('Partitions created: %s, archived: %s', created, archived)
+
+    async def run_forever(self) -> None:
+        """Периодическое обслуживание секций, запускается при старте приложения"""
+        while True:
+            try:
+                async with async_session_maker() as session:
+                    await self.maintain(session=session)
+            except Exception:
+                logger.exception('Partition maintenance failed')
+            await asyncio.sleep(settings.partition.maintenance_interval_hours * 3600)
+
+
+partition_service = PartitionService()
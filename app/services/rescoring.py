@@ -0,0 +1,150 @@
+import asyncio
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Callable, NamedTuple
+
+import numpy as np
+
+from app.core.db import async_session_maker
+from app.databases import account_crud, transaction_crud
+from app.services.account_stats import account_stats_service
+from app.services.scoring import score_accounts, TYPE_CODES
+
+
+class RescoreProgress(NamedTuple):
+    processed: int
+    total: int
+    transactions: int
+    seconds: float
+
+
+class RescoreChunk(NamedTuple):
+    account_ids: list[str]
+    transactions: int
+    scores: asyncio.Future
+
+
+class RescoringService:
+    """
+    Пересчет сохраненного скоринга всех аккаунтов по полной истории транзакций.
+    Главный процесс читает аккаунты пачками по account_id и их транзакции колонками,
+    пул процессов считает скоринг, результаты записываются по порядку пачек вместе с агрегатами account_stats,
+    после каждой пачки контрольная точка сохраняется в файл
+    """
+
+    @staticmethod
+    def load_checkpoint(path: Path) -> dict:
+        if not path.exists():
+            return {'after': None, 'processed': 0, 'transactions': 0}
+        return json.loads(path.read_text())
+
+    @staticmethod
+    def save_checkpoint(path: Path, checkpoint: dict) -> None:
+        """Через временный файл, чтобы прерывание не оставило половину записи"""
+        temporary = path.with_name(path.name + '.tmp')
+        temporary.write_text(json.dumps(checkpoint))
+        os.replace(temporary, path)
+
+    @staticmethod
+    async def read_chunk(account_ids: list[str]) -> tuple[list[tuple[int, int]], tuple[np.ndarray, ...], int]:
+        """Колонки транзакций пачки аккаунтов и срезы каждого аккаунта в порядке account_ids"""
+        async with async_session_maker() as session:
+            rows = await transaction_crud.get_accounts_score_rows(
+                account_ids=account_ids, type_codes=TYPE_CODES, session=session
+            )
+        count = len(rows)
+        ranges: dict[str, tuple[int, int]] = {}
+        start = 0
+        for index in range(1, count + 1):
+            if index == count or rows[index][0] != rows[start][0]:
+                ranges[rows[start][0]] = (start, index)
+                start = index
+        columns = (
+            np.fromiter((row[1] for row in rows), dtype=np.int64, count=count),
+            np.fromiter((row[2] for row in rows), dtype=np.float64, count=count),
+            np.fromiter((row[3] for row in rows), dtype=bool, count=count),
+            np.fromiter((row[4] for row in rows), dtype=np.int8, count=count),
+            np.fromiter((row[5] for row in rows), dtype=bool, count=count)
+        )
+        bounds = [ranges.get(account_id, (0, 0)) for account_id in account_ids]
+        return bounds, columns, count
+
+    @staticmethod
+    async def write_scores(account_ids: list[str], scores: list[float]) -> None:
+        """
+        Записывает скоринг пачки вместе с пересобранными агрегатами account_stats. Иначе следующая
+        транзакция аккаунта пересчитает скоринг из агрегатов со старыми весами и вернет прежнее значение
+        """
+        async with async_session_maker() as session:
+            await account_stats_service.rebuild_aggregates(account_ids=account_ids, session=session)
+            await account_crud.update_scores(scores=dict(zip(account_ids, scores)), session=session)
+            await account_crud.commit(session)
+
+    async def rescore(
+            self,
+            checkpoint_path: Path,
+            chunk_size: int,
+            workers: int,
+            on_progress: Callable[[RescoreProgress], None] | None = None
+    ) -> RescoreProgress:
+        checkpoint = self.load_checkpoint(checkpoint_path)
+        async with async_session_maker() as session:
+            total = await account_crud.count(session=session, after=checkpoint['after'])
+        started = time.perf_counter()
+        # Прогресс считается по этому запуску, итоги всех запусков хранит контрольная точка
+        processed = 0
+        transactions = 0
+
+        def progress() -> RescoreProgress:
+            return RescoreProgress(
+                processed=processed,
+                total=total,
+                transactions=transactions,
+                seconds=time.perf_counter() - started
+            )
+
+        async def complete(chunk: RescoreChunk) -> None:
+            nonlocal processed, transactions
+            await self.write_scores(chunk.account_ids, await chunk.scores)
+            checkpoint['after'] = chunk.account_ids[-1]
+            checkpoint['processed'] += len(chunk.account_ids)
+            checkpoint['transactions'] += chunk.transactions
+            self.save_checkpoint(checkpoint_path, checkpoint)
+            processed += len(chunk.account_ids)
+            transactions += chunk.transactions
+            if on_progress is not None:
+                on_progress(progress())
+
+        loop = asyncio.get_running_loop()
+        # spawn: дочерние процессы не наследуют цикл событий и соединения пула главного процесса
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+            pending: deque[RescoreChunk] = deque()
+            after = checkpoint['after']
+            while True:
+                async with async_session_maker() as session:
+                    account_ids = await account_crud.get_ids(session=session, limit=chunk_size, after=after)
+                if not account_ids:
+                    break
+                after = account_ids[-1]
+                bounds, columns, count = await self.read_chunk(account_ids)
+                pending.append(RescoreChunk(
+                    account_ids=account_ids,
+                    transactions=count,
+                    scores=loop.run_in_executor(pool, score_accounts, bounds, *columns)
+                ))
+                # Пока пул считает, главный процесс читает следующие пачки
+                if len(pending) > workers:
+                    await complete(pending.popleft())
+            while pending:
+                await complete(pending.popleft())
+
+        checkpoint_path.unlink(missing_ok=True)
+        return progress()
+
+
+rescoring_service = RescoringService()
@@ -1,30 +1,33 @@
+import time
 from datetime import datetime, timedelta
-from typing import List, Tuple
-from sqlalchemy import select, func
+from typing import Callable, Tuple
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.models.transactions import TransactionModel
-from app.models.accounts import AccountModel
+from app.core.config import settings
+from app.core.logger import audit_logger
+from app.core.metrics import metrics
+from app.schemas.risk import RiskFeaturesSchema
 from app.schemas.transactions import TransactionCreateSchema
-from app.databases import transaction_crud
+from app.databases import transaction_crud, account_crud
+from app.services.risk_profiles import risk_profile_cache
+from app.services.risk_rules import risk_rule_engine, RiskEvaluation, RECEIVER_SCORE, SENDER_WINDOW, VELOCITY
+from app.services.velocity import velocity_counters
 
+risk_stage_seconds = metrics.histogram(
+    'risk_stage_duration_seconds', 'Время этапа анализа риска: получение признаков и правила', ('stage',)
+)
 
-class RiskAnalysisService:
-    # Пороговые значения для анализа
-    HIGH_RISK_THRESHOLD = 0.80
-    AMOUNT_THRESHOLD = 10000
-    AMOUNT_INCREASE_THRESHOLD = 3.0  # 300%
-    FRAUD_RISK_THRESHOLD = 0.6
-    RISK_SCORE_WEIGHTS = {
-        'receiver_risk': 0.3,
-        'amount_anomaly': 0.3,
-        'location_anomaly': 0.2,
-        'device_anomaly': 0.2
-    }
 
+class RiskAnalysisService:
     def __init__(self):
-        self.analysis_window_days = 7
+        self.analysis_window_days = settings.risk.analysis_window_days
         self.crud = transaction_crud
+        self.account_crud = account_crud
+        self.profiles = risk_profile_cache
+        self.rules = risk_rule_engine
+        self.velocity = velocity_counters
+        # Текущее время для окна анализа; воспроизведение истории подменяет его временем транзакции
+        self.clock: Callable[[], datetime] = datetime.now
 
     async def analyze_transaction(
         self,
@@ -34,95 +37,227 @@ class RiskAnalysisService:
         """
         Анализирует транзакцию и возвращает кортеж (оценка риска, флаг подозрительности)
         """
-        risk_score = 0.0
-        
-        start_date = datetime.now() - timedelta(days=self.analysis_window_days)
-        
-        receiver_risk = await self._get_account_risk(
-            transaction.receiver_account_id, session
-        )
-        if receiver_risk >= self.HIGH_RISK_THRESHOLD:
-            risk_score += self.RISK_SCORE_WEIGHTS['receiver_risk']
-
-        if await self._is_amount_anomaly(transaction, start_date, session):
-            risk_score += self.RISK_SCORE_WEIGHTS['amount_anomaly']
-
-        if await self._is_location_anomaly(transaction, start_date, session):
-            risk_score += self.RISK_SCORE_WEIGHTS['location_anomaly']
-
-        if await self._is_device_anomaly(transaction, start_date, session):
-            risk_score += self.RISK_SCORE_WEIGHTS['device_anomaly']
-
-        is_fraud = risk_score > self.FRAUD_RISK_THRESHOLD
-
-        return risk_score, is_fraud
-
-    async def _get_account_risk(
-        self, account_id: str, session: AsyncSession
-    ) -> float:
-        """Получает уровень риска аккаунта"""
-        result = await session.execute(
-            select(AccountModel.score).where(AccountModel.account_id == account_id)
-        )
-        return result.scalar_one_or_none() or 0.0
-
-    async def _is_amount_anomaly(
-        self, 
+        features = await self.get_features(transaction, session)
+        return self.score_features(transaction, features)
+
+    async def get_features(
+        self,
+        transaction: TransactionCreateSchema,
+        session: AsyncSession
+    ) -> RiskFeaturesSchema:
+        """Собирает признаки транзакции; запрашиваются только источники, нужные правилам"""
+        features = await self.get_stored_features(transaction, session)
+        if self.rules.requires(VELOCITY):
+            started = time.perf_counter()
+            for name, value in self.get_velocity_features(transaction).items():
+                setattr(features, name, value)
+            risk_stage_seconds.observe(time.perf_counter() - started, 'velocity')
+        return features
+
+    async def get_stored_features(
+        self,
         transaction: TransactionCreateSchema,
-        start_date: datetime,
         session: AsyncSession
-    ) -> bool:
-        """Проверяет, является ли сумма транзакции аномальной"""
-        if transaction.transaction_amount <= self.AMOUNT_THRESHOLD:
-            return False
-
-        result = await session.execute(
-            select(func.avg(TransactionModel.transaction_amount))
-            .where(
-                TransactionModel.sender_account_id == transaction.sender_account_id,
-                TransactionModel.transaction_datetime >= start_date
+    ) -> RiskFeaturesSchema:
+        """Признаки за окно анализа из БД или кэша профилей"""
+        sender_window = self.rules.requires(SENDER_WINDOW)
+        receiver_score = self.rules.requires(RECEIVER_SCORE)
+        if not (sender_window or receiver_score):
+            return RiskFeaturesSchema()
+
+        started = time.perf_counter()
+        if not settings.risk.profile_cache_enabled:
+            now = self.clock()
+            features = await self.crud.get_risk_features(
+                transaction=transaction,
+                start_date=now - timedelta(days=self.analysis_window_days),
+                end_date=now,
+                session=session,
+                sender_window=sender_window,
+                receiver_score=receiver_score
             )
-        )
-        avg_amount = result.scalar_one_or_none() or 0.0
+            risk_stage_seconds.observe(time.perf_counter() - started, 'features_query')
+            return features
 
-        if avg_amount == 0:
-            return False
+        features = RiskFeaturesSchema()
+        if sender_window:
+            now = self.clock()
+            profile = self.profiles.get_profile(transaction.sender_account_id, now=now)
+            if profile is None:
+                rows = await self.crud.get_sender_window_buckets(
+                    sender_account_id=transaction.sender_account_id,
+                    start_date=self.profiles.window_start(now),
+                    end_date=now,
+                    bucket_seconds=self.profiles.bucket_seconds,
+                    session=session
+                )
+                profile = self.profiles.put_profile(transaction.sender_account_id, rows)
+            features.avg_amount, features.geolocations, features.devices = profile.window()
+            risk_stage_seconds.observe(time.perf_counter() - started, 'sender_window')
 
-        return transaction.transaction_amount > (
-            avg_amount * self.AMOUNT_INCREASE_THRESHOLD
-        )
+        if receiver_score:
+            started = time.perf_counter()
+            score = self.profiles.get_score(transaction.receiver_account_id)
+            if score is None:
+                score = await self.account_crud.get_score(
+                    account_id=transaction.receiver_account_id, session=session
+                ) or 0.0
+                self.profiles.put_score(transaction.receiver_account_id, score)
+            features.receiver_score = score
+            risk_stage_seconds.observe(time.perf_counter() - started, 'receiver_score')
+        return features
 
-    async def _is_location_anomaly(
+    async def get_batch_features(
         self,
-        transaction: TransactionCreateSchema,
-        start_date: datetime,
-        session: AsyncSession
-    ) -> bool:
-        """Проверяет, является ли геолокация аномальной"""
-        result = await session.execute(
-            select(TransactionModel.geolocation)
-            .where(
-                TransactionModel.sender_account_id == transaction.sender_account_id,
-                TransactionModel.transaction_datetime >= start_date
+        transactions: list[TransactionCreateSchema],
+        session: AsyncSession,
+        scores: dict[str, float] | None = None,
+        exclude_ids: list[int] | None = None
+    ) -> list[RiskFeaturesSchema]:
+        """
+        Собирает признаки для пачки транзакций сгруппированными запросами.
+        Все транзакции пачки оцениваются по состоянию БД до ее вставки;
+        если пачка уже сохранена, ее id передаются в exclude_ids
+        """
+        started = time.perf_counter()
+        windows = [RiskFeaturesSchema()] * len(transactions)
+        if self.rules.requires(SENDER_WINDOW):
+            now = self.clock()
+            sender_windows = await self.crud.get_senders_window_features(
+                sender_ids={transaction.sender_account_id for transaction in transactions},
+                start_date=now - timedelta(days=self.analysis_window_days),
+                end_date=now,
+                session=session,
+                exclude_ids=exclude_ids
+            )
+            windows = [
+                sender_windows.get(transaction.sender_account_id) or RiskFeaturesSchema()
+                for transaction in transactions
+            ]
+        features = await self._complete_batch_features(transactions, windows, session, scores)
+        risk_stage_seconds.observe(time.perf_counter() - started, 'batch_features')
+        return features
+
+    async def get_history_features(
+        self,
+        transactions: list[TransactionCreateSchema],
+        session: AsyncSession,
+        scores: dict[str, float] | None = None
+    ) -> list[RiskFeaturesSchema]:
+        """
+        Признаки для загрузки истории: каждая транзакция оценивается на момент своего transaction_datetime,
+        окно отправителя ограничено сверху ее временем. Пачка уже отправлена в БД в транзакции сессии,
+        поэтому ее более ранние транзакции попадают в окна следующих, а более поздние - нет
+        """
+        started = time.perf_counter()
+        windows = [RiskFeaturesSchema()] * len(transactions)
+        if self.rules.requires(SENDER_WINDOW):
+            windows = await self.crud.get_window_features_at(
+                transactions=transactions, window=timedelta(days=self.analysis_window_days), session=session
+            )
+        features = await self._complete_batch_features(transactions, windows, session, scores)
+        risk_stage_seconds.observe(time.perf_counter() - started, 'history_features')
+        return features
+
+    async def _complete_batch_features(
+        self,
+        transactions: list[TransactionCreateSchema],
+        windows: list[RiskFeaturesSchema],
+        session: AsyncSession,
+        scores: dict[str, float] | None
+    ) -> list[RiskFeaturesSchema]:
+        """
+        Дополняет окна отправителей скорингом получателей и признаками скорости.
+        Живые счетчики скорости не меняются: транзакции пачки учитываются в них после коммита
+        """
+        if not self.rules.requires(RECEIVER_SCORE):
+            scores = {}
+        elif scores is None:
+            scores = await self.account_crud.get_scores(
+                account_ids={transaction.receiver_account_id for transaction in transactions},
+                session=session
             )
-            .distinct()
-        )
-        recent_locations = {row[0] for row in result.all()}
+        features = [
+            window.model_copy(update={'receiver_score': scores.get(transaction.receiver_account_id) or 0.0})
+            for transaction, window in zip(transactions, windows)
+        ]
+        if self.rules.requires(VELOCITY):
+            # Скорость копится внутри пачки по времени транзакций: каждая видит более ранние транзакции пачки
+            counters = self.velocity.scratch({transaction.sender_account_id for transaction in transactions})
+            order = sorted(range(len(transactions)), key=lambda index: transactions[index].transaction_datetime)
+            for index in order:
+                transaction = transactions[index]
+                for name, value in counters.features(
+                    transaction.sender_account_id, transaction.transaction_datetime
+                ).items():
+                    setattr(features[index], name, value)
+                counters.observe(
+                    sender_account_id=transaction.sender_account_id,
+                    receiver_account_id=transaction.receiver_account_id,
+                    transaction_datetime=transaction.transaction_datetime,
+                    amount=transaction.transaction_amount
+                )
+        return features
 
-        return len(recent_locations) > 0 and transaction.geolocation not in recent_locations
+    def get_velocity_features(self, transaction: TransactionCreateSchema) -> dict[str, float]:
+        """Скорость отправителя по счетчикам в памяти, без обращения к БД"""
+        return self.velocity.features(transaction.sender_account_id, transaction.transaction_datetime)
 
-    async def _is_device_anomaly(
+    def observe_transaction(self, transaction: TransactionCreateSchema) -> None:
+        """Обновляет профиль и счетчики скорости отправителя после коммита транзакции"""
+        if self.rules.requires(VELOCITY):
+            self.velocity.observe(
+                sender_account_id=transaction.sender_account_id,
+                receiver_account_id=transaction.receiver_account_id,
+                transaction_datetime=transaction.transaction_datetime,
+                amount=transaction.transaction_amount
+            )
+        if settings.risk.profile_cache_enabled:
+            self.profiles.observe(
+                sender_account_id=transaction.sender_account_id,
+                transaction_datetime=transaction.transaction_datetime,
+                amount=transaction.transaction_amount,
+                geolocation=transaction.geolocation,
+                device=transaction.device_user,
+                now=self.clock()
+            )
+
+    def observe_scores(self, scores: dict[str, float]) -> None:
+        """Подменяет закэшированный скоринг аккаунтов свежими значениями"""
+        if settings.risk.profile_cache_enabled:
+            for account_id, score in scores.items():
+                self.profiles.put_score(account_id, score)
+
+    def score_features(
         self,
         transaction: TransactionCreateSchema,
-        start_date: datetime,
-        session: AsyncSession
-    ) -> bool:
-        """Проверяет, является ли устройство аномальным"""
+        features: RiskFeaturesSchema
+    ) -> Tuple[float, bool]:
+        """Применяет правила к готовым признакам, без обращения к БД"""
+        evaluation = self.evaluate(transaction, features)
+        return evaluation.score, evaluation.is_fraud
 
-        recent_devices = await self.crud.get_transaction_devices(
-            transaction=transaction, start_date=start_date, session=session
-        )
-        return len(recent_devices) > 0 and transaction.device_user not in recent_devices
+    def evaluate(self, transaction: TransactionCreateSchema, features: RiskFeaturesSchema) -> RiskEvaluation:
+        """То же, что score_features, с результатом и временем каждого правила"""
+        started = time.perf_counter()
+        evaluation = self.rules.evaluate(transaction, features)
+        risk_stage_seconds.observe(time.perf_counter() - started, 'rules')
+        if evaluation.is_fraud:
+            audit_logger.warning(
+                'Suspicious transaction',
+                extra={
+                    'sender_account_id': transaction.sender_account_id,
+                    'receiver_account_id': transaction.receiver_account_id,
+                    'transaction_amount': transaction.transaction_amount,
+                    'transaction_type': transaction.transaction_type.value,
+                    'transaction_datetime': transaction.transaction_datetime.isoformat(),
+                    'geolocation': transaction.geolocation,
+                    'device_user': transaction.device_user.value,
+                    'risk_score': evaluation.score,
+                    'rules': [rule.name for rule in evaluation.rules if rule.hit]
+                }
+            )
+        return evaluation
 
 
 risk_analysis_service = RiskAnalysisService()
@@ -0,0 +1,205 @@
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.enums import DeviceUser
+from app.schemas.risk import RiskBucketSchema
+
+EPOCH = datetime(1970, 1, 1)
+
+# Приблизительная стоимость объектов в памяти, байт
+PROFILE_OVERHEAD = 400
+BUCKET_OVERHEAD = 600
+ITEM_OVERHEAD = 60
+
+
+def to_bucket(moment: datetime, bucket_seconds: int) -> int:
+    """Номер временной корзины; наивное время считается UTC, как extract(epoch) в PostgreSQL"""
+    return int((moment - EPOCH).total_seconds() // bucket_seconds)
+
+
+class ProfileBucket:
+    __slots__ = ('count', 'amount_sum', 'geolocations', 'devices')
+
+    def __init__(self):
+        self.count = 0
+        self.amount_sum = 0.0
+        self.geolocations: set[str] = set()
+        self.devices: set[DeviceUser] = set()
+
+    def size(self) -> int:
+        return (
+            BUCKET_OVERHEAD
+            + sum(ITEM_OVERHEAD + len(geolocation) for geolocation in self.geolocations)
+            + ITEM_OVERHEAD * len(self.devices)
+        )
+
+
+class SenderProfile:
+    """Агрегаты отправителя за окно анализа, разбитые на временные корзины"""
+    __slots__ = ('buckets', 'loaded_at', 'size')
+
+    def __init__(self, loaded_at: float):
+        self.buckets: dict[int, ProfileBucket] = {}
+        self.loaded_at = loaded_at
+        self.size = PROFILE_OVERHEAD
+
+    @classmethod
+    def from_buckets(cls, rows: list[RiskBucketSchema], loaded_at: float) -> 'SenderProfile':
+        profile = cls(loaded_at=loaded_at)
+        for row in rows:
+            bucket = ProfileBucket()
+            bucket.count = row.count
+            bucket.amount_sum = row.amount_sum
+            bucket.geolocations = row.geolocations
+            bucket.devices = row.devices
+            profile.buckets[row.bucket] = bucket
+            profile.size += bucket.size()
+        return profile
+
+    def add(self, bucket_id: int, amount: float, geolocation: str, device: DeviceUser) -> None:
+        bucket = self.buckets.get(bucket_id)
+        if bucket is None:
+            bucket = self.buckets[bucket_id] = ProfileBucket()
+        else:
+            self.size -= bucket.size()
+        bucket.count += 1
+        bucket.amount_sum += amount
+        bucket.geolocations.add(geolocation)
+        bucket.devices.add(device)
+        self.size += bucket.size()
+
+    def expire(self, min_bucket: int) -> None:
+        for bucket_id in [bucket_id for bucket_id in self.buckets if bucket_id < min_bucket]:
+            self.size -= self.buckets.pop(bucket_id).size()
+
+    def window(self) -> tuple[float, set[str], set[DeviceUser]]:
+        """Средняя сумма, геолокации и устройства по живым корзинам"""
+        count = 0
+        amount_sum = 0.0
+        geolocations: set[str] = set()
+        devices: set[DeviceUser] = set()
+        for bucket in self.buckets.values():
+            count += bucket.count
+            amount_sum += bucket.amount_sum
+            geolocations |= bucket.geolocations
+            devices |= bucket.devices
+        avg_amount = amount_sum / count if count else 0.0
+        return avg_amount, geolocations, devices
+
+
+class RiskProfileCache:
+    """
+    LRU-кэш профилей отправителей и скоринга аккаунтов для анализа риска.
+    Окно выравнивается по границе корзины, поэтому может захватывать до одной корзины раньше.
+    Профили живут не дольше ttl_seconds, чтобы подтягивать вставки из других процессов.
+    """
+
+    def __init__(self, window_days: int, bucket_seconds: int, max_bytes: int, ttl_seconds: int):
+        self.window_seconds = window_days * 86400
+        self.bucket_seconds = bucket_seconds
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._profiles: OrderedDict[str, SenderProfile] = OrderedDict()
+        self._scores: OrderedDict[str, tuple[float, float]] = OrderedDict()
+        self._size = 0
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self) -> int:
+        return len(self._profiles)
+
+    def window_start(self, now: datetime) -> datetime:
+        """Начало окна анализа, выровненное по корзине, для загрузки профиля из БД"""
+        bucket_id = self.min_bucket(now)
+        return EPOCH + timedelta(seconds=bucket_id * self.bucket_seconds)
+
+    def min_bucket(self, now: datetime) -> int:
+        return to_bucket(now, self.bucket_seconds) - self.window_seconds // self.bucket_seconds
+
+    def get_profile(self, sender_account_id: str, now: datetime) -> SenderProfile | None:
+        profile = self._profiles.get(sender_account_id)
+        if profile is None or time.monotonic() - profile.loaded_at > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._profiles.move_to_end(sender_account_id)
+        self._size -= profile.size
+        profile.expire(self.min_bucket(now))
+        self._size += profile.size
+        return profile
+
+    def put_profile(self, sender_account_id: str, rows: list[RiskBucketSchema]) -> SenderProfile:
+        self._drop_profile(sender_account_id)
+        profile = SenderProfile.from_buckets(rows, loaded_at=time.monotonic())
+        self._profiles[sender_account_id] = profile
+        self._size += profile.size
+        self._evict()
+        return profile
+
+    def get_score(self, account_id: str) -> float | None:
+        cached = self._scores.get(account_id)
+        if cached is None or time.monotonic() - cached[1] > self.ttl_seconds:
+            return None
+        self._scores.move_to_end(account_id)
+        return cached[0]
+
+    def put_score(self, account_id: str, score: float) -> None:
+        if account_id not in self._scores:
+            self._size += ITEM_OVERHEAD + sys.getsizeof(account_id)
+        self._scores[account_id] = (score, time.monotonic())
+        self._scores.move_to_end(account_id)
+        self._evict()
+
+    def observe(
+            self,
+            sender_account_id: str,
+            transaction_datetime: datetime,
+            amount: float,
+            geolocation: str,
+            device: DeviceUser,
+            now: datetime | None = None
+    ) -> None:
+        """Инкрементально учитывает закоммиченную транзакцию в профиле отправителя"""
+        profile = self._profiles.get(sender_account_id)
+        if profile is None:
+            return
+        bucket_id = to_bucket(transaction_datetime, self.bucket_seconds)
+        if bucket_id < self.min_bucket(now or datetime.now()):
+            return
+        self._size -= profile.size
+        profile.add(bucket_id, amount, geolocation, device)
+        self._size += profile.size
+        self._evict()
+
+    def clear(self) -> None:
+        self._profiles.clear()
+        self._scores.clear()
+        self._size = 0
+
+    def _drop_profile(self, sender_account_id: str) -> None:
+        profile = self._profiles.pop(sender_account_id, None)
+        if profile is not None:
+            self._size -= profile.size
+
+    def _evict(self) -> None:
+        while self._size > self.max_bytes and self._profiles:
+            _, profile = self._profiles.popitem(last=False)
+            self._size -= profile.size
+        while self._size > self.max_bytes and self._scores:
+            account_id, _ = self._scores.popitem(last=False)
+            self._size -= ITEM_OVERHEAD + sys.getsizeof(account_id)
+
+
+risk_profile_cache = RiskProfileCache(
+    window_days=settings.risk.analysis_window_days,
+    bucket_seconds=settings.risk.profile_bucket_seconds,
+    max_bytes=settings.risk.profile_cache_max_mb * 1024 * 1024,
+    ttl_seconds=settings.risk.profile_ttl_seconds
+)
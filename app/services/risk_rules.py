@@ -0,0 +1,145 @@
+import time
+from operator import attrgetter
+from typing import Any, Callable, NamedTuple
+
+from app.core.config import settings, RiskRuleConfig
+from app.schemas.risk import RiskFeaturesSchema, RiskRuleStatsSchema
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.velocity import VELOCITY_FEATURES
+
+# Источники признаков: каждый нужный правилам источник запрашивается один раз на транзакцию или пачку
+RECEIVER_SCORE = 'receiver_score'
+SENDER_WINDOW = 'sender_window'
+VELOCITY = 'velocity'  # счетчики в памяти, без обращения к БД
+
+FEATURE_SOURCES = {
+    'receiver_score': RECEIVER_SCORE,
+    'receiver_risk': RECEIVER_SCORE,
+    'avg_amount': SENDER_WINDOW,
+    'geolocations': SENDER_WINDOW,
+    'devices': SENDER_WINDOW,
+    **dict.fromkeys(VELOCITY_FEATURES, VELOCITY)
+}
+
+Predicate = Callable[[TransactionCreateSchema, RiskFeaturesSchema], Any]
+
+
+def _at_least(rule: RiskRuleConfig) -> Predicate:
+    feature = attrgetter(rule.feature)
+    threshold = rule.threshold
+    return lambda transaction, features: feature(features) >= threshold
+
+
+def _above_average(rule: RiskRuleConfig) -> Predicate:
+    average = attrgetter(rule.feature)
+    min_amount = rule.min_amount
+    ratio = rule.ratio
+
+    def predicate(transaction: TransactionCreateSchema, features: RiskFeaturesSchema) -> bool:
+        amount = transaction.transaction_amount
+        if amount <= min_amount:
+            return False
+        value = average(features)
+        return value != 0 and amount > value * ratio
+
+    return predicate
+
+
+def _not_seen(rule: RiskRuleConfig) -> Predicate:
+    if rule.field not in TransactionCreateSchema.model_fields:
+        raise ValueError(f'Правило {rule.name}: неизвестное поле транзакции {rule.field}')
+    seen = attrgetter(rule.feature)
+    field = attrgetter(rule.field)
+
+    def predicate(transaction: TransactionCreateSchema, features: RiskFeaturesSchema) -> bool:
+        values = seen(features)
+        return len(values) > 0 and field(transaction) not in values
+
+    return predicate
+
+
+CHECKS: dict[str, Callable[[RiskRuleConfig], Predicate]] = {
+    'at_least': _at_least,
+    'above_average': _above_average,
+    'not_seen': _not_seen
+}
+
+
+class CompiledRule(NamedTuple):
+    name: str
+    weight: float
+    predicate: Predicate
+
+
+class RuleResult(NamedTuple):
+    name: str
+    hit: bool
+    seconds: float
+
+
+class RiskEvaluation(NamedTuple):
+    score: float
+    is_fraud: bool
+    rules: list[RuleResult]
+
+
+def compile_rule(rule: RiskRuleConfig) -> CompiledRule:
+    if rule.check not in CHECKS:
+        raise ValueError(f'Правило {rule.name}: неизвестная проверка {rule.check}')
+    if rule.feature not in FEATURE_SOURCES:
+        raise ValueError(f'Правило {rule.name}: неизвестный признак {rule.feature}')
+    return CompiledRule(name=rule.name, weight=rule.weight, predicate=CHECKS[rule.check](rule))
+
+
+class RiskRuleEngine:
+    """
+    Правила оценки риска из settings.toml, скомпилированные в функции при старте; правила с enabled = false
+    пропускаются. Правила работают только с готовыми признаками и в БД не ходят
+    """
+
+    def __init__(self, rules: list[RiskRuleConfig], fraud_threshold: float):
+        rules = [rule for rule in rules if rule.enabled]
+        self.rules = [compile_rule(rule) for rule in rules]
+        self.fraud_threshold = fraud_threshold
+        self.sources = frozenset(FEATURE_SOURCES[rule.feature] for rule in rules)
+        self.evaluations = 0
+        self.frauds = 0
+        self.hits = [0] * len(self.rules)
+        self.seconds = [0.0] * len(self.rules)
+
+    def requires(self, source: str) -> bool:
+        return source in self.sources
+
+    def evaluate(self, transaction: TransactionCreateSchema, features: RiskFeaturesSchema) -> RiskEvaluation:
+        """Сумма весов сработавших правил и время каждого правила"""
+        score = 0.0
+        results = []
+        for index, rule in enumerate(self.rules):
+            started = time.perf_counter()
+            hit = bool(rule.predicate(transaction, features))
+            seconds = time.perf_counter() - started
+            if hit:
+                score += rule.weight
+                self.hits[index] += 1
+            self.seconds[index] += seconds
+            results.append(RuleResult(name=rule.name, hit=hit, seconds=seconds))
+        self.evaluations += 1
+        is_fraud = score > self.fraud_threshold
+        self.frauds += is_fraud
+        return RiskEvaluation(score=score, is_fraud=is_fraud, rules=results)
+
+    def stats(self) -> list[RiskRuleStatsSchema]:
+        return [
+            RiskRuleStatsSchema(
+                name=rule.name,
+                weight=rule.weight,
+                evaluations=self.evaluations,
+                hits=self.hits[index],
+                seconds_total=self.seconds[index],
+                seconds_avg=self.seconds[index] / self.evaluations if self.evaluations else 0.0
+            )
+            for index, rule in enumerate(self.rules)
+        ]
+
+
+risk_rule_engine = RiskRuleEngine(rules=settings.risk.rules, fraud_threshold=settings.risk.fraud_threshold)
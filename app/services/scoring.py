@@ -0,0 +1,187 @@
+import math
+from datetime import datetime
+from typing import Iterable, NamedTuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.enums import TransactionStatus, TransactionType
+from app.schemas.transactions import TransactionSchema
+
+DAY_US = 86_400_000_000
+DECAY_DAYS = 30
+# Скоринг аккаунта с историей меньше 5 транзакций
+NEW_ACCOUNT_SCORE = 50
+
+TYPE_CODES = {
+    TransactionType.TRANSFER: 0,
+    TransactionType.DEPOSIT: 1,
+    TransactionType.WITHDRAWAL: 2
+}
+# Те же объекты, что и в эталонной реализации: int 1 и float складываются в sum() по-разному
+TYPE_WEIGHTS = [1, 0.9, 0.8]
+
+# Веса давности считаются обычным float, как в AccountService._calculate_account_score,
+# чтобы не зависеть от реализации pow в numpy
+DECAY_WEIGHTS = np.array(
+    [max(0.1, 1 - (age_days / DECAY_DAYS)) ** 2 for age_days in range(DECAY_DAYS + 1)],
+    dtype=np.float64
+)
+
+
+class TransactionColumns(NamedTuple):
+    """Транзакции аккаунта в колоночном виде"""
+    timestamps: np.ndarray  # микросекунды от эпохи, int64
+    amounts: np.ndarray  # float64
+    successful: np.ndarray  # bool
+    types: np.ndarray  # коды TYPE_CODES, int8
+    fraud: np.ndarray  # bool
+
+    @classmethod
+    def from_values(
+            cls,
+            datetimes: list[datetime],
+            amounts: Iterable,
+            successful: Iterable[bool],
+            types: Iterable[TransactionType],
+            fraud: Iterable[bool]
+    ) -> 'TransactionColumns':
+        count = len(datetimes)
+        return cls(
+            timestamps=np.array(datetimes, dtype='datetime64[us]').astype(np.int64),
+            amounts=np.fromiter(amounts, dtype=np.float64, count=count),
+            successful=np.fromiter(successful, dtype=bool, count=count),
+            types=np.fromiter(map(TYPE_CODES.__getitem__, types), dtype=np.int8, count=count),
+            fraud=np.fromiter(fraud, dtype=bool, count=count)
+        )
+
+    @classmethod
+    def from_rows(cls, rows: list) -> 'TransactionColumns':
+        """Строки (дата, сумма, успешна, тип, фрод)"""
+        if not rows:
+            return cls.from_values([], [], [], [], [])
+        datetimes, amounts, successful, types, fraud = zip(*rows)
+        return cls.from_values(list(datetimes), amounts, successful, types, fraud)
+
+    @classmethod
+    def from_schemas(cls, transactions: list[TransactionSchema]) -> 'TransactionColumns':
+        return cls.from_values(
+            [transaction.transaction_datetime for transaction in transactions],
+            (transaction.transaction_amount for transaction in transactions),
+            (transaction.transaction_status == TransactionStatus.SUCCESS for transaction in transactions),
+            (transaction.transaction_type for transaction in transactions),
+            (transaction.fraud_flag for transaction in transactions)
+        )
+
+
+class ScoreAggregates(NamedTuple):
+    """Агрегаты, из которых складывается скоринг аккаунта"""
+    transaction_count: int
+    weighted_count: float  # сумма весов давности
+    gap_days_sum: int  # сумма интервалов в днях между соседними по времени транзакциями
+    successful: int
+    type_weight_sum: float
+    fraud_count: int
+    amount_score: float  # сумма ограниченных логарифмов сумм успешных транзакций
+
+
+class AccountScoringEngine:
+    """
+    Векторизованный расчет скоринга аккаунта.
+    Результат побитово совпадает с AccountService._calculate_account_score:
+    последовательные суммы считаются через cumsum, а не попарным np.sum
+    """
+
+    @classmethod
+    def calculate(cls, columns: TransactionColumns) -> float:
+        return cls.combine(cls.aggregate(columns))
+
+    @staticmethod
+    def aggregate(columns: TransactionColumns) -> ScoreAggregates:
+        transaction_count = len(columns.timestamps)
+        if transaction_count == 0:
+            return ScoreAggregates(0, 0.0, 0, 0, 0.0, 0, 0.0)
+
+        timestamps = columns.timestamps
+        age_days = (timestamps.max() - timestamps) // DAY_US
+        weights = DECAY_WEIGHTS[np.minimum(age_days, DECAY_DAYS)]
+
+        # встроенный sum сохраняет порядок и способ округления эталонной реализации
+        type_weight_sum = sum(map(TYPE_WEIGHTS.__getitem__, columns.types.tolist()))
+
+        # math.log10 вместо np.log10: SIMD-реализации numpy могут расходиться в последнем бите
+        successful_amounts = (columns.amounts[columns.successful] + 1).tolist()
+        amount_score = 0
+        if successful_amounts:
+            logs = np.fromiter(map(math.log10, successful_amounts), dtype=np.float64, count=len(successful_amounts))
+            amount_score = float(np.cumsum(np.minimum(logs * 2, 5))[-1])
+
+        return ScoreAggregates(
+            transaction_count=transaction_count,
+            weighted_count=float(np.cumsum(weights)[-1]),
+            gap_days_sum=int((np.diff(np.sort(timestamps)) // DAY_US).sum()),
+            successful=int(np.count_nonzero(columns.successful)),
+            type_weight_sum=type_weight_sum,
+            fraud_count=int(np.count_nonzero(columns.fraud)),
+            amount_score=amount_score
+        )
+
+    @staticmethod
+    def combine(aggregates: ScoreAggregates) -> float:
+        transaction_count = aggregates.transaction_count
+        if transaction_count < 5:
+            return NEW_ACCOUNT_SCORE
+
+        count_score = min(
+            aggregates.weighted_count / settings.score.TRANSACTIONS_COUNT_WEIGHT, 1.0
+        ) * settings.score.TRANSACTIONS_COUNT_WEIGHT
+
+        avg_diff = aggregates.gap_days_sum / (transaction_count - 1)
+        if avg_diff > 0:
+            freq_score = min(1.0 / avg_diff, 1.0) * settings.score.TRANSACTIONS_FREQUENCY_WEIGHT
+        else:
+            freq_score = settings.score.TRANSACTIONS_FREQUENCY_WEIGHT
+
+        quality_score = (aggregates.successful / transaction_count) * settings.score.TRANSACTIONS_QUALITY_WEIGHT
+
+        type_score = min(aggregates.type_weight_sum / transaction_count, settings.score.TRANSACTIONS_TYPE_WEIGHT)
+
+        fraud_count = aggregates.fraud_count
+        if fraud_count / transaction_count > 0.3:
+            return 0
+        fraud_weight = (
+                               fraud_count / (transaction_count * settings.score.TRANSACTIONS_FRAUD_WEIGHT / 100)
+                       ) * settings.score.TRANSACTIONS_FRAUD_WEIGHT
+        fraud_score = min(fraud_weight, settings.score.TRANSACTIONS_FRAUD_WEIGHT)
+
+        amount_score = min(aggregates.amount_score, settings.score.TRANSACTIONS_AMOUNT_WEIGHT)
+
+        total_score = count_score + freq_score + quality_score + type_score + amount_score - fraud_score
+        return max(min(total_score, 100), 0)
+
+
+def score_accounts(
+        bounds: list[tuple[int, int]],
+        timestamps: np.ndarray,
+        amounts: np.ndarray,
+        successful: np.ndarray,
+        types: np.ndarray,
+        fraud: np.ndarray
+) -> list[float]:
+    """
+    Скоринг пачки аккаунтов по общим колонкам их транзакций; bounds - срезы [начало, конец) каждого аккаунта.
+    Функция уровня модуля, чтобы ее можно было отдать в пул процессов
+    """
+    return [
+        AccountScoringEngine.calculate(TransactionColumns(
+            timestamps=timestamps[start:end],
+            amounts=amounts[start:end],
+            successful=successful[start:end],
+            types=types[start:end],
+            fraud=fraud[start:end]
+        ))
+        for start, end in bounds
+    ]
+
+
+account_scoring_engine = AccountScoringEngine()
@@ -0,0 +1,277 @@
+import asyncio
+import itertools
+import logging
+import time
+from typing import NamedTuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.db import async_session_maker, engine
+from app.core.exceptions import QueueFullException
+from app.databases import transaction_crud
+from app.schemas.queue import ScoringQueueStatsSchema
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.account_stats import account_stats_service
+from app.services.alerts import alert_dispatcher
+from app.services.risk_analysis import risk_analysis_service
+
+logger = logging.getLogger(__name__)
+
+
+class ScoringTask(NamedTuple):
+    """Сохраненная PENDING-транзакция, ожидающая оценки риска"""
+    id: int
+    transaction: TransactionCreateSchema
+    enqueued_at: float  # time.monotonic()
+    # Признаки скорости на момент сохранения: к началу оценки счетчики уже учли саму транзакцию
+    velocity: dict[str, float] | None = None
+    # Неудачные попытки оценки
+    attempts: int = 0
+
+
+class ScoringQueue:
+    """
+    Ограниченная очередь оценки риска уже сохраненных транзакций.
+    Место резервируется до вставки строки, поэтому заполненная очередь отклоняет запрос
+    раньше, чем транзакция попадет в БД. Воркеры забирают транзакции пачками до batch_size
+    и записывают fraud_flag одним UPDATE. Пачка с ошибкой возвращается в очередь с экспоненциальной
+    задержкой, не больше max_attempts попыток. Все, что не оценилось, остается PENDING
+    и после аренды lease_seconds подбирается проходом восстановления, который выполняет один процесс
+    """
+
+    def __init__(
+            self,
+            max_size: int,
+            workers: int,
+            batch_size: int,
+            flush_seconds: float,
+            max_attempts: int,
+            retry_seconds: float,
+            recover_seconds: float,
+            lease_seconds: float
+    ):
+        self.max_size = max_size
+        self.workers = workers
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.max_attempts = max_attempts
+        self.retry_seconds = retry_seconds
+        self.recover_seconds = recover_seconds
+        self.lease_seconds = lease_seconds
+        self.reserved = 0
+        self.enqueued = 0
+        self.scored = 0
+        self.rejected = 0
+        self.retried = 0
+        self.failed = 0
+        self.lag_seconds_last = 0.0
+        self.lag_seconds_max = 0.0
+        self.lag_seconds_total = 0.0
+        self._queue: asyncio.Queue[ScoringTask] = asyncio.Queue()
+        self._tasks: list[asyncio.Task] = []
+        self._recovery_task: asyncio.Task | None = None
+        self._retries: dict[int, asyncio.TimerHandle] = {}
+        self._retry_keys = itertools.count()
+        # id транзакций в очереди, в отложенных повторах и в оценке; восстановление их не подбирает
+        self._in_flight: set[int] = set()
+
+    def reserve(self) -> None:
+        """Занимает место под транзакцию; вызывается до ее сохранения"""
+        if self.reserved >= self.max_size:
+            self.rejected += 1
+            raise QueueFullException(message='Очередь скоринга заполнена')
+        self.reserved += 1
+
+    def release(self) -> None:
+        """Возвращает место, если транзакцию не удалось сохранить"""
+        self.reserved -= 1
+
+    def put(
+            self, task_id: int, transaction: TransactionCreateSchema, velocity: dict[str, float] | None = None
+    ) -> None:
+        """Ставит сохраненную транзакцию в очередь на место, занятое reserve"""
+        self._queue.put_nowait(
+            ScoringTask(id=task_id, transaction=transaction, enqueued_at=time.monotonic(), velocity=velocity)
+        )
+        self._in_flight.add(task_id)
+        self.enqueued += 1
+
+    async def start(self) -> None:
+        self._tasks = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._recovery_task = asyncio.create_task(self._recover_forever())
+
+    async def stop(self) -> None:
+        """
+        Дожидается оценки уже поставленных транзакций не дольше flush_seconds и останавливает воркеров.
+        Отложенные повторы не дожидаются: транзакции остаются PENDING до прохода восстановления
+        """
+        if self._recovery_task is not None:
+            self._recovery_task.cancel()
+            await asyncio.gather(self._recovery_task, return_exceptions=True)
+            self._recovery_task = None
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout=self.flush_seconds)
+            except asyncio.TimeoutError:
+                logger.warning('Scoring queue not flushed, %s transactions stay pending', self._queue.qsize())
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for handle in self._retries.values():
+            handle.cancel()
+        self.reserved -= len(self._retries)
+        self._retries.clear()
+        self._in_flight.clear()
+
+    async def _recover_forever(self) -> None:
+        """
+        Проход восстановления выполняет только держатель advisory-блокировки на отдельном соединении,
+        остальные процессы ждут ее освобождения. Проход подбирает PENDING-транзакции с истекшей арендой:
+        прежних или упавших процессов и исчерпавшие попытки. Транзакции в работе у живого процесса
+        держат аренду и не подбираются повторно.
+        Повторная оценка уже оцененной транзакции ничего не меняет: set_risk_results пишет только PENDING
+        """
+        while True:
+            try:
+                async with engine.connect() as connection, AsyncSession(bind=connection) as session:
+                    while not await transaction_crud.try_lock_recovery(session=session):
+                        await transaction_crud.commit(session)
+                        await asyncio.sleep(self.recover_seconds)
+                    while True:
+                        await self.recover(session=session)
+                        await transaction_crud.commit(session)
+                        await asyncio.sleep(self.recover_seconds)
+            except Exception:
+                logger.exception('Pending transactions recovery failed')
+                await asyncio.sleep(self.recover_seconds)
+
+    async def recover(self, session: AsyncSession) -> None:
+        """Арендует PENDING-транзакции с истекшей арендой и ставит их в очередь, сколько поместится"""
+        limit = self.max_size - self.reserved
+        if limit <= 0:
+            return
+        rows = await transaction_crud.claim_pending(
+            session=session, limit=limit, lease_seconds=self.lease_seconds, exclude_ids=self._in_flight
+        )
+        for row in rows:
+            self.reserved += 1
+            self.put(task_id=row['id'], transaction=TransactionCreateSchema.model_validate(row))
+        if rows:
+            logger.info('Recovered %s pending transactions', len(rows))
+
+    async def _work(self) -> None:
+        while True:
+            batch = [await self._queue.get()]
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            done = batch
+            try:
+                await self._score(batch)
+            except Exception:
+                logger.exception('Scoring of %s transactions failed', len(batch))
+                done = self._retry_later(batch)
+            finally:
+                self.reserved -= len(done)
+                self._in_flight.difference_update(task.id for task in done)
+                for _ in batch:
+                    self._queue.task_done()
+
+    def _retry_later(self, batch: list[ScoringTask]) -> list[ScoringTask]:
+        """
+        Возвращает транзакции в очередь через retry_seconds, 2 * retry_seconds, ...; место в очереди остается за ними.
+        Исчерпавшие max_attempts остаются PENDING до прохода восстановления, их и возвращает
+        """
+        loop = asyncio.get_running_loop()
+        dropped = []
+        for task in batch:
+            attempts = task.attempts + 1
+            if attempts >= self.max_attempts:
+                dropped.append(task)
+                continue
+            key = next(self._retry_keys)
+            self._retries[key] = loop.call_later(
+                self.retry_seconds * 2 ** (attempts - 1), self._requeue, key, task._replace(attempts=attempts)
+            )
+        self.retried += len(batch) - len(dropped)
+        self.failed += len(dropped)
+        if dropped:
+            logger.error('Scoring of %s transactions gave up after %s attempts', len(dropped), self.max_attempts)
+        return dropped
+
+    def _requeue(self, key: int, task: ScoringTask) -> None:
+        del self._retries[key]
+        self._queue.put_nowait(task)
+
+    async def _score(self, batch: list[ScoringTask]) -> None:
+        """Оценивает пачку по состоянию БД без самой пачки и записывает результат"""
+        transactions = [task.transaction for task in batch]
+        async with async_session_maker() as session:
+            features = await risk_analysis_service.get_batch_features(
+                transactions=transactions, session=session, exclude_ids=[task.id for task in batch]
+            )
+            results = []
+            risk_scores = {}
+            for task, transaction_features in zip(batch, features):
+                if task.velocity is not None:
+                    transaction_features = transaction_features.model_copy(update=task.velocity)
+                risk_scores[task.id], is_fraud = risk_analysis_service.score_features(
+                    task.transaction, transaction_features
+                )
+                results.append({
+                    'id': task.id,
+                    'transaction_datetime': task.transaction.transaction_datetime,
+                    'fraud_flag': is_fraud
+                })
+            updated = await transaction_crud.set_risk_results(results=results, session=session)
+            # Транзакции учтены в агрегатах с fraud_flag=False: меняется только fraud_count у мошеннических
+            fraud = [row for row in updated if row.fraud_flag]
+            scores = await account_stats_service.apply_fraud_flags(transactions=fraud, session=session)
+            scored = {task.id: task.transaction for task in batch}
+            await alert_dispatcher.add(
+                rows=[alert_dispatcher.to_row(row.id, scored[row.id], risk_scores[row.id]) for row in fraud],
+                session=session
+            )
+            await transaction_crud.commit(session)
+        if fraud:
+            alert_dispatcher.notify()
+        risk_analysis_service.observe_scores(scores)
+
+        now = time.monotonic()
+        for task in batch:
+            lag = now - task.enqueued_at
+            self.lag_seconds_last = lag
+            self.lag_seconds_max = max(self.lag_seconds_max, lag)
+            self.lag_seconds_total += lag
+        self.scored += len(batch)
+
+    def stats(self) -> ScoringQueueStatsSchema:
+        depth = self._queue.qsize()
+        return ScoringQueueStatsSchema(
+            enabled=settings.risk.async_scoring,
+            depth=depth,
+            in_flight=self.reserved - depth,
+            capacity=self.max_size,
+            workers=len(self._tasks),
+            enqueued=self.enqueued,
+            scored=self.scored,
+            rejected=self.rejected,
+            retried=self.retried,
+            failed=self.failed,
+            lag_seconds_last=self.lag_seconds_last,
+            lag_seconds_max=self.lag_seconds_max,
+            lag_seconds_avg=self.lag_seconds_total / self.scored if self.scored else 0.0
+        )
+
+
+scoring_queue = ScoringQueue(
+    max_size=settings.risk.scoring_queue_size,
+    workers=settings.risk.scoring_workers,
+    batch_size=settings.risk.scoring_batch_size,
+    flush_seconds=settings.risk.scoring_flush_seconds,
+    max_attempts=settings.risk.scoring_max_attempts,
+    retry_seconds=settings.risk.scoring_retry_seconds,
+    recover_seconds=settings.risk.scoring_recover_seconds,
+    lease_seconds=settings.risk.scoring_lease_seconds
+)
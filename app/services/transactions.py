@@ -1,19 +1,73 @@
+from typing import Any, AsyncIterator
+
+from pydantic import ValidationError
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.config import settings
+from app.core.db import async_session_maker
+from app.core.enums import TransactionBatchStatus, RiskStatus
 from app.core.exceptions import DuplicateException, SqlException
 from app.models.transactions import TransactionModel
+from app.databases.accounts import account_crud
 from app.databases.transactions import transaction_crud
-from app.schemas.transactions import TransactionCreateSchema, TransactionSchema
+from app.schemas.transactions import (
+    TransactionCreateSchema,
+    TransactionSchema,
+    TransactionFilterSchema,
+    TransactionRow,
+    TransactionBatchItemSchema,
+    TransactionBatchResultSchema
+)
+from app.services.account_stats import account_stats_service
+from app.services.alerts import alert_dispatcher
 from app.services.risk_analysis import risk_analysis_service
+from app.services.risk_rules import VELOCITY
+from app.services.scoring_queue import scoring_queue
+from app.services.scoring import TransactionColumns, ScoreAggregates, DECAY_DAYS, TYPE_CODES, TYPE_WEIGHTS
 
 
 class TransactionService:
     def __init__(self):
         self.crud = transaction_crud
 
-    async def get_all_transactions(self, session: AsyncSession) -> list[TransactionSchema]:
-        transactions = await self.crud.get_all(session=session)
-        return transactions
+    @staticmethod
+    def _to_model(transaction_data: TransactionCreateSchema, fraud_flag: bool = False) -> TransactionModel:
+        return TransactionModel(sender_account_id=transaction_data.sender_account_id,
+                                receiver_account_id=transaction_data.receiver_account_id,
+                                transaction_amount=transaction_data.transaction_amount,
+                                transaction_type=transaction_data.transaction_type,
+                                transaction_datetime=transaction_data.transaction_datetime,
+                                transaction_status=transaction_data.transaction_status,
+                                fraud_flag=fraud_flag,
+                                geolocation=transaction_data.geolocation,
+                                device_user=transaction_data.device_user)
+
+    async def get_transactions_page(
+        self,
+        session: AsyncSession,
+        limit: int,
+        after: int | None = None,
+        filters: TransactionFilterSchema | None = None
+    ) -> tuple[list[TransactionRow], int | None]:
+        """Страница транзакций и курсор следующей страницы, если она есть"""
+        transactions = await self.crud.get_all(session=session, limit=limit + 1, after=after, filters=filters)
+        if len(transactions) <= limit:
+            return transactions, None
+        transactions = transactions[:limit]
+        return transactions, transactions[-1]['id']
+
+    async def stream_transactions(
+        self, after: int | None = None, filters: TransactionFilterSchema | None = None
+    ) -> AsyncIterator[list[TransactionRow]]:
+        """
+        Потоковая выгрузка транзакций пачками. Сессия открывается здесь же:
+        сессия из зависимости закрывается до отправки потокового ответа
+        """
+        async with async_session_maker() as session:
+            async for transactions in self.crud.stream(
+                session=session, chunk_size=settings.page.stream_chunk_size, after=after, filters=filters
+            ):
+                yield transactions
 
     async def get_transaction_by_transaction_id(
         self, transaction_id: str, session: AsyncSession
@@ -41,28 +95,167 @@ class TransactionService:
         )
         return transactions
 
+    async def get_account_score_columns(
+            self, account_id: str, session: AsyncSession,
+    ) -> TransactionColumns:
+        rows = await self.crud.get_account_score_rows(
+            account_id=account_id,
+            session=session,
+        )
+        return TransactionColumns.from_rows(rows)
+
+    async def get_account_score_aggregates(
+            self, account_id: str, session: AsyncSession,
+    ) -> ScoreAggregates:
+        row = await self.crud.get_account_score_aggregates(
+            account_id=account_id,
+            decay_days=DECAY_DAYS,
+            type_weights={transaction_type: TYPE_WEIGHTS[code] for transaction_type, code in TYPE_CODES.items()},
+            session=session,
+        )
+        return ScoreAggregates(
+            transaction_count=row.transaction_count,
+            weighted_count=float(row.weighted_count),
+            gap_days_sum=int(row.gap_days_sum),
+            successful=row.successful,
+            type_weight_sum=float(row.type_weight_sum),
+            fraud_count=row.fraud_count,
+            amount_score=float(row.amount_score)
+        )
+
     async def create_transaction(
             self, transaction_data: TransactionCreateSchema, session: AsyncSession
     ) -> None:
-        _, is_fraud = await risk_analysis_service.analyze_transaction(
+        risk_score, is_fraud = await risk_analysis_service.analyze_transaction(
             transaction=transaction_data,
             session=session
         )
 
-        self.model = TransactionModel(sender_account_id=transaction_data.sender_account_id,
-                                      receiver_account_id=transaction_data.receiver_account_id,
-                                      transaction_amount=transaction_data.transaction_amount,
-                                      transaction_type=transaction_data.transaction_type,
-                                      transaction_datetime=transaction_data.transaction_datetime,
-                                      transaction_status=transaction_data.transaction_status,
-                                      fraud_flag=is_fraud,
-                                      geolocation=transaction_data.geolocation,
-                                      device_user=transaction_data.device_user)
-        transaction = self.model
+        transaction = self._to_model(transaction_data=transaction_data, fraud_flag=is_fraud)
         try:
-            await self.crud.add(transaction=transaction, session=session)
+            await self.crud.add(transaction=transaction, session=session, commit=False)
+            scores = await account_stats_service.apply_transactions(transactions=[transaction], session=session)
+            if is_fraud:
+                await alert_dispatcher.add(
+                    rows=[alert_dispatcher.to_row(transaction.id, transaction, risk_score)], session=session
+                )
+            await self.crud.commit(session)
         except SqlException as exc:
-            raise DuplicateException(message=str(exc))
+            if exc.code == SqlException.UNIQUE_VIOLATION:
+                raise DuplicateException(message=str(exc))
+            raise
+        if is_fraud:
+            alert_dispatcher.notify()
+        risk_analysis_service.observe_transaction(transaction_data)
+        risk_analysis_service.observe_scores(scores)
+
+    async def create_pending_transaction(
+            self, transaction_data: TransactionCreateSchema, session: AsyncSession
+    ) -> int:
+        """
+        Сохраняет транзакцию без оценки риска и ставит ее в очередь скоринга.
+        Заполненная очередь отклоняет транзакцию до записи: QueueFullException
+        """
+        transaction = self._to_model(transaction_data=transaction_data)
+        transaction.risk_status = RiskStatus.PENDING
+        # Пока аренда не истекла, проходы восстановления других процессов транзакцию не подбирают
+        transaction.risk_lease_until = transaction_crud.lease_until(seconds=scoring_queue.lease_seconds)
+        scoring_queue.reserve()
+        try:
+            await self.crud.add(transaction=transaction, session=session, commit=False)
+            scores = await account_stats_service.apply_transactions(transactions=[transaction], session=session)
+            await self.crud.commit(session)
+        except SqlException as exc:
+            scoring_queue.release()
+            if exc.code == SqlException.UNIQUE_VIOLATION:
+                raise DuplicateException(message=str(exc))
+            raise
+        except BaseException:
+            scoring_queue.release()
+            raise
+        velocity = None
+        if risk_analysis_service.rules.requires(VELOCITY):
+            velocity = risk_analysis_service.get_velocity_features(transaction_data)
+        scoring_queue.put(task_id=transaction.id, transaction=transaction_data, velocity=velocity)
+        risk_analysis_service.observe_transaction(transaction_data)
+        risk_analysis_service.observe_scores(scores)
+        return transaction.id
+
+    async def create_transactions_batch(
+            self, items: list[Any], session: AsyncSession
+    ) -> TransactionBatchResultSchema:
+        """
+        Сохраняет пачку транзакций одним коммитом.
+        Ошибка в отдельной записи не прерывает пачку, а отражается в ее статусе;
+        уже сохраненные транзакции получают DUPLICATE по уникальному ключу при вставке
+        """
+        results = [TransactionBatchItemSchema(index=index, status=TransactionBatchStatus.CREATED)
+                   for index in range(len(items))]
+        accepted: list[tuple[int, TransactionCreateSchema, TransactionModel]] = []
+        for index, item in enumerate(items):
+            try:
+                transaction_data = TransactionCreateSchema.model_validate(item)
+                model = self._to_model(transaction_data=transaction_data)
+            except (ValidationError, ValueError) as exc:
+                results[index].status = TransactionBatchStatus.INVALID
+                results[index].detail = str(exc)
+                continue
+            accepted.append((index, transaction_data, model))
+
+        if accepted:
+            scores = await account_crud.get_scores(
+                account_ids={data.sender_account_id for _, data, _ in accepted}
+                | {data.receiver_account_id for _, data, _ in accepted},
+                session=session
+            )
+            # Повторы внутри пачки отсекаются здесь, уже сохраненные транзакции - уникальным ключом при вставке
+            batch_keys = set()
+            unique = []
+            for index, transaction_data, model in accepted:
+                key = (transaction_data.sender_account_id, transaction_data.receiver_account_id,
+                       round(transaction_data.transaction_amount, 2), transaction_data.transaction_datetime)
+                if transaction_data.sender_account_id not in scores or transaction_data.receiver_account_id not in scores:
+                    results[index].status = TransactionBatchStatus.REJECTED
+                    results[index].detail = 'Неизвестный аккаунт'
+                elif key in batch_keys:
+                    results[index].status = TransactionBatchStatus.DUPLICATE
+                else:
+                    batch_keys.add(key)
+                    unique.append((index, transaction_data, model))
+            accepted = unique
+
+        if accepted:
+            features = await risk_analysis_service.get_batch_features(
+                transactions=[data for _, data, _ in accepted], session=session, scores=scores
+            )
+            risk_scores: dict[int, float] = {}
+            for (index, transaction_data, model), transaction_features in zip(accepted, features):
+                risk_scores[index], model.fraud_flag = risk_analysis_service.score_features(
+                    transaction_data, transaction_features
+                )
+            # id получают только вставленные транзакции, без id - дубликаты уже сохраненных
+            await self.crud.add_many(transactions=[model for _, _, model in accepted], session=session, commit=False)
+            for index, _, model in accepted:
+                if model.id is None:
+                    results[index].status = TransactionBatchStatus.DUPLICATE
+            accepted = [(index, data, model) for index, data, model in accepted if model.id is not None]
+            models = [model for _, _, model in accepted]
+            fraud = [(model, risk_scores[index]) for index, _, model in accepted if model.fraud_flag]
+            scores = await account_stats_service.apply_transactions(transactions=models, session=session)
+            await alert_dispatcher.add(
+                rows=[alert_dispatcher.to_row(model.id, model, risk_score) for model, risk_score in fraud],
+                session=session
+            )
+            await self.crud.commit(session)
+            if fraud:
+                alert_dispatcher.notify()
+            risk_analysis_service.observe_scores(scores)
+            for index, transaction_data, model in accepted:
+                results[index].id = model.id
+                results[index].fraud_flag = model.fraud_flag
+                risk_analysis_service.observe_transaction(transaction_data)
+
+        return TransactionBatchResultSchema(created=len(accepted), items=results)
 
 
 transaction_service = TransactionService()
\ No newline at end of file
@@ -0,0 +1,59 @@
+import time
+from collections import OrderedDict
+
+from app.core.config import settings
+from app.schemas.cache import CacheStatsSchema
+from app.schemas.users import UserRead
+
+
+class UserCache:
+    """
+    TTL + LRU кэш пользователей, найденных по сессионной cookie, ключ - имя пользователя.
+    Значение, прочитанное из БД до инвалидации, в кэш не попадает: put сверяет поколение
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: int):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._users: OrderedDict[str, tuple[UserRead, float]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def get(self, username: str) -> UserRead | None:
+        cached = self._users.get(username)
+        if cached is None or time.monotonic() - cached[1] > self.ttl_seconds:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._users.move_to_end(username)
+        return cached[0]
+
+    def put(self, username: str, user: UserRead, generation: int) -> None:
+        """generation - значение self.generation на момент промаха"""
+        if generation != self.generation or self.max_size <= 0:
+            return
+        self._users[username] = (user, time.monotonic())
+        self._users.move_to_end(username)
+        while len(self._users) > self.max_size:
+            self._users.popitem(last=False)
+
+    def invalidate(self, username: str) -> None:
+        self.generation += 1
+        self._users.pop(username, None)
+
+    def clear(self) -> None:
+        self.generation += 1
+        self._users.clear()
+
+    def stats(self) -> CacheStatsSchema:
+        return CacheStatsSchema(size=len(self._users), hits=self.hits, misses=self.misses)
+
+
+user_cache = UserCache(
+    max_size=settings.app.user_cache_max_size,
+    ttl_seconds=settings.app.user_cache_ttl_seconds
+)
@@ -0,0 +1,219 @@
+import copy
+import logging
+from collections import OrderedDict
+from datetime import datetime, timedelta
+
+from app.core.config import settings
+from app.core.db import async_session_maker
+from app.databases import transaction_crud
+
+logger = logging.getLogger(__name__)
+
+EPOCH = datetime(1970, 1, 1)
+
+# Окна скорости отправителя: суффикс признака и длина в секундах
+VELOCITY_WINDOWS = {
+    '1m': 60,
+    '1h': 3600,
+    '24h': 86400
+}
+VELOCITY_FEATURES = tuple(
+    f'sender_{name}_{window}' for window in VELOCITY_WINDOWS for name in ('count', 'amount', 'receivers')
+)
+
+
+def to_seconds(moment: datetime) -> int:
+    """Секунды от эпохи; наивное время считается UTC, как в профилях риска"""
+    return int((moment - EPOCH).total_seconds())
+
+
+class SlidingWindow:
+    """
+    Кольцо из slots корзин по bucket_seconds с текущими суммами по живым корзинам.
+    Корзины, выпавшие из окна, обнуляются при сдвиге головы: каждая очищается один раз
+    за оборот, поэтому учет события и чтение сумм - O(1) в амортизированном смысле.
+    Получатель считается в той корзине, где он встретился последний раз
+    """
+    __slots__ = ('bucket_seconds', 'slots', 'head', 'counts', 'amounts', 'latest', 'count', 'amount', 'receivers')
+
+    def __init__(self, seconds: int, slots: int):
+        self.bucket_seconds = max(seconds // slots, 1)
+        self.slots = slots
+        self.head: int | None = None
+        self.counts = [0] * slots
+        self.amounts = [0.0] * slots
+        self.latest = [0] * slots
+        self.count = 0
+        self.amount = 0.0
+        self.receivers = 0
+
+    def advance(self, bucket: int) -> None:
+        if self.head is None:
+            self.head = bucket
+            return
+        if bucket <= self.head:
+            return
+        for expired in range(max(self.head + 1, bucket - self.slots + 1), bucket + 1):
+            index = expired % self.slots
+            self.count -= self.counts[index]
+            self.amount -= self.amounts[index]
+            self.receivers -= self.latest[index]
+            self.counts[index] = 0
+            self.amounts[index] = 0.0
+            self.latest[index] = 0
+        self.head = bucket
+
+    def is_live(self, bucket: int) -> bool:
+        return self.head - self.slots < bucket <= self.head
+
+    def add(self, seconds: int, amount: float, previous_seconds: int | None) -> None:
+        """previous_seconds - время последней встречи того же получателя, если она известна"""
+        bucket = seconds // self.bucket_seconds
+        self.advance(bucket)
+        if not self.is_live(bucket):
+            return
+        index = bucket % self.slots
+        self.counts[index] += 1
+        self.amounts[index] += amount
+        self.count += 1
+        self.amount += amount
+
+        previous = None if previous_seconds is None else previous_seconds // self.bucket_seconds
+        if previous is None or not self.is_live(previous):
+            self.latest[index] += 1
+            self.receivers += 1
+        elif previous < bucket:
+            self.latest[previous % self.slots] -= 1
+            self.latest[index] += 1
+
+    def totals(self, seconds: int) -> tuple[int, float, int]:
+        """Количество, сумма и число получателей за окно, заканчивающееся не раньше seconds"""
+        self.advance(seconds // self.bucket_seconds)
+        # Сумма float копит ошибку округления при вычитании, пустое окно сбрасывает ее
+        if self.count == 0:
+            self.amount = 0.0
+        return self.count, self.amount, self.receivers
+
+
+class AccountVelocity:
+    __slots__ = ('windows', 'receivers')
+
+    def __init__(self, slots: int):
+        self.windows = tuple(SlidingWindow(seconds, slots) for seconds in VELOCITY_WINDOWS.values())
+        self.receivers: dict[str, int] = {}
+
+
+class VelocityCounters:
+    """
+    Счетчики скорости отправителей в памяти процесса: количество и сумма транзакций
+    и число разных получателей за 1 минуту, 1 час и 24 часа по времени транзакций.
+    Память ограничена: не больше max_accounts отправителей (LRU) и max_receivers получателей на отправителя,
+    сверх этого разные получатели считаются приблизительно, с завышением.
+    Счетчики видят только транзакции своего процесса и прогреваются из БД при старте,
+    поэтому правила скорости допускаются только с одним процессом приложения (main.py)
+    """
+
+    def __init__(self, slots: int, max_accounts: int, max_receivers: int):
+        self.slots = slots
+        self.max_accounts = max_accounts
+        self.max_receivers = max_receivers
+        self._accounts: OrderedDict[str, AccountVelocity] = OrderedDict()
+        self._warm_up_id: int | None = None
+
+    def __len__(self) -> int:
+        return len(self._accounts)
+
+    def scratch(self, sender_ids: set[str]) -> 'VelocityCounters':
+        """
+        Черновая копия счетчиков отправителей пачки: пачка копит в ней собственную скорость,
+        а живые счетчики обновляются через observe только после коммита
+        """
+        counters = VelocityCounters(self.slots, max(self.max_accounts, len(sender_ids)), self.max_receivers)
+        for sender_account_id in sender_ids:
+            velocity = self._accounts.get(sender_account_id)
+            if velocity is not None:
+                counters._accounts[sender_account_id] = copy.deepcopy(velocity)
+        return counters
+
+    def observe(self, sender_account_id: str, receiver_account_id: str, transaction_datetime: datetime,
+                amount: float) -> None:
+        velocity = self._accounts.get(sender_account_id)
+        if velocity is None:
+            velocity = self._accounts[sender_account_id] = AccountVelocity(self.slots)
+            if len(self._accounts) > self.max_accounts:
+                self._accounts.popitem(last=False)
+        else:
+            self._accounts.move_to_end(sender_account_id)
+
+        seconds = to_seconds(transaction_datetime)
+        previous = velocity.receivers.get(receiver_account_id)
+        for window in velocity.windows:
+            window.add(seconds, amount, previous)
+        if previous is None or seconds > previous:
+            self._remember(velocity, receiver_account_id, seconds)
+
+    def _remember(self, velocity: AccountVelocity, receiver_account_id: str, seconds: int) -> None:
+        receivers = velocity.receivers
+        if receiver_account_id not in receivers and len(receivers) >= self.max_receivers:
+            oldest = seconds - max(VELOCITY_WINDOWS.values())
+            for account_id in [account_id for account_id, seen in receivers.items() if seen <= oldest]:
+                del receivers[account_id]
+            if len(receivers) >= self.max_receivers:
+                return
+        receivers[receiver_account_id] = seconds
+
+    def features(self, sender_account_id: str, transaction_datetime: datetime) -> dict[str, float]:
+        """Признаки скорости отправителя до учета транзакции transaction_datetime"""
+        velocity = self._accounts.get(sender_account_id)
+        if velocity is None:
+            return dict.fromkeys(VELOCITY_FEATURES, 0)
+        seconds = to_seconds(transaction_datetime)
+        features = {}
+        for name, window in zip(VELOCITY_WINDOWS, velocity.windows):
+            count, amount, receivers = window.totals(seconds)
+            features[f'sender_count_{name}'] = count
+            features[f'sender_amount_{name}'] = amount
+            features[f'sender_receivers_{name}'] = receivers
+        return features
+
+    async def start_warm_up(self) -> None:
+        """Запоминает последнюю сохраненную транзакцию: новее нее счетчики получат через observe"""
+        async with async_session_maker() as session:
+            self._warm_up_id = await transaction_crud.get_max_id(session=session)
+
+    async def warm_up(self) -> None:
+        """Учитывает транзакции за самое длинное окно, сохраненные до старта процесса"""
+        if self._warm_up_id is None:
+            return
+        start_date = datetime.now() - timedelta(seconds=max(VELOCITY_WINDOWS.values()))
+        count = 0
+        try:
+            async with async_session_maker() as session:
+                async for rows in transaction_crud.stream_since(
+                    session=session,
+                    start_date=start_date,
+                    max_id=self._warm_up_id,
+                    chunk_size=settings.page.stream_chunk_size
+                ):
+                    for row in rows:
+                        self.observe(
+                            sender_account_id=row.sender_account_id,
+                            receiver_account_id=row.receiver_account_id,
+                            transaction_datetime=row.transaction_datetime,
+                            amount=float(row.transaction_amount)
+                        )
+                    count += len(rows)
+        except Exception:
+            logger.exception('Velocity warm-up failed')
+            return
+        logger.info('Velocity counters warmed up with %s transactions', count)
+
+    def clear(self) -> None:
+        self._accounts.clear()
+
+
+velocity_counters = VelocityCounters(
+    slots=settings.risk.velocity_slots,
+    max_accounts=settings.risk.velocity_max_accounts,
+    max_receivers=settings.risk.velocity_max_receivers
+)
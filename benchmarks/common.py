@@ -0,0 +1,170 @@
+import asyncio
+import json
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
+
+from app.core.config import settings
+from app.core.enums import DeviceUser, TransactionStatus, TransactionType
+from app.databases import partition_crud
+from app.databases.partitions import add_months
+from app.models.base_model import BaseInit
+from app.models import transactions, accounts, users
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.partitions import partition_service
+
+SCHEMA = 'benchmark'
+
+SEED_ACCOUNTS = '''
+INSERT INTO accounts (account_id, first_name, last_name, middle_name, score, create_at, update_at)
+SELECT 'acc' || g, 'first', 'last', 'middle', random() * 100, now(), now()
+FROM generate_series(1, {accounts}) g
+'''
+GEOLOCATIONS = ('Moscow', 'Kazan', 'Paris', 'Berlin')
+SEED_TRANSACTIONS = '''
+INSERT INTO transactions (
+    sender_account_id, receiver_account_id, transaction_amount, transaction_type, transaction_datetime,
+    transaction_status, fraud_flag, geolocation, device_user
+)
+SELECT
+    'acc' || (1 + floor(random() * {accounts}))::int,
+    'acc' || (1 + floor(random() * {accounts}))::int,
+    round((1 + random() * 20000)::numeric, 2),
+    (ARRAY['TRANSFER', 'DEPOSIT', 'WITHDRAWAL'])[1 + floor(random() * 3)::int]::transactiontype,
+    now() - random() * interval '365 days',
+    (ARRAY['FAILED', 'SUCCESS', 'SUCCESS', 'SUCCESS'])[1 + floor(random() * 4)::int]::transactionstatus,
+    random() < 0.02,
+    (ARRAY['Moscow', 'Kazan', 'Paris', 'Berlin'])[1 + floor(random() * 4)::int],
+    (ARRAY['DESKTOP', 'MOBILE'])[1 + floor(random() * 2)::int]::deviceuser
+FROM generate_series(1, {transactions})
+'''
+
+
+class BenchmarkDatabase:
+    """
+    Схема benchmark в базе сервиса с таблицами по моделям и сгенерированными данными.
+    Схема пересоздается при create и удаляется при drop, данные сервиса не затрагиваются
+    """
+
+    def __init__(self, schema: str = SCHEMA):
+        self.schema = schema
+        self.engine = create_async_engine(
+            settings.db.url, connect_args={'server_settings': {'search_path': schema}}
+        )
+        self.session_maker = async_sessionmaker(bind=self.engine, class_=AsyncSession, expire_on_commit=False)
+
+    async def create(self, skip_indexes: tuple[str, ...] = ()) -> None:
+        async with self.engine.begin() as connection:
+            await connection.execute(text(f'DROP SCHEMA IF EXISTS {self.schema} CASCADE'))
+            await connection.execute(text(f'CREATE SCHEMA {self.schema}'))
+            await connection.run_sync(BaseInit.metadata.create_all)
+            for index in skip_indexes:
+                await connection.execute(text(f'DROP INDEX {index}'))
+        async with self.session_maker() as session:
+            now = datetime.now()
+            await partition_crud.add_default(session=session)
+            await partition_service.ensure_partitions(
+                start=now - timedelta(days=366), end=add_months(now, 1), session=session
+            )
+            await partition_crud.commit(session)
+
+    async def seed(self, account_count: int, transaction_count: int, seed: float | None = None) -> None:
+        """seed от -1 до 1 делает данные воспроизводимыми между запусками"""
+        print(f'seeding {account_count} accounts, {transaction_count} transactions')
+        async with self.engine.begin() as connection:
+            if seed is not None:
+                await connection.exec_driver_sql(f'SELECT setseed({float(seed)})')
+            await connection.exec_driver_sql(SEED_ACCOUNTS.format(accounts=account_count))
+            await connection.exec_driver_sql(
+                SEED_TRANSACTIONS.format(accounts=account_count, transactions=transaction_count)
+            )
+        await self.analyze()
+
+    async def analyze(self) -> None:
+        async with self.engine.begin() as connection:
+            await connection.exec_driver_sql('ANALYZE')
+
+    async def drop(self) -> None:
+        async with self.engine.begin() as connection:
+            await connection.execute(text(f'DROP SCHEMA IF EXISTS {self.schema} CASCADE'))
+        await self.engine.dispose()
+
+
+def make_transactions(
+        count: int, account_count: int, rng: random.Random, start: datetime | None = None
+) -> list[TransactionCreateSchema]:
+    """Случайные транзакции между аккаунтами acc1..accN с тем же распределением, что и SEED_TRANSACTIONS"""
+    start = start or datetime.now() - timedelta(days=365)
+    return [
+        TransactionCreateSchema(
+            sender_account_id=f'acc{rng.randint(1, account_count)}',
+            receiver_account_id=f'acc{rng.randint(1, account_count)}',
+            transaction_amount=round(rng.uniform(1, 20001), 2),
+            transaction_type=rng.choice(list(TransactionType)),
+            transaction_datetime=start + timedelta(seconds=rng.uniform(0, 365 * 86400)),
+            transaction_status=TransactionStatus.FAILED if rng.random() < 0.25 else TransactionStatus.SUCCESS,
+            fraud_flag=rng.random() < 0.02,
+            geolocation=rng.choice(GEOLOCATIONS),
+            device_user=rng.choice(list(DeviceUser))
+        )
+        for _ in range(count)
+    ]
+
+
+class AsgiClient:
+    """
+    Запросы к ASGI-приложению в том же процессе, без сети и HTTP-клиента.
+    События lifespan не отправляются: фоновые задачи сервиса в замерах не участвуют
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def request(self, method: str, url: str, payload=None) -> tuple[int, bytes]:
+        path, _, query = url.partition('?')
+        body = b'' if payload is None else json.dumps(payload, default=str).encode()
+        scope = {
+            'type': 'http',
+            'asgi': {'version': '3.0'},
+            'http_version': '1.1',
+            'method': method,
+            'scheme': 'http',
+            'path': path,
+            'raw_path': path.encode(),
+            'query_string': query.encode(),
+            'root_path': '',
+            'headers': [
+                (b'host', b'benchmark'),
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode())
+            ],
+            'client': ('127.0.0.1', 0),
+            'server': ('benchmark', 80)
+        }
+        status = 0
+        chunks: list[bytes] = []
+        received = False
+        finished = asyncio.Event()
+
+        async def receive() -> dict:
+            nonlocal received
+            if not received:
+                received = True
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+            # Клиент "отключается" только после полного ответа, иначе потоковый ответ был бы прерван
+            await finished.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message['type'] == 'http.response.start':
+                status = message['status']
+            elif message['type'] == 'http.response.body':
+                chunks.append(message.get('body', b''))
+                if not message.get('more_body', False):
+                    finished.set()
+
+        await self.app(scope, receive, send)
+        return status, b''.join(chunks)
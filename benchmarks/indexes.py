@@ -0,0 +1,147 @@
+"""
+Планы и задержки запросов анализа риска до и после составных индексов транзакций.
+
+Данные генерируются в отдельной схеме benchmark той же базы, схема удаляется по завершении:
+    python -m benchmarks.indexes --accounts 10000 --transactions 1000000
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.enums import DeviceUser, TransactionStatus, TransactionType
+from app.databases import transaction_crud
+from app.models.transactions import TransactionModel
+from app.schemas.transactions import TransactionCreateSchema
+from benchmarks.common import BenchmarkDatabase
+
+INDEXES = ('ix_transactions_sender_datetime', 'ix_transactions_receiver_datetime')
+
+
+def make_transaction(sender: str, receiver: str) -> TransactionCreateSchema:
+    return TransactionCreateSchema(
+        sender_account_id=sender,
+        receiver_account_id=receiver,
+        transaction_amount=15000,
+        transaction_type=TransactionType.TRANSFER,
+        transaction_datetime=datetime.now(),
+        transaction_status=TransactionStatus.SUCCESS,
+        fraud_flag=False,
+        geolocation='Moscow',
+        device_user=DeviceUser.MOBILE
+    )
+
+
+def make_queries(window_days: int):
+    """Запросы горячего пути в том виде, в каком их выполняет сервис"""
+    async def risk_features(session: AsyncSession, account_id: str, other_id: str):
+        await transaction_crud.get_risk_features(
+            transaction=make_transaction(account_id, other_id),
+            start_date=datetime.now() - timedelta(days=window_days),
+            end_date=datetime.now(),
+            session=session
+        )
+
+    async def sender_window_buckets(session: AsyncSession, account_id: str, other_id: str):
+        await transaction_crud.get_sender_window_buckets(
+            sender_account_id=account_id,
+            start_date=datetime.now() - timedelta(days=window_days),
+            end_date=datetime.now(),
+            bucket_seconds=settings.risk.profile_bucket_seconds,
+            session=session
+        )
+
+    async def account_score_rows(session: AsyncSession, account_id: str, other_id: str):
+        await transaction_crud.get_account_score_rows(account_id=account_id, session=session)
+
+    return {
+        'risk_features': risk_features,
+        'sender_window_buckets': sender_window_buckets,
+        'account_score_rows': account_score_rows
+    }
+
+
+class StatementRecorder:
+    """Запоминает последний отправленный в БД запрос, чтобы получить его план"""
+
+    def __init__(self, engine):
+        self.statement = None
+        self.parameters = None
+        event.listen(engine.sync_engine, 'before_cursor_execute', self.record)
+
+    def record(self, conn, cursor, statement, parameters, context, executemany):
+        if not statement.startswith('EXPLAIN'):
+            self.statement, self.parameters = statement, parameters
+
+
+async def measure(session_maker, recorder, queries, account_count: int, repeat: int) -> dict:
+    results = {}
+    async with session_maker() as session:
+        for name, query in queries.items():
+            timings = []
+            for _ in range(repeat):
+                account_id = f'acc{random.randint(1, account_count)}'
+                other_id = f'acc{random.randint(1, account_count)}'
+                started = time.perf_counter()
+                await query(session, account_id, other_id)
+                timings.append((time.perf_counter() - started) * 1000)
+            connection = await session.connection()
+            plan = await connection.exec_driver_sql(
+                'EXPLAIN (ANALYZE, BUFFERS) ' + recorder.statement, recorder.parameters
+            )
+            timings.sort()
+            results[name] = {
+                'median_ms': statistics.median(timings),
+                'p95_ms': timings[int(len(timings) * 0.95) - 1],
+                'plan': '\n'.join(row[0] for row in plan.all())
+            }
+    return results
+
+
+def report(before: dict, after: dict) -> None:
+    for name in before:
+        print(f'=== {name}')
+        for label, result in (('before', before[name]), ('after', after[name])):
+            print(f'--- {label}: median {result["median_ms"]:.2f} ms, p95 {result["p95_ms"]:.2f} ms')
+            print(result['plan'])
+        print(f'speedup: x{before[name]["median_ms"] / after[name]["median_ms"]:.1f}\n')
+
+
+async def main(account_count: int, transaction_count: int, repeat: int) -> None:
+    database = BenchmarkDatabase()
+    recorder = StatementRecorder(database.engine)
+    queries = make_queries(settings.risk.analysis_window_days)
+    try:
+        await database.create(skip_indexes=INDEXES)
+        await database.seed(account_count, transaction_count)
+
+        before = await measure(database.session_maker, recorder, queries, account_count, repeat)
+
+        async with database.engine.begin() as connection:
+            await connection.run_sync(
+                lambda sync_connection: [
+                    index.create(sync_connection)
+                    for index in TransactionModel.__table__.indexes if index.name in INDEXES
+                ]
+            )
+        await database.analyze()
+
+        after = await measure(database.session_maker, recorder, queries, account_count, repeat)
+        report(before, after)
+    finally:
+        await database.drop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=10_000)
+    parser.add_argument('--transactions', type=int, default=1_000_000)
+    parser.add_argument('--repeat', type=int, default=50)
+    args = parser.parse_args()
+    asyncio.run(main(args.accounts, args.transactions, args.repeat))
@@ -0,0 +1,99 @@
+"""
+Задержка GET /transactions при одновременном потоке логинов.
+
+Сравнивает проверку пароля в пуле потоков (как в сервисе) и прямо в цикле событий.
+Создает в базе временного пользователя и удаляет его по завершении:
+    python -m benchmarks.login_latency --duration 10 --logins 4
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+
+import httpx
+from sqlalchemy import delete
+
+from app.core.app import get_app
+from app.core.db import async_session_maker, run_migrations
+from app.core.security import verify_password
+from app.models.users import UserModel
+from app.services import auth
+
+PASSWORD = 'benchmark-password'
+
+
+async def verify_password_inline(plain_password: str, hashed_password: str) -> bool:
+    return verify_password(plain_password, hashed_password)
+
+
+async def run(client: httpx.AsyncClient, username: str, duration: float, logins: int) -> dict:
+    stop = time.perf_counter() + duration
+    latencies = []
+    login_count = 0
+
+    async def login_loop():
+        nonlocal login_count
+        while time.perf_counter() < stop:
+            response = await client.post('/auth/login', data={'username': username, 'password': PASSWORD})
+            response.raise_for_status()
+            login_count += 1
+
+    async def transactions_loop():
+        while time.perf_counter() < stop:
+            started = time.perf_counter()
+            await client.get('/transactions/', params={'limit': 20})
+            latencies.append((time.perf_counter() - started) * 1000)
+            await asyncio.sleep(0.01)
+
+    await asyncio.gather(transactions_loop(), *[login_loop() for _ in range(logins)])
+    latencies.sort()
+    return {
+        'requests': len(latencies),
+        'logins': login_count,
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': latencies[max(int(len(latencies) * 0.99) - 1, 0)],
+        'max_ms': latencies[-1]
+    }
+
+
+async def main(duration: float, logins: int) -> None:
+    await run_migrations()
+    app = get_app(name='benchmark')
+    username = f'benchmark_{uuid.uuid4().hex[:8]}'
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://benchmark') as client:
+        response = await client.post('/auth/register', json={
+            'username': username,
+            'password': PASSWORD,
+            'email': f'{username}@example.com',
+            'full_name': 'Benchmark'
+        })
+        response.raise_for_status()
+        try:
+            results = {'no logins': await run(client, username, duration, logins=0)}
+            results['thread pool'] = await run(client, username, duration, logins)
+            offloaded = auth.verify_password_async
+            auth.verify_password_async = verify_password_inline
+            try:
+                results['event loop'] = await run(client, username, duration, logins)
+            finally:
+                auth.verify_password_async = offloaded
+        finally:
+            async with async_session_maker() as session:
+                await session.execute(delete(UserModel).where(UserModel.username == username))
+                await session.commit()
+
+    print(f'{"bcrypt":<12} {"requests":>9} {"logins":>7} {"p50 ms":>8} {"p99 ms":>8} {"max ms":>8}')
+    for name, result in results.items():
+        print(
+            f'{name:<12} {result["requests"]:>9} {result["logins"]:>7} '
+            f'{result["p50_ms"]:>8.1f} {result["p99_ms"]:>8.1f} {result["max_ms"]:>8.1f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--duration', type=float, default=10.0, help='секунд на каждый режим')
+    parser.add_argument('--logins', type=int, default=4, help='одновременных клиентов логина')
+    args = parser.parse_args()
+    asyncio.run(main(args.duration, args.logins))
@@ -0,0 +1,392 @@
+"""
+Воспроизведение записанного потока транзакций через анализ риска: пропускная способность,
+гистограммы времени правил и матрица ошибок относительно размеченного fraud_flag.
+
+Записи TransactionCreateSchema читаются из JSONL или CSV и проходят анализ по времени транзакций.
+Окно анализа отсчитывается от времени воспроизводимой транзакции, в БД и статистику аккаунтов
+попадает флаг, который выставил анализ, как в работающем сервисе. Хранилища признаков:
+    postgres - путь сервиса на отдельной схеме replay той же базы, схема удаляется по завершении
+    memory - те же признаки в памяти процесса, без БД: только правила и скоринг
+Отчет сохраняется в JSON и сравнивается с отчетом предыдущего запуска:
+    python -m benchmarks.replay transactions.jsonl --store memory --output after.json --compare before.json
+"""
+import argparse
+import asyncio
+import csv
+import json
+import math
+import sys
+import time
+from array import array
+from collections import defaultdict
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+from pydantic import ValidationError
+
+from app.core.config import settings
+from app.core.enums import TransactionStatus
+from app.databases import transaction_crud
+from app.models.accounts import AccountModel
+from app.models.transactions import TransactionModel
+from app.schemas.risk import RiskFeaturesSchema
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.account_stats import account_stats_service
+from app.services.risk_analysis import risk_analysis_service
+from app.services.risk_profiles import RiskProfileCache, EPOCH
+from app.services.risk_rules import RECEIVER_SCORE, SENDER_WINDOW, VELOCITY
+from app.services.scoring import AccountScoringEngine, TransactionColumns, NEW_ACCOUNT_SCORE, TYPE_CODES
+from app.services.velocity import VelocityCounters
+from benchmarks.common import BenchmarkDatabase
+
+# Границы корзин гистограмм времени, микросекунды; последняя корзина - все, что дольше
+HISTOGRAM_EDGES_US = (0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, 50000)
+FEATURES = 'features'
+
+
+def load_records(path: Path) -> tuple[list[TransactionCreateSchema], list[str]]:
+    """Записи в порядке времени транзакций и ошибки невалидных строк"""
+    records, errors = [], []
+    with path.open(newline='') as file:
+        if path.suffix.lower() == '.csv':
+            lines = enumerate(csv.DictReader(file), start=2)
+            parse = TransactionCreateSchema.model_validate
+        else:
+            lines = ((number, line) for number, line in enumerate(file, start=1) if line.strip())
+            parse = TransactionCreateSchema.model_validate_json
+        for number, line in lines:
+            try:
+                records.append(parse(line))
+            except ValidationError as exc:
+                errors.append(f'{path.name}:{number}: {exc.errors()[0]["msg"]}')
+    records.sort(key=lambda record: record.transaction_datetime)
+    return records, errors
+
+
+def to_microseconds(moment: datetime) -> int:
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+class ReplayClock:
+    """Часы анализа риска, показывающие время воспроизводимой транзакции"""
+
+    def __init__(self):
+        self.now = datetime.now()
+
+    def __call__(self) -> datetime:
+        return self.now
+
+
+class AccountHistory:
+    """Транзакции аккаунта в колонках простых значений, как их отдает get_accounts_score_rows"""
+    __slots__ = ('timestamps', 'amounts', 'successful', 'types', 'fraud')
+
+    def __init__(self):
+        self.timestamps = array('q')
+        self.amounts = array('d')
+        self.successful: list[bool] = []
+        self.types = array('b')
+        self.fraud: list[bool] = []
+
+    def add(self, transaction: TransactionCreateSchema, is_fraud: bool) -> None:
+        self.timestamps.append(to_microseconds(transaction.transaction_datetime))
+        self.amounts.append(round(transaction.transaction_amount, 2))
+        self.successful.append(transaction.transaction_status == TransactionStatus.SUCCESS)
+        self.types.append(TYPE_CODES[transaction.transaction_type])
+        self.fraud.append(is_fraud)
+
+    def columns(self) -> TransactionColumns:
+        return TransactionColumns(
+            timestamps=np.frombuffer(self.timestamps, dtype=np.int64),
+            amounts=np.frombuffer(self.amounts, dtype=np.float64),
+            successful=np.array(self.successful, dtype=bool),
+            types=np.frombuffer(self.types, dtype=np.int8),
+            fraud=np.array(self.fraud, dtype=bool)
+        )
+
+
+class MemoryStore:
+    """
+    Признаки по уже воспроизведенным транзакциям в памяти: профили отправителей за окно анализа,
+    счетчики скорости и скоринг получателей по их полной истории
+    """
+    name = 'memory'
+
+    def __init__(self):
+        self.rules = risk_analysis_service.rules
+        self.profiles = RiskProfileCache(
+            window_days=settings.risk.analysis_window_days,
+            bucket_seconds=settings.risk.profile_bucket_seconds,
+            max_bytes=sys.maxsize,
+            ttl_seconds=math.inf
+        )
+        self.velocity = VelocityCounters(
+            slots=settings.risk.velocity_slots,
+            max_accounts=sys.maxsize,
+            max_receivers=settings.risk.velocity_max_receivers
+        )
+        self.history: dict[str, AccountHistory] = defaultdict(AccountHistory)
+        self.scores: dict[str, float] = {}
+
+    async def open(self, records: list[TransactionCreateSchema]) -> None:
+        pass
+
+    async def close(self) -> None:
+        pass
+
+    def score(self, account_id: str) -> float:
+        """Скоринг как у AccountModel.score; аккаунт без транзакций считается новым"""
+        if account_id not in self.history:
+            return NEW_ACCOUNT_SCORE
+        score = self.scores.get(account_id)
+        if score is None:
+            score = self.scores[account_id] = AccountScoringEngine.calculate(self.history[account_id].columns())
+        return score
+
+    async def features(self, transaction: TransactionCreateSchema) -> RiskFeaturesSchema:
+        features = RiskFeaturesSchema()
+        if self.rules.requires(SENDER_WINDOW):
+            now = transaction.transaction_datetime
+            profile = self.profiles.get_profile(transaction.sender_account_id, now=now)
+            if profile is None:
+                profile = self.profiles.put_profile(transaction.sender_account_id, [])
+            features.avg_amount, features.geolocations, features.devices = profile.window()
+        if self.rules.requires(RECEIVER_SCORE):
+            features.receiver_score = self.score(transaction.receiver_account_id)
+        if self.rules.requires(VELOCITY):
+            velocity = self.velocity.features(transaction.sender_account_id, transaction.transaction_datetime)
+            for name, value in velocity.items():
+                setattr(features, name, value)
+        return features
+
+    async def record(self, transaction: TransactionCreateSchema, is_fraud: bool) -> None:
+        # Перевод самому себе учитывается дважды, как в скоринге
+        for account_id in (transaction.sender_account_id, transaction.receiver_account_id):
+            self.history[account_id].add(transaction, is_fraud)
+            self.scores.pop(account_id, None)
+        self.profiles.observe(
+            sender_account_id=transaction.sender_account_id,
+            transaction_datetime=transaction.transaction_datetime,
+            amount=transaction.transaction_amount,
+            geolocation=transaction.geolocation,
+            device=transaction.device_user,
+            now=transaction.transaction_datetime
+        )
+        self.velocity.observe(
+            sender_account_id=transaction.sender_account_id,
+            receiver_account_id=transaction.receiver_account_id,
+            transaction_datetime=transaction.transaction_datetime,
+            amount=transaction.transaction_amount
+        )
+
+
+class PostgresStore:
+    """Путь сервиса: признаки из БД и кэша профилей, вставка транзакции и обновление статистики аккаунтов"""
+    name = 'postgres'
+
+    def __init__(self):
+        self.database = BenchmarkDatabase(schema='replay')
+        self.session = None
+
+    async def open(self, records: list[TransactionCreateSchema]) -> None:
+        await self.database.create()
+        account_ids = sorted(
+            {record.sender_account_id for record in records} | {record.receiver_account_id for record in records}
+        )
+        now = datetime.now()
+        async with self.database.session_maker() as session:
+            session.add_all([
+                AccountModel(account_id=account_id, first_name='replay', last_name='replay', middle_name='replay',
+                             score=NEW_ACCOUNT_SCORE, create_at=now, update_at=now)
+                for account_id in account_ids
+            ])
+            await session.commit()
+        risk_analysis_service.profiles.clear()
+        risk_analysis_service.velocity.clear()
+        self.session = self.database.session_maker()
+
+    async def close(self) -> None:
+        if self.session is not None:
+            await self.session.close()
+        await self.database.drop()
+
+    async def features(self, transaction: TransactionCreateSchema) -> RiskFeaturesSchema:
+        return await risk_analysis_service.get_features(transaction, self.session)
+
+    async def record(self, transaction: TransactionCreateSchema, is_fraud: bool) -> None:
+        model = TransactionModel(**transaction.model_dump(exclude={'fraud_flag'}), fraud_flag=is_fraud)
+        await transaction_crud.add(transaction=model, session=self.session, commit=False)
+        scores = await account_stats_service.apply_transactions(transactions=[model], session=self.session)
+        await transaction_crud.commit(self.session)
+        risk_analysis_service.observe_transaction(transaction)
+        risk_analysis_service.observe_scores(scores)
+
+
+STORES = {store.name: store for store in (MemoryStore, PostgresStore)}
+
+
+class LatencyHistogram:
+    __slots__ = ('samples',)
+
+    def __init__(self):
+        self.samples = array('d')
+
+    def add(self, seconds: float) -> None:
+        self.samples.append(seconds)
+
+    def report(self) -> dict:
+        if not self.samples:
+            return {'count': 0}
+        microseconds = np.frombuffer(self.samples, dtype=np.float64) * 1_000_000
+        counts = np.bincount(np.searchsorted(HISTOGRAM_EDGES_US, microseconds), minlength=len(HISTOGRAM_EDGES_US) + 1)
+        p50, p95, p99 = np.percentile(microseconds, [50, 95, 99])
+        return {
+            'count': len(microseconds),
+            'mean_us': float(microseconds.mean()),
+            'p50_us': float(p50),
+            'p95_us': float(p95),
+            'p99_us': float(p99),
+            'max_us': float(microseconds.max()),
+            'histogram': {
+                **{f'<={edge:g}us': int(count) for edge, count in zip(HISTOGRAM_EDGES_US, counts)},
+                f'>{HISTOGRAM_EDGES_US[-1]:g}us': int(counts[-1])
+            }
+        }
+
+
+def confusion(tp: int, fp: int, tn: int, fn: int) -> dict:
+    total = tp + fp + tn + fn
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    return {
+        'tp': tp,
+        'fp': fp,
+        'tn': tn,
+        'fn': fn,
+        'precision': precision,
+        'recall': recall,
+        'f1': 2 * precision * recall / (precision + recall) if precision + recall else 0.0,
+        'accuracy': (tp + tn) / total if total else 0.0,
+        'false_positive_rate': fp / (fp + tn) if fp + tn else 0.0
+    }
+
+
+async def replay(records: list[TransactionCreateSchema], store) -> dict:
+    latencies: dict[str, LatencyHistogram] = defaultdict(LatencyHistogram)
+    outcomes = {'tp': 0, 'fp': 0, 'tn': 0, 'fn': 0}
+    rule_hits: dict[str, list[int]] = defaultdict(lambda: [0, 0])  # срабатывания, из них на мошеннических
+    # Повторы отбрасываются по ключу пакетной загрузки: отправитель, получатель, сумма, дата
+    keys: set[tuple] = set()
+    duplicates = 0
+    analysis_seconds = 0.0
+
+    clock = ReplayClock()
+    previous_clock = risk_analysis_service.clock
+    risk_analysis_service.clock = clock
+    await store.open(records)
+    try:
+        started = time.perf_counter()
+        for transaction in records:
+            key = (transaction.sender_account_id, transaction.receiver_account_id,
+                   round(transaction.transaction_amount, 2), transaction.transaction_datetime)
+            if key in keys:
+                duplicates += 1
+                continue
+            keys.add(key)
+            clock.now = transaction.transaction_datetime
+            analysis_started = time.perf_counter()
+            features = await store.features(transaction)
+            features_seconds = time.perf_counter() - analysis_started
+            evaluation = risk_analysis_service.evaluate(transaction, features)
+            analysis_seconds += time.perf_counter() - analysis_started
+
+            await store.record(transaction, evaluation.is_fraud)
+            latencies[FEATURES].add(features_seconds)
+            for rule in evaluation.rules:
+                latencies[rule.name].add(rule.seconds)
+                if rule.hit:
+                    rule_hits[rule.name][0] += 1
+                    rule_hits[rule.name][1] += transaction.fraud_flag
+            correct = 't' if evaluation.is_fraud == transaction.fraud_flag else 'f'
+            outcomes[correct + ('p' if evaluation.is_fraud else 'n')] += 1
+        total_seconds = time.perf_counter() - started
+    finally:
+        risk_analysis_service.clock = previous_clock
+        await store.close()
+
+    replayed = len(records) - duplicates
+    return {
+        'store': store.name,
+        'transactions': replayed,
+        'duplicates': duplicates,
+        'labeled_fraud': outcomes['tp'] + outcomes['fn'],
+        'analysis_per_second': replayed / analysis_seconds if analysis_seconds else 0.0,
+        'total_per_second': replayed / total_seconds if total_seconds else 0.0,
+        'confusion': confusion(**outcomes),
+        'rules': {
+            name: {'hits': hits, 'fraud_hits': fraud_hits, 'precision': fraud_hits / hits if hits else 0.0}
+            for name, (hits, fraud_hits) in rule_hits.items()
+        },
+        'latency': {name: histogram.report() for name, histogram in latencies.items()}
+    }
+
+
+def print_report(report: dict, baseline: dict | None) -> None:
+    def delta(value: float, path: tuple[str, ...], digits: int) -> str:
+        if baseline is None:
+            return ''
+        previous = baseline
+        for key in path:
+            previous = previous.get(key) if isinstance(previous, dict) else None
+        if not isinstance(previous, (int, float)):
+            return ''
+        return f' ({value - previous:+.{digits}f})'
+
+    print(f'store {report["store"]}: {report["transactions"]} transactions, {report["labeled_fraud"]} labeled fraud, '
+          f'{report["duplicates"]} duplicates skipped')
+    for key in ('analysis_per_second', 'total_per_second'):
+        print(f'{key:<20} {report[key]:>12,.0f}{delta(report[key], (key,), 0)}')
+
+    matrix = report['confusion']
+    print(f'tp {matrix["tp"]}  fp {matrix["fp"]}  tn {matrix["tn"]}  fn {matrix["fn"]}')
+    for key in ('precision', 'recall', 'f1', 'accuracy', 'false_positive_rate'):
+        print(f'{key:<20} {matrix[key]:>12.4f}{delta(matrix[key], ("confusion", key), 4)}')
+
+    print(f'\n{"latency":<16} {"count":>9} {"mean us":>9} {"p50 us":>9} {"p95 us":>9} {"p99 us":>9} {"max us":>10} '
+          f'{"hits":>7} {"precision":>9}')
+    for name, latency in report['latency'].items():
+        rule = report['rules'].get(name, {})
+        hits = f'{rule["hits"]:>7} {rule["precision"]:>9.3f}' if rule else ''
+        print(
+            f'{name:<16} {latency["count"]:>9} {latency["mean_us"]:>9.2f} {latency["p50_us"]:>9.2f} '
+            f'{latency["p95_us"]:>9.2f} {latency["p99_us"]:>9.2f} {latency["max_us"]:>10.1f} {hits}'
+        )
+    print()
+    for name, latency in report['latency'].items():
+        buckets = '  '.join(f'{edge} {count}' for edge, count in latency['histogram'].items() if count)
+        print(f'{name:<16} {buckets}')
+
+
+async def main(path: Path, store: str, output: Path | None, compare: Path | None) -> None:
+    records, errors = load_records(path)
+    for error in errors[:10]:
+        print(error)
+    if errors:
+        print(f'{len(errors)} invalid records skipped')
+    baseline = json.loads(compare.read_text()) if compare is not None else None
+
+    report = await replay(records, STORES[store]())
+    print_report(report, baseline)
+    if output is not None:
+        output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', type=Path, help='JSONL или CSV с записями TransactionCreateSchema')
+    parser.add_argument('--store', choices=STORES, default='postgres')
+    parser.add_argument('--output', type=Path, help='сохранить отчет в JSON')
+    parser.add_argument('--compare', type=Path, help='отчет предыдущего запуска для сравнения')
+    args = parser.parse_args()
+    asyncio.run(main(args.path, args.store, args.output, args.compare))
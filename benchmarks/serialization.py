@@ -0,0 +1,89 @@
+"""
+Строк в секунду при выдаче списка транзакций: ORM + модели + response_model против строк Core + TypeAdapter.
+
+Данные генерируются в отдельной схеме benchmark той же базы, схема удаляется по завершении:
+    python -m benchmarks.serialization --transactions 100000
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+
+from pydantic import TypeAdapter
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.databases import transaction_crud
+from app.models.transactions import TransactionModel
+from app.schemas.transactions import TransactionSchema, transaction_rows_adapter
+from benchmarks.common import BenchmarkDatabase
+
+response_adapter = TypeAdapter(list[TransactionSchema])
+
+
+async def orm_path(session: AsyncSession, limit: int) -> tuple[float, bytes]:
+    """Прежний путь: ORM-объекты, model_validate, затем FastAPI проверяет response_model и вызывает json.dumps"""
+    result = await session.execute(select(TransactionModel).order_by(TransactionModel.id).limit(limit))
+    transactions = [TransactionSchema.model_validate(transaction) for transaction in result.scalars().all()]
+    started = time.perf_counter()
+    validated = response_adapter.validate_python(transactions, from_attributes=True)
+    content = response_adapter.dump_python(validated, mode='json')
+    body = json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(',', ':')).encode()
+    return time.perf_counter() - started, body
+
+
+async def rows_path(session: AsyncSession, limit: int) -> tuple[float, bytes]:
+    """Текущий путь: колонки Core, сериализация TypeAdapter прямо в байты"""
+    transactions = await transaction_crud.get_all(session=session, limit=limit)
+    started = time.perf_counter()
+    body = transaction_rows_adapter.dump_json(transactions)
+    return time.perf_counter() - started, body
+
+
+async def measure(database: BenchmarkDatabase, path, limit: int, repeat: int) -> dict:
+    totals, encodes, body = [], [], b''
+    for _ in range(repeat):
+        async with database.session_maker() as session:
+            started = time.perf_counter()
+            encode, body = await path(session, limit)
+            totals.append(time.perf_counter() - started)
+            encodes.append(encode)
+    rows = len(json.loads(body))
+    return {
+        'rows': rows,
+        'total_rows_per_second': rows / statistics.median(totals),
+        'encode_rows_per_second': rows / statistics.median(encodes),
+        'body': body
+    }
+
+
+async def main(account_count: int, transaction_count: int, repeat: int) -> None:
+    database = BenchmarkDatabase()
+    try:
+        await database.create()
+        await database.seed(account_count, transaction_count)
+        results = {
+            'orm + response_model': await measure(database, orm_path, transaction_count, repeat),
+            'core + TypeAdapter': await measure(database, rows_path, transaction_count, repeat)
+        }
+    finally:
+        await database.drop()
+
+    bodies = {result['body'] for result in results.values()}
+    print(f'identical JSON: {len(bodies) == 1}')
+    print(f'{"path":<22} {"rows":>8} {"total rows/s":>14} {"encode rows/s":>14}')
+    for name, result in results.items():
+        print(
+            f'{name:<22} {result["rows"]:>8} {result["total_rows_per_second"]:>14,.0f} '
+            f'{result["encode_rows_per_second"]:>14,.0f}'
+        )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--accounts', type=int, default=10_000)
+    parser.add_argument('--transactions', type=int, default=100_000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    asyncio.run(main(args.accounts, args.transactions, args.repeat))
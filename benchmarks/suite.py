@@ -0,0 +1,291 @@
+"""
+Набор замеров горячих путей сервиса с результатом в JSON для сравнения между коммитами.
+
+micro - расчет скоринга аккаунта (эталонный _calculate_account_score и векторизованный движок)
+        и правила анализа риска на сгенерированных данных, без БД
+e2e   - нагрузка на POST /transactions/, GET /accounts/score/{id} и списки транзакций и аккаунтов
+        через ASGI-приложение в том же процессе; данные генерируются в схеме benchmark, схема удаляется
+
+Данные задаются масштабом и seed, поэтому запуски на разных коммитах сравнимы:
+    python -m benchmarks.suite --accounts 10000 --transactions 200000 --output head.json --compare main.json
+С --compare код возврата 1, если пропускная способность упала или p95 вырос больше --threshold процентов.
+"""
+import argparse
+import asyncio
+import json
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable
+
+from app.core.app import get_app, APP_NAME
+from app.core.db import get_session
+from app.core.enums import DeviceUser, RiskStatus
+from app.schemas.risk import RiskFeaturesSchema
+from app.schemas.transactions import TransactionSchema
+from app.services.account_stats import account_stats_service
+from app.services.accounts import account_service
+from app.services.risk_analysis import risk_analysis_service
+from app.services.risk_rules import risk_rule_engine
+from app.services.scoring import AccountScoringEngine, TransactionColumns
+from benchmarks.common import AsgiClient, BenchmarkDatabase, GEOLOCATIONS, make_transactions
+
+STATS_CHUNK = 1000
+
+
+def measure_calls(function: Callable[[], object], number: int, repeat: int) -> dict:
+    """Лучшее из repeat время number вызовов: минимум меньше всего зависит от шума машины"""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            function()
+        timings.append((time.perf_counter() - started) / number)
+    best = min(timings)
+    return {
+        'calls': number * repeat,
+        'best_us': best * 1_000_000,
+        'median_us': statistics.median(timings) * 1_000_000,
+        'ops_per_second': 1 / best
+    }
+
+
+def run_micro(rng: random.Random, history: int, number: int, repeat: int) -> dict:
+    transactions = [
+        TransactionSchema(**transaction.model_dump(), id=index, risk_status=RiskStatus.SCORED)
+        for index, transaction in enumerate(make_transactions(history, 100, rng))
+    ]
+    sent, received = transactions[:history // 2], transactions[history // 2:]
+    columns = TransactionColumns.from_schemas(transactions)
+    results = {
+        'account_score_reference': measure_calls(
+            lambda: account_service._calculate_account_score(sent, received), max(number // 100, 1), repeat
+        ),
+        # Колонки готовятся заранее: сервис получает их из БД сразу в таком виде
+        'account_score_engine': measure_calls(
+            lambda: AccountScoringEngine.calculate(columns), max(number // 100, 1), repeat
+        )
+    }
+
+    samples = [
+        (
+            transaction,
+            RiskFeaturesSchema(
+                receiver_score=rng.uniform(0, 100),
+                avg_amount=rng.uniform(0, 10000),
+                geolocations=set(rng.sample(GEOLOCATIONS, rng.randint(0, 2))),
+                devices=set(rng.sample(list(DeviceUser), rng.randint(0, 1))),
+                sender_count_1m=rng.randint(0, 10),
+                sender_amount_1m=rng.uniform(0, 50000),
+                sender_receivers_1m=rng.randint(0, 5),
+                sender_count_1h=rng.randint(0, 50),
+                sender_amount_1h=rng.uniform(0, 200000),
+                sender_receivers_1h=rng.randint(0, 20),
+                sender_count_24h=rng.randint(0, 200),
+                sender_amount_24h=rng.uniform(0, 1000000),
+                sender_receivers_24h=rng.randint(0, 50)
+            )
+        )
+        for transaction in make_transactions(1000, 100, rng)
+    ]
+
+    def cycle(call: Callable) -> Callable[[], object]:
+        position = 0
+
+        def step():
+            nonlocal position
+            transaction, features = samples[position]
+            position = (position + 1) % len(samples)
+            return call(transaction, features)
+
+        return step
+
+    results['risk_rules'] = measure_calls(cycle(risk_rule_engine.evaluate), number, repeat)
+    for rule in risk_rule_engine.rules:
+        results[f'rule.{rule.name}'] = measure_calls(cycle(rule.predicate), number, repeat)
+    return results
+
+
+async def measure_requests(
+        client: AsgiClient, make_request: Callable[[int], tuple[str, str, object]], requests: int, concurrency: int
+) -> dict:
+    latencies: list[float] = []
+    statuses: Counter[int] = Counter()
+    counter = iter(range(requests))
+
+    async def worker() -> None:
+        for index in counter:
+            method, url, payload = make_request(index)
+            started = time.perf_counter()
+            status, _ = await client.request(method, url, payload)
+            latencies.append((time.perf_counter() - started) * 1000)
+            statuses[status] += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    seconds = time.perf_counter() - started
+    latencies.sort()
+    return {
+        'requests': requests,
+        'requests_per_second': requests / seconds,
+        'p50_ms': latencies[len(latencies) // 2],
+        'p95_ms': latencies[int(len(latencies) * 0.95) - 1],
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1],
+        'max_ms': latencies[-1],
+        'statuses': {str(status): count for status, count in sorted(statuses.items())}
+    }
+
+
+async def run_e2e(
+        rng: random.Random, account_count: int, transaction_count: int, requests: int, concurrency: int
+) -> dict:
+    database = BenchmarkDatabase()
+
+    async def benchmark_session():
+        async with database.session_maker() as session:
+            yield session
+
+    app = get_app(name=APP_NAME)
+    app.dependency_overrides[get_session] = benchmark_session
+    client = AsgiClient(app)
+    risk_analysis_service.profiles.clear()
+    risk_analysis_service.velocity.clear()
+    try:
+        await database.create()
+        await database.seed(account_count, transaction_count, seed=rng.uniform(-1, 1))
+        # Агрегаты аккаунтов строятся заранее, иначе первый запрос скоринга каждого аккаунта пересобирает их
+        async with database.session_maker() as session:
+            account_ids = [f'acc{index}' for index in range(1, account_count + 1)]
+            for start in range(0, account_count, STATS_CHUNK):
+                await account_stats_service.rebuild(account_ids=account_ids[start:start + STATS_CHUNK], session=session)
+            await session.commit()
+        await database.analyze()
+
+        # Новые транзакции идут позже истории, как в работающем сервисе: без пересборки агрегатов задним числом
+        now = datetime.now()
+        payloads = [
+            transaction.model_copy(update={'transaction_datetime': now + timedelta(milliseconds=index)})
+            for index, transaction in enumerate(make_transactions(requests, account_count, rng))
+        ]
+        scenarios: dict[str, Callable[[int], tuple[str, str, object]]] = {
+            'post_transaction': lambda index: ('POST', '/transactions/', payloads[index].model_dump(mode='json')),
+            'account_score': lambda index: ('GET', f'/accounts/score/acc{rng.randint(1, account_count)}', None),
+            'list_transactions': lambda index: (
+                'GET', f'/transactions/?limit=100&after={rng.randint(0, max(transaction_count - 100, 0))}', None
+            ),
+            'list_accounts': lambda index: (
+                'GET', f'/accounts/?limit=100&after=acc{rng.randint(1, account_count)}', None
+            )
+        }
+        results = {}
+        for name, make_request in scenarios.items():
+            results[name] = await measure_requests(client, make_request, requests, concurrency)
+            print(f'{name}: {results[name]["requests_per_second"]:,.0f} req/s', flush=True)
+        return results
+    finally:
+        await database.drop()
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+# Метрики сравнения: имя, больше - лучше
+COMPARED = {
+    'micro': (('ops_per_second', True),),
+    'e2e': (('requests_per_second', True), ('p95_ms', False))
+}
+
+
+def compare(result: dict, baseline: dict, threshold: float) -> list[str]:
+    """Печатает изменения относительно baseline и возвращает регрессии больше threshold процентов"""
+    regressions = []
+    print(f'\ncompared with {baseline["meta"].get("commit") or "baseline"}')
+    for section, metrics in COMPARED.items():
+        for name, values in result.get(section, {}).items():
+            previous = baseline.get(section, {}).get(name)
+            if previous is None:
+                continue
+            for metric, higher_is_better in metrics:
+                if not previous.get(metric):
+                    continue
+                change = (values[metric] - previous[metric]) / previous[metric] * 100
+                worse = -change if higher_is_better else change
+                mark = ' REGRESSION' if worse > threshold else ''
+                print(f'{section}.{name}.{metric:<20} {previous[metric]:>14,.2f} -> {values[metric]:>14,.2f} '
+                      f'{change:+7.1f}%{mark}')
+                if mark:
+                    regressions.append(f'{section}.{name}.{metric}')
+    return regressions
+
+
+def print_results(result: dict) -> None:
+    if 'micro' in result:
+        print(f'\n{"micro":<28} {"best us":>10} {"median us":>10} {"ops/s":>14}')
+        for name, values in result['micro'].items():
+            print(f'{name:<28} {values["best_us"]:>10.2f} {values["median_us"]:>10.2f} '
+                  f'{values["ops_per_second"]:>14,.0f}')
+    if 'e2e' in result:
+        print(f'\n{"e2e":<20} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"max ms":>8}  statuses')
+        for name, values in result['e2e'].items():
+            print(f'{name:<20} {values["requests_per_second"]:>9,.0f} {values["p50_ms"]:>8.2f} '
+                  f'{values["p95_ms"]:>8.2f} {values["p99_ms"]:>8.2f} {values["max_ms"]:>8.1f}  {values["statuses"]}')
+
+
+async def main(args: argparse.Namespace) -> int:
+    result = {
+        'meta': {
+            'commit': git_commit(),
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'seed': args.seed,
+            'accounts': args.accounts,
+            'transactions': args.transactions,
+            'history': args.history,
+            'requests': args.requests,
+            'concurrency': args.concurrency
+        }
+    }
+    if args.suite in ('micro', 'all'):
+        result['micro'] = run_micro(random.Random(args.seed), args.history, args.number, args.repeat)
+    if args.suite in ('e2e', 'all'):
+        result['e2e'] = await run_e2e(
+            random.Random(args.seed), args.accounts, args.transactions, args.requests, args.concurrency
+        )
+    print_results(result)
+    if args.output is not None:
+        args.output.write_text(json.dumps(result, indent=2))
+    if args.compare is not None:
+        regressions = compare(result, json.loads(args.compare.read_text()), args.threshold)
+        if regressions:
+            print(f'{len(regressions)} regressions above {args.threshold:g}%')
+            return 1
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--suite', choices=('micro', 'e2e', 'all'), default='all')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--accounts', type=int, default=10_000)
+    parser.add_argument('--transactions', type=int, default=200_000)
+    parser.add_argument('--history', type=int, default=1000, help='транзакций аккаунта в замере скоринга')
+    parser.add_argument('--number', type=int, default=10_000, help='вызовов правила в одном повторе')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--requests', type=int, default=2000, help='запросов на сценарий')
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--output', type=Path, help='сохранить результат в JSON')
+    parser.add_argument('--compare', type=Path, help='результат другого коммита для сравнения')
+    parser.add_argument('--threshold', type=float, default=10.0, help='допустимое ухудшение, проценты')
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,60 @@
+"""
+Локальный заменитель системы банка для проверки доставки уведомлений о мошеннических транзакциях.
+
+Принимает пачки POST /alerts, отбрасывает повторы по idempotency_key и печатает каждое новое уведомление.
+Доля ответов с ошибкой и задержка ответа имитируют недоступность получателя:
+    python -m commands.alert_receiver --port 9000 --fail-rate 0.3 --delay 0.2
+В settings.toml: alert_settings.enabled = true, webhook_url = "http://localhost:9000/alerts".
+"""
+import argparse
+import asyncio
+import random
+
+import uvicorn
+from fastapi import FastAPI, Request
+from starlette.responses import JSONResponse
+from starlette.status import HTTP_503_SERVICE_UNAVAILABLE
+
+
+def get_receiver(fail_rate: float, delay: float) -> FastAPI:
+    app = FastAPI(title='Alert receiver')
+    received: set[str] = set()
+    counters = {'batches': 0, 'alerts': 0, 'duplicates': 0, 'failed': 0}
+
+    @app.post('/alerts')
+    async def receive_alerts(request: Request):
+        if delay:
+            await asyncio.sleep(delay)
+        if random.random() < fail_rate:
+            counters['failed'] += 1
+            return JSONResponse({'detail': 'unavailable'}, status_code=HTTP_503_SERVICE_UNAVAILABLE)
+        body = await request.json()
+        counters['batches'] += 1
+        for alert in body['alerts']:
+            if alert['idempotency_key'] in received:
+                counters['duplicates'] += 1
+                continue
+            received.add(alert['idempotency_key'])
+            counters['alerts'] += 1
+            print(
+                f'{alert["idempotency_key"]}: {alert["sender_account_id"]} -> {alert["receiver_account_id"]} '
+                f'{alert["transaction_amount"]} score {alert["risk_score"]}',
+                flush=True
+            )
+        return {'accepted': len(body['alerts'])}
+
+    @app.get('/stats')
+    async def get_stats():
+        return counters
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9000)
+    parser.add_argument('--fail-rate', type=float, default=0.0, help='доля пачек, отклоняемых с 503')
+    parser.add_argument('--delay', type=float, default=0.0, help='задержка ответа, секунды')
+    args = parser.parse_args()
+    uvicorn.run(get_receiver(args.fail_rate, args.delay), host=args.host, port=args.port, log_level='warning')
@@ -0,0 +1,63 @@
+"""
+Массовая загрузка транзакций из файла JSONL (по объекту на строку) или CSV с заголовком, например, выгрузки истории.
+
+Поля - как у POST /transactions. Файл читается и записывается пачками через COPY, по коммиту на пачку:
+    python -m commands.ingest transactions.jsonl --chunk-size 5000
+    python -m commands.ingest export.csv --no-scoring --concurrency 4
+Без --no-scoring каждая транзакция оценивается правилами риска на момент своего времени: окно отправителя
+заканчивается датой транзакции, а не текущей. С --no-scoring fraud_flag берется из файла,
+а до --concurrency пачек пишутся одновременно.
+Некорректные строки, дубликаты и транзакции неизвестных аккаунтов пропускаются и учитываются в итогах.
+Повторный запуск по тому же файлу не создает дубликатов.
+"""
+import argparse
+import asyncio
+from pathlib import Path
+
+from app.core.config import settings
+from app.core.db import engine
+from app.services.ingestion import ingestion_service, IngestProgress
+
+# Аккаунты пачки уходят в запрос одним списком параметров, а их в запросе asyncpg не больше 32767
+MAX_CHUNK_SIZE = 10000
+
+
+def report(progress: IngestProgress) -> None:
+    rows_per_second = progress.read / progress.seconds if progress.seconds else 0.0
+    print(
+        f'{progress.read} read, {progress.created} created, {progress.duplicates} duplicates, '
+        f'{progress.invalid} invalid, {progress.rejected} rejected, {progress.fraud} fraud, '
+        f'{rows_per_second:,.0f} rows/s',
+        flush=True
+    )
+
+
+async def main(path: Path, file_format: str, chunk_size: int, score: bool, concurrency: int) -> None:
+    try:
+        result = await ingestion_service.ingest(
+            path=path,
+            file_format=file_format,
+            chunk_size=chunk_size,
+            score=score,
+            concurrency=concurrency,
+            on_progress=report
+        )
+    finally:
+        await engine.dispose()
+    print(f'ingested {result.created} of {result.read} rows in {result.seconds:.1f} s')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', type=Path)
+    parser.add_argument('--format', choices=('jsonl', 'csv'), help='по умолчанию по расширению файла')
+    parser.add_argument('--chunk-size', type=int, default=5000)
+    parser.add_argument('--no-scoring', action='store_true', help='не оценивать риск, fraud_flag из файла')
+    parser.add_argument('--concurrency', type=int, default=2, help='пачек, которые пишутся одновременно')
+    args = parser.parse_args()
+    if not 0 < args.chunk_size <= MAX_CHUNK_SIZE:
+        parser.error(f'--chunk-size от 1 до {MAX_CHUNK_SIZE}')
+    if not 0 < args.concurrency <= settings.db.pool_size:
+        parser.error(f'--concurrency от 1 до {settings.db.pool_size}')
+    file_format = args.format or ('csv' if args.path.suffix.lower() == '.csv' else 'jsonl')
+    asyncio.run(main(args.path, file_format, args.chunk_size, not args.no_scoring, args.concurrency))
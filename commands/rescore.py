@@ -0,0 +1,54 @@
+"""
+Пересчет сохраненного скоринга всех аккаунтов по полной истории транзакций, например после изменения модели скоринга.
+
+Аккаунты обрабатываются пачками по порядку account_id, скоринг считает пул процессов.
+После каждой записанной пачки контрольная точка сохраняется в файл, прерванный запуск продолжается с нее:
+    python -m commands.rescore --chunk-size 1000 --workers 8
+Работающие воркеры сервиса подхватят новый скоринг, когда истечет profile_ttl_seconds.
+"""
+import argparse
+import asyncio
+import os
+from pathlib import Path
+
+from app.core.db import engine
+from app.services.rescoring import rescoring_service, RescoreProgress
+
+
+def report(progress: RescoreProgress) -> None:
+    accounts_per_second = progress.processed / progress.seconds if progress.seconds else 0.0
+    transactions_per_second = progress.transactions / progress.seconds if progress.seconds else 0.0
+    left = progress.total - progress.processed
+    eta = left / accounts_per_second if accounts_per_second else 0.0
+    print(
+        f'{progress.processed}/{progress.total} accounts, {accounts_per_second:,.0f} accounts/s, '
+        f'{transactions_per_second:,.0f} transactions/s, ETA {eta:,.0f} s',
+        flush=True
+    )
+
+
+async def main(checkpoint: Path, chunk_size: int, workers: int, restart: bool) -> None:
+    if restart:
+        checkpoint.unlink(missing_ok=True)
+    elif checkpoint.exists():
+        print(f'resuming from {checkpoint}')
+    try:
+        result = await rescoring_service.rescore(
+            checkpoint_path=checkpoint, chunk_size=chunk_size, workers=workers, on_progress=report
+        )
+    finally:
+        await engine.dispose()
+    print(
+        f'rescored {result.processed} accounts and {result.transactions} transactions '
+        f'in {result.seconds:.1f} s'
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--chunk-size', type=int, default=1000)
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--checkpoint', type=Path, default=Path('.rescore_checkpoint.json'))
+    parser.add_argument('--restart', action='store_true', help='начать заново, игнорируя контрольную точку')
+    args = parser.parse_args()
+    asyncio.run(main(args.checkpoint, args.chunk_size, args.workers, args.restart))
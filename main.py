@@ -1,11 +1,42 @@
+import asyncio
+import os
+
 import uvicorn
 
 from app.core.config import settings
-from app.core.app import get_app
+from app.core.db import engine, run_migrations
+from app.core.logger import logging_service
+from app.core.metrics import metrics
+from app.services.risk_rules import risk_rule_engine, VELOCITY
+
+
+async def prepare_database() -> None:
+    """Применяет миграции один раз до запуска воркеров и закрывает соединения родительского процесса"""
+    await run_migrations()
+    await engine.dispose()
 
 
 if __name__ == '__main__':
-    app = get_app(name='Transaction Service')
-    app.mount(settings.app.app_mount, app)
+    workers = settings.app.workers or os.cpu_count()
+    # Счетчики скорости в памяти процесса: с несколькими процессами каждый видит только часть транзакций
+    if risk_rule_engine.requires(VELOCITY) and workers > 1:
+        raise SystemExit(f'Правила скорости работают только с workers = 1, настроено процессов: {workers}')
+    logging_service.start()
+    asyncio.run(prepare_database())
+    # Снимки метрик прошлого запуска не должны попасть в суммы нового
+    metrics.reset()
 
-    uvicorn.run(app, host=settings.app.app_host, port=settings.app.app_port)
\ No newline at end of file
+    # loop и http 'auto' выбирают uvloop и httptools, если они установлены (на Windows uvloop нет).
+    # log_config=None: uvicorn не ставит свои синхронные обработчики, его логгеры пишут через очередь
+    uvicorn.run(
+        'app.core.app:create_app',
+        factory=True,
+        host=settings.app.app_host,
+        port=settings.app.app_port,
+        workers=workers,
+        loop='auto',
+        http='auto',
+        timeout_graceful_shutdown=settings.app.graceful_shutdown_seconds,
+        log_config=None
+    )
+    logging_service.stop()
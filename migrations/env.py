@@ -0,0 +1,66 @@
+import asyncio
+
+from alembic import context
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from app.core.config import settings
+from app.models.base_model import BaseInit
+from app.models import transactions, accounts, users, alerts
+
+target_metadata = BaseInit.metadata
+
+
+def include_object(obj, name, type_, reflected, compare_to) -> bool:
+    """Секции и архивные таблицы транзакций создаются вне моделей и не сравниваются с ними"""
+    table_name = name if type_ == 'table' else getattr(getattr(obj, 'table', None), 'name', '')
+    if reflected and compare_to is None and table_name.startswith('transactions_'):
+        return False
+    return True
+
+
+def run_migrations_offline() -> None:
+    context.configure(
+        url=settings.db.url,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        literal_binds=True,
+        dialect_opts={'paramstyle': 'named'},
+        transaction_per_migration=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(connection: Connection) -> None:
+    # Каждая миграция в своей транзакции: индексы создаются CONCURRENTLY вне транзакции
+    context.configure(
+        connection=connection,
+        target_metadata=target_metadata,
+        include_object=include_object,
+        transaction_per_migration=True
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    engine = create_async_engine(settings.db.url)
+    async with engine.connect() as connection:
+        await connection.run_sync(do_run_migrations)
+    await engine.dispose()
+
+
+def run_migrations_online() -> None:
+    # Соединение передается из приложения при старте, см. app.core.db.run_migrations
+    connection = context.config.attributes.get('connection')
+    if connection is None:
+        asyncio.run(run_async_migrations())
+    else:
+        do_run_migrations(connection)
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
@@ -0,0 +1,75 @@
+"""initial schema
+
+Revision ID: 0001
+Revises: 
+Create Date: 2026-10-18 13:23:11.581253
+
+Схема в том виде, в каком ее создавал create_tables до перехода на миграции
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0001'
+down_revision: Union[str, None] = None
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('accounts',
+    sa.Column('account_id', sa.String(), nullable=False),
+    sa.Column('first_name', sa.String(), nullable=False),
+    sa.Column('last_name', sa.String(), nullable=False),
+    sa.Column('middle_name', sa.String(), nullable=False),
+    sa.Column('score', sa.Float(), nullable=False),
+    sa.Column('create_at', sa.DateTime(), nullable=False),
+    sa.Column('update_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('account_id')
+    )
+    op.create_index(op.f('ix_accounts_account_id'), 'accounts', ['account_id'], unique=False)
+    op.create_table('users',
+    sa.Column('id', sa.UUID(), server_default=sa.text('gen_random_uuid()'), nullable=False),
+    sa.Column('username', sa.String(length=64), nullable=False),
+    sa.Column('hashed_password', sa.String(), nullable=False),
+    sa.Column('email', sa.String(length=120), nullable=False),
+    sa.Column('full_name', sa.String(length=128), nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('updated_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_users_email'), 'users', ['email'], unique=True)
+    op.create_index(op.f('ix_users_id'), 'users', ['id'], unique=False)
+    op.create_index(op.f('ix_users_username'), 'users', ['username'], unique=True)
+    op.create_table('transactions',
+    sa.Column('sender_account_id', sa.String(), nullable=False),
+    sa.Column('receiver_account_id', sa.String(), nullable=False),
+    sa.Column('transaction_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+    sa.Column('transaction_type', sa.Enum('TRANSFER', 'DEPOSIT', 'WITHDRAWAL', name='transactiontype'), nullable=False),
+    sa.Column('transaction_datetime', sa.DateTime(), nullable=False),
+    sa.Column('transaction_status', sa.Enum('FAILED', 'SUCCESS', name='transactionstatus'), nullable=False),
+    sa.Column('fraud_flag', sa.Boolean(), nullable=False),
+    sa.Column('geolocation', sa.String(), nullable=False),
+    sa.Column('device_user', sa.Enum('DESKTOP', 'MOBILE', name='deviceuser'), nullable=False),
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['receiver_account_id'], ['accounts.account_id'], ),
+    sa.ForeignKeyConstraint(['sender_account_id'], ['accounts.account_id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_transactions_id'), 'transactions', ['id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_transactions_id'), table_name='transactions')
+    op.drop_table('transactions')
+    op.drop_index(op.f('ix_users_username'), table_name='users')
+    op.drop_index(op.f('ix_users_id'), table_name='users')
+    op.drop_index(op.f('ix_users_email'), table_name='users')
+    op.drop_table('users')
+    op.drop_index(op.f('ix_accounts_account_id'), table_name='accounts')
+    op.drop_table('accounts')
+    for enum_name in ('transactiontype', 'transactionstatus', 'deviceuser'):
+        sa.Enum(name=enum_name).drop(op.get_bind(), checkfirst=True)
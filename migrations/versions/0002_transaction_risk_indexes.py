@@ -0,0 +1,57 @@
+"""transaction risk indexes
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18 13:30:02.114907
+
+Составные индексы под запросы анализа риска и скоринга.
+Создаются CONCURRENTLY, чтобы не блокировать запись в таблицу транзакций
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0002'
+down_revision: Union[str, None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_transactions_sender_datetime',
+            'transactions',
+            ['sender_account_id', 'transaction_datetime'],
+            unique=False,
+            postgresql_include=['transaction_amount', 'geolocation', 'device_user'],
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+        op.create_index(
+            'ix_transactions_receiver_datetime',
+            'transactions',
+            ['receiver_account_id', 'transaction_datetime'],
+            unique=False,
+            postgresql_concurrently=True,
+            if_not_exists=True
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_transactions_receiver_datetime',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
+        op.drop_index(
+            'ix_transactions_sender_datetime',
+            table_name='transactions',
+            postgresql_concurrently=True,
+            if_exists=True
+        )
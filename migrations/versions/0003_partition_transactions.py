@@ -0,0 +1,124 @@
+"""partition transactions
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-18 13:41:27.530214
+
+Таблица транзакций секционируется по диапазонам transaction_datetime, по секции на месяц.
+Существующие строки переносятся в секции, секции на следующие месяцы
+дальше создает app.services.partitions.PartitionService
+
+"""
+from datetime import datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '0003'
+down_revision: Union[str, None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+COLUMNS = (
+    'id, sender_account_id, receiver_account_id, transaction_amount, transaction_type, '
+    'transaction_datetime, transaction_status, fraud_flag, geolocation, device_user'
+)
+MONTHS_AHEAD = 3
+
+
+def add_months(date: datetime, months: int) -> datetime:
+    month = date.month - 1 + months
+    return datetime(date.year + month // 12, month % 12 + 1, 1)
+
+
+def columns(partitioned: bool) -> list:
+    return [
+        sa.Column('sender_account_id', sa.String(), nullable=False),
+        sa.Column('receiver_account_id', sa.String(), nullable=False),
+        sa.Column('transaction_amount', sa.Numeric(precision=10, scale=2), nullable=False),
+        sa.Column(
+            'transaction_type',
+            postgresql.ENUM('TRANSFER', 'DEPOSIT', 'WITHDRAWAL', name='transactiontype', create_type=False),
+            nullable=False
+        ),
+        sa.Column('transaction_datetime', sa.DateTime(), nullable=False),
+        sa.Column(
+            'transaction_status',
+            postgresql.ENUM('FAILED', 'SUCCESS', name='transactionstatus', create_type=False),
+            nullable=False
+        ),
+        sa.Column('fraud_flag', sa.Boolean(), nullable=False),
+        sa.Column('geolocation', sa.String(), nullable=False),
+        sa.Column(
+            'device_user',
+            postgresql.ENUM('DESKTOP', 'MOBILE', name='deviceuser', create_type=False),
+            nullable=False
+        ),
+        sa.Column(
+            'id', sa.Integer(), server_default=sa.text("nextval('transactions_id_seq'::regclass)"), nullable=False
+        ),
+        sa.ForeignKeyConstraint(['receiver_account_id'], ['accounts.account_id'], ),
+        sa.ForeignKeyConstraint(['sender_account_id'], ['accounts.account_id'], ),
+        sa.PrimaryKeyConstraint('id', 'transaction_datetime') if partitioned else sa.PrimaryKeyConstraint('id')
+    ]
+
+
+def create_indexes() -> None:
+    op.create_index(op.f('ix_transactions_id'), 'transactions', ['id'], unique=False)
+    op.create_index(
+        'ix_transactions_sender_datetime',
+        'transactions',
+        ['sender_account_id', 'transaction_datetime'],
+        unique=False,
+        postgresql_include=['transaction_amount', 'geolocation', 'device_user']
+    )
+    op.create_index(
+        'ix_transactions_receiver_datetime',
+        'transactions',
+        ['receiver_account_id', 'transaction_datetime'],
+        unique=False
+    )
+
+
+def replace_table(partitioned: bool) -> None:
+    """Пересоздает таблицу транзакций с переносом строк; последовательность id сохраняется"""
+    op.drop_index('ix_transactions_receiver_datetime', table_name='transactions')
+    op.drop_index('ix_transactions_sender_datetime', table_name='transactions')
+    op.drop_index(op.f('ix_transactions_id'), table_name='transactions')
+    op.drop_constraint('transactions_receiver_account_id_fkey', 'transactions', type_='foreignkey')
+    op.drop_constraint('transactions_sender_account_id_fkey', 'transactions', type_='foreignkey')
+    op.rename_table('transactions', 'transactions_old')
+    op.execute('ALTER INDEX transactions_pkey RENAME TO transactions_old_pkey')
+
+    options = {'postgresql_partition_by': 'RANGE (transaction_datetime)'} if partitioned else {}
+    op.create_table('transactions', *columns(partitioned), **options)
+    op.execute('ALTER SEQUENCE transactions_id_seq OWNED BY transactions.id')
+
+    if partitioned:
+        now = datetime.now()
+        first = op.get_bind().execute(sa.text('SELECT min(transaction_datetime) FROM transactions_old')).scalar()
+        month = add_months(min(first or now, now), 0)
+        end = add_months(now, MONTHS_AHEAD + 1)
+        while month < end:
+            op.execute(
+                f"CREATE TABLE transactions_p{month:%Y_%m} PARTITION OF transactions "
+                f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+            )
+            month = add_months(month, 1)
+        op.execute('CREATE TABLE transactions_default PARTITION OF transactions DEFAULT')
+
+    op.execute(f'INSERT INTO transactions ({COLUMNS}) SELECT {COLUMNS} FROM transactions_old')
+    op.drop_table('transactions_old')
+    create_indexes()
+
+
+def upgrade() -> None:
+    replace_table(partitioned=True)
+
+
+def downgrade() -> None:
+    # Отсоединенные архивные секции transactions_archive_* остаются отдельными таблицами
+    replace_table(partitioned=False)
@@ -0,0 +1,49 @@
+"""transaction risk status
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18 15:12:40.318562
+
+Статус оценки риска транзакции для асинхронного скоринга.
+Все уже сохраненные транзакции оценены при записи и получают SCORED
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '0004'
+down_revision: Union[str, None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+risk_status = postgresql.ENUM('PENDING', 'SCORED', name='riskstatus')
+
+
+def upgrade() -> None:
+    risk_status.create(op.get_bind(), checkfirst=True)
+    op.add_column(
+        'transactions',
+        sa.Column(
+            'risk_status',
+            postgresql.ENUM(name='riskstatus', create_type=False),
+            server_default='SCORED',
+            nullable=False
+        )
+    )
+    op.create_index(
+        'ix_transactions_pending',
+        'transactions',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text("risk_status = 'PENDING'")
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_pending', table_name='transactions', postgresql_where=sa.text("risk_status = 'PENDING'"))
+    op.drop_column('transactions', 'risk_status')
+    risk_status.drop(op.get_bind(), checkfirst=True)
@@ -0,0 +1,53 @@
+"""fraud alerts outbox
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18 17:05:12.480115
+
+Таблица исходящих уведомлений о мошеннических транзакциях для системы банка
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '0005'
+down_revision: Union[str, None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table('fraud_alerts',
+    sa.Column('id', sa.BigInteger(), autoincrement=True, nullable=False),
+    sa.Column('idempotency_key', sa.String(length=64), nullable=False),
+    sa.Column('transaction_id', sa.Integer(), nullable=False),
+    sa.Column('payload', postgresql.JSONB(astext_type=sa.Text()), nullable=False),
+    sa.Column('attempts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('created_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('next_attempt_at', sa.DateTime(), server_default=sa.text('now()'), nullable=False),
+    sa.Column('delivered_at', sa.DateTime(), nullable=True),
+    sa.Column('failed_at', sa.DateTime(), nullable=True),
+    sa.Column('last_error', sa.String(), nullable=True),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('idempotency_key')
+    )
+    op.create_index(
+        'ix_fraud_alerts_pending',
+        'fraud_alerts',
+        ['id'],
+        unique=False,
+        postgresql_where=sa.text('delivered_at IS NULL AND failed_at IS NULL')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index(
+        'ix_fraud_alerts_pending',
+        table_name='fraud_alerts',
+        postgresql_where=sa.text('delivered_at IS NULL AND failed_at IS NULL')
+    )
+    op.drop_table('fraud_alerts')
@@ -0,0 +1,45 @@
+"""account stats
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-19 10:12:40.318527
+
+Накопительные агрегаты транзакций аккаунтов для поддержания скоринга.
+Таблица могла попасть в базу раньше: через create_tables до перехода на миграции или из прежней
+версии ревизии 0001. Тогда она уже совпадает с этой схемой и не создается заново
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0006'
+down_revision: Union[str, None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    if sa.inspect(op.get_bind()).has_table('account_stats'):
+        return
+    op.create_table('account_stats',
+    sa.Column('account_id', sa.String(), nullable=False),
+    sa.Column('transaction_count', sa.Integer(), nullable=False),
+    sa.Column('successful_count', sa.Integer(), nullable=False),
+    sa.Column('type_weight_sum', sa.Float(), nullable=False),
+    sa.Column('fraud_count', sa.Integer(), nullable=False),
+    sa.Column('amount_score', sa.Float(), nullable=False),
+    sa.Column('gap_days_sum', sa.BigInteger(), nullable=False),
+    sa.Column('first_datetime', sa.DateTime(), nullable=True),
+    sa.Column('last_datetime', sa.DateTime(), nullable=True),
+    sa.Column('needs_rebuild', sa.Boolean(), nullable=False),
+    sa.Column('update_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['account_id'], ['accounts.account_id'], ),
+    sa.PrimaryKeyConstraint('account_id')
+    )
+
+
+def downgrade() -> None:
+    op.drop_table('account_stats')
@@ -0,0 +1,56 @@
+"""transaction duplicate key
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-19 14:05:11.902144
+
+Уникальный индекс по ключу дубликата (отправитель, получатель, сумма, дата).
+Раньше дубликаты отсекались только проверкой в приложении, и параллельные запросы могли записать
+одну транзакцию дважды. Миграция строки не удаляет: если ключ уже повторяется, она перечисляет такие
+группы и прерывается, чтобы оператор сам решил, какие записи оставить
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0007'
+down_revision: Union[str, None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько групп совпадающих строк показать в отчете перед остановкой миграции
+REPORT_LIMIT = 50
+KEY_COLUMNS = ['sender_account_id', 'receiver_account_id', 'transaction_amount', 'transaction_datetime']
+
+
+def upgrade() -> None:
+    collisions = op.get_bind().execute(sa.text(
+        """
+        SELECT sender_account_id, receiver_account_id, transaction_amount, transaction_datetime,
+               array_agg(id ORDER BY id) AS ids
+        FROM transactions
+        GROUP BY sender_account_id, receiver_account_id, transaction_amount, transaction_datetime
+        HAVING count(*) > 1
+        ORDER BY transaction_datetime
+        LIMIT :limit
+        """
+    ), {'limit': REPORT_LIMIT}).all()
+    if collisions:
+        report = '\n'.join(
+            f'  {row.sender_account_id} -> {row.receiver_account_id} {row.transaction_amount} '
+            f'{row.transaction_datetime.isoformat()}: id {", ".join(map(str, row.ids))}'
+            for row in collisions
+        )
+        raise RuntimeError(
+            f'Transactions share the duplicate key, unique index not created '
+            f'(first {len(collisions)} groups):\n{report}\n'
+            'Resolve these rows manually and run the migration again'
+        )
+    op.create_index('ix_transactions_duplicate_key', 'transactions', KEY_COLUMNS, unique=True, if_not_exists=True)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_transactions_duplicate_key', table_name='transactions', if_exists=True)
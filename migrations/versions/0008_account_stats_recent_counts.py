@@ -0,0 +1,34 @@
+"""account stats recent counts
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-20 11:32:07.518204
+
+Гистограмма транзакций аккаунта по давности в днях от его последней транзакции.
+По ней скоринг считает вес давности из одной строки account_stats, без чтения истории транзакций.
+Существующие агрегаты помечаются на пересборку: гистограмма заполнится при следующем обращении
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+revision: str = '0008'
+down_revision: Union[str, None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'account_stats',
+        sa.Column('recent_counts', postgresql.ARRAY(sa.Integer()), server_default='{}', nullable=False)
+    )
+    op.execute(sa.text('UPDATE account_stats SET needs_rebuild = true'))
+
+
+def downgrade() -> None:
+    op.drop_column('account_stats', 'recent_counts')
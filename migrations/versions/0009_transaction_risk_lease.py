@@ -0,0 +1,28 @@
+"""transaction risk lease
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-20 15:47:23.604981
+
+Срок аренды оценки PENDING-транзакции. Его выставляет процесс, который сохранил транзакцию
+или подобрал ее проходом восстановления; до истечения срока другие проходы ее не трогают
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision: str = '0009'
+down_revision: Union[str, None] = '0008'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('transactions', sa.Column('risk_lease_until', sa.DateTime(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('transactions', 'risk_lease_until')
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.db import _upgrade
+
+# Тесты с маркером postgres работают в отдельной базе рядом с настроенной в settings.toml
+TEST_DB = settings.db.model_copy(update={'db_name': f'{settings.db.db_name}_test'})
+
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+
+async def _recreate_database(create: bool) -> None:
+    engine = create_async_engine(settings.db.url, poolclass=NullPool, isolation_level='AUTOCOMMIT')
+    try:
+        async with engine.connect() as connection:
+            await connection.execute(text(f'DROP DATABASE IF EXISTS {TEST_DB.db_name} WITH (FORCE)'))
+            if create:
+                await connection.execute(text(f'CREATE DATABASE {TEST_DB.db_name}'))
+    finally:
+        await engine.dispose()
+
+
+async def _migrate() -> None:
+    engine = create_async_engine(TEST_DB.url, poolclass=NullPool)
+    try:
+        async with engine.connect() as connection:
+            await connection.run_sync(_upgrade)
+    finally:
+        await engine.dispose()
+
+
+@pytest.fixture(scope='session')
+def postgres_url() -> str:
+    """Пустая база, поднятая миграциями до последней ревизии; удаляется после тестов"""
+    try:
+        asyncio.run(_recreate_database(create=True))
+    except (OSError, ConnectionError) as exc:
+        pytest.skip(f'PostgreSQL недоступен: {exc}')
+    asyncio.run(_migrate())
+    yield TEST_DB.url
+    asyncio.run(_recreate_database(create=False))
+
+
+@pytest.fixture
+async def postgres_engine(postgres_url: str) -> AsyncEngine:
+    engine = create_async_engine(postgres_url, poolclass=NullPool)
+    yield engine
+    await engine.dispose()
+
+
+@pytest.fixture
+def postgres_session_maker(postgres_engine: AsyncEngine) -> async_sessionmaker[AsyncSession]:
+    return async_sessionmaker(bind=postgres_engine, class_=AsyncSession, expire_on_commit=False)
+
+
+@pytest.fixture
+async def postgres_session(postgres_session_maker: async_sessionmaker[AsyncSession]) -> AsyncSession:
+    async with postgres_session_maker() as session:
+        yield session
@@ -0,0 +1,121 @@
+import asyncio
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import event
+
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser
+from app.core.exceptions import DuplicateException
+from app.databases import transaction_crud
+from app.models.accounts import AccountModel
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.account_stats import account_stats_service
+from app.services.accounts import account_service
+from app.services.transactions import TransactionService, transaction_service
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+SENDER = 'stats_sender'
+RECEIVER = 'stats_receiver'
+# Транзакции ровно в полночь: сдвиг гистограммы по календарным дням совпадает с точной давностью
+START = datetime(2024, 8, 1)
+
+
+def make_transaction(
+        day: int, amount: float, sender: str = SENDER, receiver: str = RECEIVER
+) -> TransactionCreateSchema:
+    return TransactionCreateSchema(
+        sender_account_id=sender,
+        receiver_account_id=receiver,
+        transaction_amount=amount,
+        transaction_type=TransactionType.TRANSFER,
+        transaction_datetime=START + timedelta(days=day),
+        transaction_status=TransactionStatus.SUCCESS if day % 4 else TransactionStatus.FAILED,
+        fraud_flag=False,
+        geolocation='Moscow',
+        device_user=DeviceUser.MOBILE
+    )
+
+
+async def add(session, day: int, amount: float) -> dict[str, float]:
+    models = await transaction_crud.add_many(
+        transactions=[TransactionService._to_model(make_transaction(day, amount))], session=session, commit=False
+    )
+    return await account_stats_service.apply_transactions(transactions=models, session=session)
+
+
+async def test_incremental_scores_match_full_recalculation(postgres_engine, postgres_session):
+    for account_id in (SENDER, RECEIVER):
+        postgres_session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+    await postgres_session.flush()
+    await add(postgres_session, day=0, amount=50)
+
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    for day in range(1, 45):
+        event.listen(postgres_engine.sync_engine, 'before_cursor_execute', capture)
+        try:
+            scores = await add(postgres_session, day=day, amount=100 + day * 13)
+        finally:
+            event.remove(postgres_engine.sync_engine, 'before_cursor_execute', capture)
+        for account_id in (SENDER, RECEIVER):
+            expected = await account_service.recalculate_account_score(account_id=account_id, session=postgres_session)
+            assert scores[account_id] == pytest.approx(expected, abs=1e-9)
+
+    # Скоринг обновляется по строкам account_stats, без чтения истории транзакций
+    scoring_statements = [statement for statement in statements if 'INSERT INTO transactions' not in statement]
+    assert scoring_statements
+    assert not any(re.search(r'\btransactions\b', statement) for statement in scoring_statements)
+    await postgres_session.rollback()
+
+
+async def test_crossing_inserts_do_not_deadlock(postgres_session_maker):
+    accounts = ('cross_a', 'cross_b', 'cross_c')
+    async with postgres_session_maker() as session:
+        for account_id in accounts:
+            session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+        await session.commit()
+
+    async def create(transaction: TransactionCreateSchema) -> None:
+        async with postgres_session_maker() as session:
+            await transaction_service.create_transaction(transaction_data=transaction, session=session)
+
+    # Встречные переводы A -> B и B -> A блокируют строки обоих аккаунтов в одном порядке
+    pairs = [(sender, receiver) for sender in accounts for receiver in accounts if sender != receiver]
+    for day in range(30):
+        await asyncio.gather(*(
+            create(make_transaction(day, amount=100, sender=sender, receiver=receiver)) for sender, receiver in pairs
+        ))
+
+    with pytest.raises(DuplicateException):
+        await create(make_transaction(0, amount=100, sender=accounts[0], receiver=accounts[1]))
+
+
+async def test_fraud_flags_update_scores_without_rebuild(postgres_session):
+    accounts = sender, receiver = ('fraud_a', 'fraud_b')
+    for account_id in accounts:
+        postgres_session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+    await postgres_session.flush()
+    models = await transaction_crud.add_many(
+        transactions=[
+            TransactionService._to_model(make_transaction(day, amount=200 + day, sender=sender, receiver=receiver))
+            for day in range(8)
+        ],
+        session=postgres_session,
+        commit=False
+    )
+    await account_stats_service.apply_transactions(transactions=models, session=postgres_session)
+
+    # Очередь скоринга помечает уже учтенную в агрегатах транзакцию мошеннической
+    models[3].fraud_flag = True
+    await transaction_crud.set_fraud_flags(transactions=[models[3]], session=postgres_session)
+    scores = await account_stats_service.apply_fraud_flags(transactions=[models[3]], session=postgres_session)
+
+    for account_id in accounts:
+        expected = await account_service.recalculate_account_score(account_id=account_id, session=postgres_session)
+        assert scores[account_id] == pytest.approx(expected, abs=1e-9)
+    await postgres_session.rollback()
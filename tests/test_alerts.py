@@ -0,0 +1,152 @@
+import json
+from datetime import datetime
+
+import httpx
+import pytest
+from sqlalchemy import func, select, text, update
+
+from app.core.config import settings
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser
+from app.models.alerts import FraudAlertModel
+from app.schemas.transactions import TransactionCreateSchema
+from app.services import alerts
+from app.services.alerts import AlertDispatcher
+from commands.alert_receiver import get_receiver
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+WEBHOOK_URL = 'http://bank.test/alerts'
+
+
+@pytest.fixture
+async def outbox(postgres_session_maker, monkeypatch):
+    """Пустой outbox тестовой базы, из которого читает диспетчер"""
+    monkeypatch.setattr(alerts, 'async_session_maker', postgres_session_maker)
+    async with postgres_session_maker() as session:
+        await session.execute(text('TRUNCATE fraud_alerts'))
+        await session.commit()
+    return postgres_session_maker
+
+
+def make_dispatcher(transport: httpx.AsyncBaseTransport, **config) -> AlertDispatcher:
+    dispatcher = AlertDispatcher(config=settings.alerts.model_copy(update={
+        'enabled': True, 'webhook_url': WEBHOOK_URL, 'max_rate': 0, 'backoff_seconds': 1, **config
+    }))
+    dispatcher._client = httpx.AsyncClient(transport=transport)
+    return dispatcher
+
+
+async def add_alerts(session_maker, dispatcher: AlertDispatcher, transaction_ids: range) -> None:
+    transaction = TransactionCreateSchema(
+        sender_account_id='sender',
+        receiver_account_id='receiver',
+        transaction_amount=15000,
+        transaction_type=TransactionType.TRANSFER,
+        transaction_datetime=datetime(2026, 10, 1),
+        transaction_status=TransactionStatus.SUCCESS,
+        fraud_flag=True,
+        geolocation='Moscow',
+        device_user=DeviceUser.MOBILE
+    )
+    async with session_maker() as session:
+        await dispatcher.add(
+            rows=[dispatcher.to_row(transaction_id, transaction, 0.9) for transaction_id in transaction_ids],
+            session=session
+        )
+        await session.commit()
+
+
+async def get_alerts(session_maker) -> list[FraudAlertModel]:
+    async with session_maker() as session:
+        return (await session.execute(select(FraudAlertModel).order_by(FraudAlertModel.id))).scalars().all()
+
+
+async def make_due(session_maker) -> None:
+    """Сдвигает срок всех уведомлений на текущий момент, как будто задержка или аренда истекла"""
+    async with session_maker() as session:
+        await session.execute(update(FraudAlertModel).values(next_attempt_at=func.now()))
+        await session.commit()
+
+
+async def test_delivers_batch(outbox):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(200, json={'accepted': 3})
+
+    dispatcher = make_dispatcher(httpx.MockTransport(handler))
+    await add_alerts(outbox, dispatcher, range(1, 4))
+
+    assert await dispatcher.dispatch() == 3
+    assert await dispatcher.dispatch() == 0
+
+    assert len(requests) == 1
+    assert str(requests[0].url) == WEBHOOK_URL
+    body = json.loads(requests[0].content)
+    assert [alert['idempotency_key'] for alert in body['alerts']] == [f'fraud-alert-{index}' for index in range(1, 4)]
+    assert all(alert.delivered_at is not None and alert.attempts == 1 for alert in await get_alerts(outbox))
+    assert dispatcher.delivered == 3
+
+
+async def test_retries_503_after_retry_after(outbox):
+    responses = [httpx.Response(503, headers={'Retry-After': '120'}), httpx.Response(200)]
+    dispatcher = make_dispatcher(httpx.MockTransport(lambda request: responses.pop(0)))
+    await add_alerts(outbox, dispatcher, range(1, 3))
+
+    assert await dispatcher.dispatch() == 2
+    async with outbox() as session:
+        delay = await session.scalar(
+            select(func.min(FraudAlertModel.next_attempt_at) - func.localtimestamp())
+        )
+    assert delay.total_seconds() > 110
+    assert all(alert.delivered_at is None and alert.last_error == 'HTTP 503' for alert in await get_alerts(outbox))
+    # До истечения Retry-After уведомления не отправляются снова
+    assert await dispatcher.dispatch() == 0
+
+    await make_due(outbox)
+    assert await dispatcher.dispatch() == 2
+    assert all(alert.delivered_at is not None and alert.attempts == 2 for alert in await get_alerts(outbox))
+    assert (dispatcher.retried, dispatcher.delivered, dispatcher.failed) == (2, 2, 0)
+
+
+async def test_gives_up_after_max_attempts(outbox):
+    requests = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        requests.append(request)
+        return httpx.Response(503)
+
+    dispatcher = make_dispatcher(httpx.MockTransport(handler), max_attempts=3)
+    await add_alerts(outbox, dispatcher, range(1, 3))
+
+    for _ in range(3):
+        await make_due(outbox)
+        assert await dispatcher.dispatch() == 2
+    await make_due(outbox)
+    assert await dispatcher.dispatch() == 0
+
+    assert len(requests) == 3
+    assert all(alert.failed_at is not None and alert.attempts == 3 for alert in await get_alerts(outbox))
+    assert (dispatcher.retried, dispatcher.failed) == (4, 2)
+
+
+async def test_resend_is_deduplicated_by_idempotency_key(outbox):
+    receiver = get_receiver(fail_rate=0, delay=0)
+    dispatcher = make_dispatcher(httpx.ASGITransport(app=receiver))
+    await add_alerts(outbox, dispatcher, range(1, 4))
+    # Повторная запись уведомления той же транзакции не создает второй строки outbox
+    await add_alerts(outbox, dispatcher, range(1, 4))
+    assert len(await get_alerts(outbox)) == 3
+
+    assert await dispatcher.dispatch() == 3
+    # Пачка дошла, но отметка о доставке потерялась: после аренды уведомления уходят повторно
+    async with outbox() as session:
+        await session.execute(update(FraudAlertModel).values(delivered_at=None))
+        await session.commit()
+    await make_due(outbox)
+    assert await dispatcher.dispatch() == 3
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=receiver), base_url='http://bank.test') as client:
+        stats = (await client.get('/stats')).json()
+    assert (stats['batches'], stats['alerts'], stats['duplicates']) == (2, 3, 3)
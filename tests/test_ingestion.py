@@ -0,0 +1,62 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import select
+
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser
+from app.databases import transaction_crud
+from app.models.accounts import AccountModel
+from app.models.transactions import TransactionModel
+from app.schemas.transactions import TransactionCreateSchema
+from app.services import ingestion
+from app.services.ingestion import ingestion_service
+from app.services.transactions import TransactionService
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+SENDER = 'ingest_sender'
+RECEIVER = 'ingest_receiver'
+
+
+def make_transaction(amount: float) -> TransactionCreateSchema:
+    return TransactionCreateSchema(
+        sender_account_id=SENDER,
+        receiver_account_id=RECEIVER,
+        transaction_amount=amount,
+        transaction_type=TransactionType.TRANSFER,
+        transaction_datetime=datetime(2024, 5, 1, 12),
+        transaction_status=TransactionStatus.SUCCESS,
+        fraud_flag=False,
+        geolocation='Moscow',
+        device_user=DeviceUser.MOBILE
+    )
+
+
+async def test_chunk_skips_key_written_after_check(postgres_session_maker, monkeypatch):
+    monkeypatch.setattr(ingestion, 'async_session_maker', postgres_session_maker)
+    async with postgres_session_maker() as session:
+        for account_id in (SENDER, RECEIVER):
+            session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+        await session.commit()
+        # Другой писатель записывает ту же транзакцию уже после проверки дубликатов в пачке
+        await transaction_crud.add_many(
+            transactions=[TransactionService._to_model(make_transaction(100))], session=session
+        )
+
+    async def no_existing_keys(transactions, session):
+        return set()
+
+    monkeypatch.setattr(transaction_crud, 'get_existing_keys', no_existing_keys)
+    touched = set()
+    counts = await ingestion_service.write_chunk(
+        [make_transaction(100), make_transaction(200)], score=False, touched=touched
+    )
+
+    assert counts['created'] == 1
+    assert counts['duplicates'] == 1
+    assert touched == {SENDER, RECEIVER}
+    async with postgres_session_maker() as session:
+        amounts = await session.scalars(
+            select(TransactionModel.transaction_amount).where(TransactionModel.sender_account_id == SENDER)
+        )
+        assert sorted(map(float, amounts)) == [100, 200]
@@ -0,0 +1,33 @@
+import threading
+
+import pytest
+
+from app.core.metrics import MetricsRegistry
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_render_does_file_io_off_the_event_loop(tmp_path, monkeypatch):
+    registry = MetricsRegistry(directory=str(tmp_path), flush_seconds=10)
+    requests = registry.counter('requests_total', 'Запросов', ('route',))
+    seconds = registry.histogram('request_seconds', 'Время запроса', buckets=(0.1, 1.0))
+    requests.inc('/score', amount=2)
+    seconds.observe(0.05)
+    seconds.observe(0.5)
+
+    write = registry._write
+    threads = []
+
+    def tracked_write(snapshot):
+        threads.append(threading.get_ident())
+        write(snapshot)
+
+    monkeypatch.setattr(registry, '_write', tracked_write)
+    await registry.flush()
+    text = await registry.render()
+
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
+    assert 'requests_total{route="/score"} 2.0' in text
+    assert 'request_seconds_bucket{le="1.0"} 2' in text
+    assert 'request_seconds_count 2' in text
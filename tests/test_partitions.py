@@ -0,0 +1,150 @@
+import re
+from datetime import datetime, timedelta
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from alembic.script import ScriptDirectory
+from sqlalchemy import event, func, select, text
+
+from app.core.config import settings
+from app.core.db import ALEMBIC_CONFIG
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser
+from app.databases import partition_crud, transaction_crud
+from app.databases.partitions import PARENT_TABLE, month_start, add_months, partition_name
+from app.models.accounts import AccountModel
+from app.models.transactions import TransactionModel
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.partitions import partition_service
+from app.services.transactions import TransactionService
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+SCANNED_RELATION = re.compile(rf'Scan .* on ({PARENT_TABLE}_\w+)')
+
+
+def make_transaction(transaction_datetime: datetime, amount: float = 100) -> TransactionCreateSchema:
+    return TransactionCreateSchema(
+        sender_account_id='sender',
+        receiver_account_id='receiver',
+        transaction_amount=amount,
+        transaction_type=TransactionType.TRANSFER,
+        transaction_datetime=transaction_datetime,
+        transaction_status=TransactionStatus.SUCCESS,
+        fraud_flag=False,
+        geolocation='Moscow',
+        device_user=DeviceUser.MOBILE
+    )
+
+
+async def test_migrations_reach_head(postgres_session):
+    head = ScriptDirectory.from_config(Config(ALEMBIC_CONFIG)).get_current_head()
+    version = await postgres_session.scalar(text('SELECT version_num FROM alembic_version'))
+    assert version == head
+
+
+def _alembic(connection, action, revision: str) -> None:
+    config = Config(ALEMBIC_CONFIG)
+    config.attributes['connection'] = connection
+    connection.commit()
+    action(config, revision)
+
+
+async def test_duplicate_key_migration_aborts_on_colliding_rows(postgres_engine):
+    columns = (
+        'sender_account_id, receiver_account_id, transaction_amount, transaction_type, transaction_datetime, '
+        'transaction_status, fraud_flag, geolocation, device_user'
+    )
+    row = "'dup_sender', 'dup_receiver', 100, 'TRANSFER', '2021-03-01 12:00', 'SUCCESS', false, 'Moscow', 'MOBILE'"
+    async with postgres_engine.connect() as connection:
+        await connection.run_sync(_alembic, command.downgrade, '0006')
+    try:
+        async with postgres_engine.begin() as connection:
+            await connection.execute(text(
+                "INSERT INTO accounts (account_id, first_name, last_name, middle_name, score, create_at, update_at) "
+                "SELECT account_id, '-', '-', '-', 0, now(), now() FROM unnest(ARRAY['dup_sender', 'dup_receiver']) "
+                "AS account_id"
+            ))
+            await connection.execute(text(f'INSERT INTO transactions ({columns}) VALUES ({row}), ({row})'))
+        async with postgres_engine.connect() as connection:
+            with pytest.raises(RuntimeError, match='dup_sender -> dup_receiver'):
+                await connection.run_sync(_alembic, command.upgrade, 'head')
+        async with postgres_engine.connect() as connection:
+            count = await connection.scalar(
+                text("SELECT count(*) FROM transactions WHERE sender_account_id = 'dup_sender'")
+            )
+        assert count == 2
+    finally:
+        async with postgres_engine.begin() as connection:
+            await connection.execute(text("DELETE FROM transactions WHERE sender_account_id = 'dup_sender'"))
+            await connection.execute(text("DELETE FROM accounts WHERE account_id IN ('dup_sender', 'dup_receiver')"))
+        async with postgres_engine.connect() as connection:
+            await connection.run_sync(_alembic, command.upgrade, 'head')
+
+
+async def test_window_query_scans_only_current_partitions(postgres_engine, postgres_session):
+    now = datetime.now()
+    await partition_service.maintain(session=postgres_session, now=now)
+    statements = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, parameters))
+
+    event.listen(postgres_engine.sync_engine, 'before_cursor_execute', capture)
+    try:
+        await transaction_crud.get_risk_features(
+            transaction=make_transaction(now),
+            start_date=now - timedelta(days=settings.risk.analysis_window_days),
+            end_date=now,
+            session=postgres_session
+        )
+    finally:
+        event.remove(postgres_engine.sync_engine, 'before_cursor_execute', capture)
+    statement, parameters = statements[-1]
+    connection = await postgres_session.connection()
+    plan = (await connection.exec_driver_sql(f'EXPLAIN {statement}', parameters)).scalars().all()
+
+    scanned = {match.group(1) for line in plan if (match := SCANNED_RELATION.search(line))}
+    window_start = now - timedelta(days=settings.risk.analysis_window_days)
+    assert scanned == {partition_name(month_start(window_start)), partition_name(month_start(now))}
+
+
+async def test_maintenance_creates_partitions_ahead(postgres_session):
+    now = datetime.now()
+    await partition_service.maintain(session=postgres_session, now=now)
+    names = {partition.name for partition in await partition_crud.get_all(session=postgres_session)}
+    for months in range(settings.partition.months_ahead + 1):
+        assert partition_name(add_months(month_start(now), months)) in names
+
+    start = add_months(month_start(now), settings.partition.months_ahead + 1)
+    end = add_months(start, 2)
+    created = await partition_service.ensure_partitions(start=start, end=end, session=postgres_session)
+    assert created == [partition_name(start), partition_name(add_months(start, 1))]
+    assert await partition_service.ensure_partitions(start=start, end=end, session=postgres_session) == []
+    await postgres_session.rollback()
+
+
+async def test_archive_detaches_old_partition_without_losing_rows(postgres_session):
+    month = datetime(2020, 1, 1)
+    await partition_service.ensure_partitions(start=month, end=add_months(month, 1), session=postgres_session)
+    for account_id in ('sender', 'receiver'):
+        postgres_session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+    await postgres_session.flush()
+    transactions = [
+        TransactionService._to_model(make_transaction(month + timedelta(days=day), amount=100 + day))
+        for day in range(10)
+    ]
+    await transaction_crud.add_many(transactions=transactions, session=postgres_session)
+    total = await postgres_session.scalar(select(func.count()).select_from(TransactionModel))
+
+    archived = await partition_service.archive_partitions(before=add_months(month, 1), session=postgres_session)
+    await postgres_session.commit()
+
+    assert archived == [partition_name(month)]
+    assert partition_name(month) not in {
+        partition.name for partition in await partition_crud.get_all(session=postgres_session)
+    }
+    remaining = await postgres_session.scalar(select(func.count()).select_from(TransactionModel))
+    archive = await postgres_session.scalar(text(f'SELECT count(*) FROM {PARENT_TABLE}_archive_2020_01'))
+    assert archive == len(transactions)
+    assert remaining + archive == total
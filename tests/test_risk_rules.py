@@ -0,0 +1,17 @@
+from app.core.config import RiskRuleConfig, settings
+from app.services.risk_rules import RiskRuleEngine, VELOCITY
+from app.services.velocity import VELOCITY_FEATURES
+
+
+def test_disabled_rules_are_skipped():
+    burst = RiskRuleConfig(name='burst', check='at_least', feature='sender_count_1m', threshold=5, weight=0.3)
+    engine = RiskRuleEngine(rules=[burst.model_copy(update={'enabled': False})], fraud_threshold=0.6)
+    assert engine.rules == []
+    assert not engine.requires(VELOCITY)
+    assert RiskRuleEngine(rules=[burst], fraud_threshold=0.6).requires(VELOCITY)
+
+
+def test_velocity_rules_are_disabled_by_default():
+    # Счетчики скорости в памяти процесса, а по умолчанию процессов столько, сколько ядер
+    assert settings.app.workers != 1
+    assert not any(rule.enabled for rule in settings.risk.rules if rule.feature in VELOCITY_FEATURES)
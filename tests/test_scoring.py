@@ -0,0 +1,78 @@
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser, RiskStatus
+from app.schemas.transactions import TransactionSchema
+from app.services.accounts import AccountService
+from app.services.scoring import AccountScoringEngine, TransactionColumns, NEW_ACCOUNT_SCORE
+
+NOW = datetime(2026, 10, 1)
+
+
+def make_transactions(
+        rng: random.Random, count: int, spread_days: int = 90, fraud_rate: float = 0.05
+) -> list[TransactionSchema]:
+    """Случайная история аккаунта: мелкие и крупные суммы, все типы и статусы, даты в пределах spread_days"""
+    return [
+        TransactionSchema(
+            id=index,
+            sender_account_id='sender',
+            receiver_account_id='receiver',
+            transaction_amount=round(rng.choice([rng.uniform(0.01, 50), rng.uniform(1, 1_000_000)]), 2),
+            transaction_type=rng.choice(list(TransactionType)),
+            transaction_datetime=NOW - timedelta(
+                seconds=rng.randint(0, spread_days * 86400), microseconds=rng.randint(0, 999_999)
+            ),
+            transaction_status=rng.choice([TransactionStatus.SUCCESS, TransactionStatus.SUCCESS,
+                                           TransactionStatus.FAILED]),
+            fraud_flag=rng.random() < fraud_rate,
+            geolocation='Moscow',
+            device_user=DeviceUser.MOBILE,
+            risk_status=RiskStatus.SCORED
+        )
+        for index in range(count)
+    ]
+
+
+def assert_same_score(transactions: list[TransactionSchema], split: int) -> float:
+    """Скоринг движка совпадает с эталоном побитово, при любом делении истории на отправленные и полученные"""
+    expected = AccountService._calculate_account_score(transactions[:split], transactions[split:])
+    actual = AccountScoringEngine.calculate(TransactionColumns.from_schemas(transactions))
+    assert actual == expected
+    assert type(actual) is type(expected)
+    return actual
+
+
+@pytest.mark.parametrize('seed', range(200))
+def test_random_histories(seed):
+    rng = random.Random(seed)
+    count = rng.choice([5, 6, 10, 50, 200, 1000])
+    transactions = make_transactions(
+        rng, count, spread_days=rng.choice([0, 1, 10, 90, 1000]), fraud_rate=rng.choice([0, 0.05, 0.2, 0.4])
+    )
+    assert_same_score(transactions, split=rng.randint(0, count))
+
+
+def test_empty_history():
+    assert assert_same_score([], split=0) == NEW_ACCOUNT_SCORE
+
+
+@pytest.mark.parametrize('count', range(1, 5))
+def test_fewer_than_five_transactions(count):
+    transactions = make_transactions(random.Random(count), count, fraud_rate=1)
+    assert assert_same_score(transactions, split=count // 2) == NEW_ACCOUNT_SCORE
+
+
+def test_same_day_gaps():
+    rng = random.Random(1)
+    transactions = make_transactions(rng, 20, spread_days=0)
+    for transaction in transactions:
+        transaction.transaction_datetime = NOW - timedelta(hours=rng.randint(0, 23))
+    assert_same_score(transactions, split=7)
+
+
+def test_all_fraud():
+    transactions = make_transactions(random.Random(2), 30, fraud_rate=1)
+    assert assert_same_score(transactions, split=15) == 0
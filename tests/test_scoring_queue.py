@@ -0,0 +1,88 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import update
+
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser, RiskStatus
+from app.databases import transaction_crud
+from app.models.accounts import AccountModel
+from app.models.transactions import TransactionModel
+from app.schemas.transactions import TransactionCreateSchema
+from app.services.scoring_queue import ScoringQueue
+from app.services.transactions import TransactionService
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+SENDER = 'queue_sender'
+RECEIVER = 'queue_receiver'
+
+
+def make_queue() -> ScoringQueue:
+    return ScoringQueue(
+        max_size=100, workers=1, batch_size=10, flush_seconds=1, max_attempts=3, retry_seconds=1,
+        recover_seconds=1, lease_seconds=60
+    )
+
+
+@pytest.fixture
+async def pending_ids(postgres_session) -> list[int]:
+    """Три PENDING-транзакции без аренды, как после падения сохранившего их процесса"""
+    for account_id in (SENDER, RECEIVER):
+        postgres_session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+    await postgres_session.flush()
+    models = []
+    for minutes in range(3):
+        model = TransactionService._to_model(TransactionCreateSchema(
+            sender_account_id=SENDER,
+            receiver_account_id=RECEIVER,
+            transaction_amount=100 + minutes,
+            transaction_type=TransactionType.TRANSFER,
+            transaction_datetime=datetime(2024, 9, 1) + timedelta(minutes=minutes),
+            transaction_status=TransactionStatus.SUCCESS,
+            fraud_flag=False,
+            geolocation='Moscow',
+            device_user=DeviceUser.MOBILE
+        ))
+        model.risk_status = RiskStatus.PENDING
+        models.append(model)
+    await transaction_crud.add_many(transactions=models, session=postgres_session, commit=False)
+    yield [model.id for model in models]
+    await postgres_session.rollback()
+
+
+async def test_claim_skips_leased_and_in_flight_rows(postgres_session, pending_ids):
+    claimed = await transaction_crud.claim_pending(
+        session=postgres_session, limit=10, lease_seconds=60, exclude_ids={pending_ids[0]}
+    )
+    assert [row['id'] for row in claimed] == pending_ids[1:]
+    # Арендованные строки не подбираются, пока аренда не истекла
+    claimed = await transaction_crud.claim_pending(
+        session=postgres_session, limit=10, lease_seconds=60, exclude_ids=set()
+    )
+    assert [row['id'] for row in claimed] == pending_ids[:1]
+
+    await postgres_session.execute(
+        update(TransactionModel)
+        .where(TransactionModel.id.in_(pending_ids))
+        .values(risk_lease_until=datetime(2000, 1, 1))
+        .execution_options(synchronize_session=False)
+    )
+    claimed = await transaction_crud.claim_pending(
+        session=postgres_session, limit=10, lease_seconds=60, exclude_ids=set()
+    )
+    assert [row['id'] for row in claimed] == pending_ids
+
+
+async def test_recovery_does_not_requeue_in_flight_transactions(postgres_session, pending_ids):
+    queue = make_queue()
+    for _ in range(3):
+        await queue.recover(session=postgres_session)
+        # Аренда истекает, а транзакции все еще ждут в очереди процесса
+        await postgres_session.execute(
+            update(TransactionModel)
+            .where(TransactionModel.id.in_(pending_ids))
+            .values(risk_lease_until=datetime(2000, 1, 1))
+            .execution_options(synchronize_session=False)
+        )
+    assert queue.enqueued == len(pending_ids)
+    assert queue.reserved == len(pending_ids)
@@ -0,0 +1,70 @@
+import json
+from datetime import datetime, timedelta
+
+import httpx
+import pytest
+from fastapi import FastAPI
+
+from app.api.transactions import transactions_router
+from app.core.config import settings
+from app.core.db import get_session
+from app.core.enums import TransactionStatus, TransactionType, DeviceUser, TransactionBatchStatus
+from app.core.utils import NDJSON_MEDIA_TYPE
+from app.models.accounts import AccountModel
+
+pytestmark = [pytest.mark.postgres, pytest.mark.anyio]
+
+
+
+def make_items(count: int) -> list[dict]:
+    return [
+        {
+            'sender_account_id': f'batch_sender_{index}',
+            'receiver_account_id': f'batch_receiver_{index}',
+            'transaction_amount': 100 + index,
+            'transaction_type': TransactionType.TRANSFER,
+            'transaction_datetime': (datetime(2024, 10, 1) + timedelta(seconds=index)).isoformat(),
+            'transaction_status': TransactionStatus.SUCCESS,
+            'fraud_flag': False,
+            'geolocation': 'Moscow',
+            'device_user': DeviceUser.MOBILE
+        }
+        for index in range(count)
+    ]
+
+
+@pytest.fixture
+async def client(postgres_session_maker):
+    async def session_override():
+        async with postgres_session_maker() as session:
+            yield session
+
+    app = FastAPI()
+    app.include_router(transactions_router, prefix='/transactions')
+    app.dependency_overrides[get_session] = session_override
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url='http://test') as client:
+        yield client
+
+
+async def test_batch_of_max_size_is_stored(client, postgres_session_maker):
+    items = make_items(settings.page.max_batch_size)
+    async with postgres_session_maker() as session:
+        for item in items:
+            for account_id in (item['sender_account_id'], item['receiver_account_id']):
+                session.add(AccountModel(account_id=account_id, first_name='-', last_name='-', middle_name='-'))
+        await session.commit()
+    # Худший случай: у каждой транзакции свои аккаунты, запросы по ним не упираются в лимит параметров asyncpg
+    response = await client.post('/transactions/batch', json=items)
+    assert response.status_code == 200
+    statuses = {item['status'] for item in response.json()['items']}
+    assert statuses == {TransactionBatchStatus.CREATED}
+
+
+async def test_oversized_batches_are_rejected(client, monkeypatch):
+    response = await client.post('/transactions/batch', json=make_items(settings.page.max_batch_size + 1))
+    assert response.status_code == 413
+
+    monkeypatch.setattr(settings.page, 'max_batch_bytes', 1000)
+    body = '\n'.join(json.dumps(item) for item in make_items(10))
+    response = await client.post('/transactions/batch', content=body, headers={'content-type': NDJSON_MEDIA_TYPE})
+    assert response.status_code == 413